@@ -1,29 +1,118 @@
 import argparse
+import os
 import time
 
 import art
 import numpy as np
 
-from invest.decision import investment_portfolio
-from invest.preprocessing.dataloader import load_data
+from invest.decision import investment_portfolios
+from invest.evaluation.backtest import backtest_selections, selection_matrix
+from invest.preprocessing.dataloader import compact_data, load_data, load_panel
+from invest.sensitivity import dirichlet_perturbations, sensitivity, sensitivity_table
+from invest.sweep import METRICS, sweep
+from invest.universe import universe
 
 VERSION = 1.0
 
 
 def main():
     start = time.time()
-    df_ = load_data()
-    jgind_portfolio = investment_portfolio(df_, args, "JGIND", True)
-    jcsev_portfolio = investment_portfolio(df_, args, "JCSEV", True)
+    df_ = load_panel() if args.compact else load_data()
+    portfolios = investment_portfolios(df_, args, args.indices, True, benchmark=args.benchmark)
     end = time.time()
 
-    jgind_metrics_ = list(jgind_portfolio["ip"].values())[2::]
-    jcsev_metrics_ = list(jcsev_portfolio["ip"].values())[2::]
+    metrics_ = {index_code: list(portfolio["ip"].values())[2::] for index_code, portfolio in portfolios.items()}
+
+    hours, rem = divmod(end - start, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print("\nExperiment Time: ""{:0>2}:{:0>2}:{:05.2f}".format(int(hours), int(minutes), seconds))
+    return metrics_
+
+
+def sweep_main():
+    start = time.time()
+    df_ = load_panel() if args.compact else load_data()
+    margins = args.margins or [args.margin_of_safety]
+    betas = args.betas or [args.beta]
+    holding_periods = args.holding_periods or [args.holding_period]
+    result = sweep(df_, args, margins, betas, holding_periods, args.indices)
+    end = time.time()
+
+    for index_code in args.indices:
+        cube = result[index_code.lower()]
+        print("\n{} {} - {}".format(index_code, args.start, args.end))
+        print("-" * 50)
+        for h, holding_period in enumerate(holding_periods):
+            print('Benchmark.{} | HP {:>3} | CR {:5.2f}% | AAR {:5.2f}% | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'
+                  .format(index_code, holding_period, *[cube["benchmark"][metric][h] * (100 if i < 2 else 1)
+                                                        for i, metric in enumerate(METRICS)]))
+        for m, margin in enumerate(margins):
+            for b, beta in enumerate(betas):
+                for h, holding_period in enumerate(holding_periods):
+                    print('IP.{} | MoS {:4.2f} | Beta {:4.2f} | HP {:>3} | CR {:5.2f}% | AAR {:5.2f}% | '
+                          'Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'
+                          .format(index_code, margin, beta, holding_period,
+                                  *[cube["ip"][metric][m, b, h] * (100 if i < 2 else 1)
+                                    for i, metric in enumerate(METRICS)]))
+
+    hours, rem = divmod(end - start, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print("\nExperiment Time: ""{:0>2}:{:0>2}:{:05.2f}".format(int(hours), int(minutes), seconds))
+
+
+def sensitivity_main():
+    start = time.time()
+    df_ = load_panel() if args.compact else load_data()
+    perturbations = dirichlet_perturbations(args.perturbed_nodes, args.perturbations, args.concentration, args.seed)
+    result = sensitivity(df_, args, perturbations, args.indices)
+    end = time.time()
+
+    table = sensitivity_table(result, args.indices)
+    for index_code in args.indices:
+        cube = result[index_code.lower()]
+        print("\n{} {} - {} | {} perturbations of {}".format(index_code, args.start, args.end, args.perturbations,
+                                                           ", ".join(args.perturbed_nodes)))
+        print("-" * 50)
+        for y, year in enumerate(result["years"]):
+            counts = table.xs((year, index_code), level=["year", "index"])["count"]
+            changed = sum(cube["shares"][p, y] != cube["shares"][0, y] for p in range(result["perturbations"]))
+            print('{} | Shares {:>3} | Range {:>3} - {:<3} | Selection changed in {:5.1f}% of perturbations'
+                  .format(year, counts.iloc[0], counts.min(), counts.max(), changed / result["perturbations"] * 100))
+        for i, metric in enumerate(METRICS):
+            values = cube[metric] * (100 if i < 2 else 1)
+            print('{:<19} | Unperturbed {:6.2f} | 5% {:6.2f} | Median {:6.2f} | 95% {:6.2f}'
+                  .format(metric, values[0], *np.nanpercentile(values, [5, 50, 95])))
+
+    hours, rem = divmod(end - start, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print("\nExperiment Time: ""{:0>2}:{:0>2}:{:05.2f}".format(int(hours), int(minutes), seconds))
+
+
+def backtest_main():
+    start = time.time()
+    df_ = load_panel() if args.compact else load_data()
+    portfolios = investment_portfolios(df_, args, args.indices, benchmark=False)
+    years = list(range(args.start, args.end))
+    schedule = args.rebalance[0] if len(args.rebalance) == 1 else args.rebalance
+    results = {}
+    for index_code in args.indices:
+        companies = universe.members(index_code)
+        selected = selection_matrix(portfolios[index_code]["ip"]["shares"], companies, years)
+        results[index_code] = backtest_selections(df_, selected, companies, years, schedule, args.weighting)
+    end = time.time()
+
+    for index_code, result in results.items():
+        print("\n{} {} - {} | Rebalanced {} | {} weighted".format(index_code, args.start, args.end,
+                                                                  ", ".join(args.rebalance), args.weighting))
+        print("-" * 50)
+        print("IP." + index_code, ["{}%".format(round(v * 100, 2)) for v in result["annualReturns"]])
+        print('IP.{} | CR {:5.2f}% | Max Drawdown {:6.2f}% | Rebalances {:>3} | Mean Turnover {:5.2f}%'
+              .format(index_code, result["compoundReturn"] * 100, result["maxDrawdown"] * 100,
+                      len(result["rebalanceDates"]), result["meanTurnover"] * 100))
 
     hours, rem = divmod(end - start, 3600)
     minutes, seconds = divmod(rem, 60)
     print("\nExperiment Time: ""{:0>2}:{:0>2}:{:05.2f}".format(int(hours), int(minutes), seconds))
-    return jgind_metrics_, jcsev_metrics_
 
 
 def str2bool(v):
@@ -51,7 +140,34 @@ if __name__ == '__main__':
     parser.add_argument("--gnn", type=str2bool, default=False)
     parser.add_argument("--holding_period", type=int, default=-1)
     parser.add_argument("--horizon", type=int, default=10)
+    parser.add_argument("--margins", type=float, nargs='+', default=None,
+                        help="Sweep over margins of safety, sweeps are run when any grid argument is given")
+    parser.add_argument("--betas", type=float, nargs='+', default=None, help="Sweep over beta thresholds")
+    parser.add_argument("--holding_periods", type=int, nargs='+', default=None, help="Sweep over holding periods")
+    parser.add_argument("--perturbations", type=int, default=None,
+                        help="Run a sensitivity analysis over random perturbations of the network CPTs")
+    parser.add_argument("--perturbed_nodes", type=str, nargs='+',
+                        default=["value.FutureSharePerformance", "recommendation.Value", "recommendation.Quality"],
+                        help="CPTs to perturb, as network.node")
+    parser.add_argument("--concentration", type=float, default=100,
+                        help="Dirichlet concentration of the perturbations, smaller values perturb more")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--indices", type=str, nargs='+', default=["JGIND", "JCSEV"],
+                        help="Share index codes to evaluate, from data or INVEST_INDICES")
+    parser.add_argument("--index_files", type=str, nargs='+', default=[],
+                        help="Further JSON membership files, each registered under its upper case file name")
+    parser.add_argument("--benchmark", type=str2bool, default=True,
+                        help="Evaluate the benchmark of each index, which needs its data in data/INVEST_IRESS")
+    parser.add_argument("--rebalance", type=str, nargs='+', default=None,
+                        help="Backtest the NAV of each portfolio rebalanced annual, quarterly, monthly or on the "
+                             "given dates (YYYY-MM-DD)")
+    parser.add_argument("--weighting", type=str, default="shares", choices=["shares", "equal"],
+                        help="Hold an equal number or an equal value of each share when rebalancing")
+    parser.add_argument("--compact", type=str2bool, default=compact_data(),
+                        help="Load the share data with compact types, defaults to INVEST_COMPACT_DATA")
     args = parser.parse_args()
+    for path in args.index_files:
+        universe.register_file(os.path.splitext(os.path.basename(path))[0].upper(), path)
 
     print(art.text2art("INVEST"))
     print("Insaaf Dhansay & Kialan Pillay")
@@ -59,20 +175,18 @@ if __name__ == '__main__':
     print("Version {}".format(VERSION))
     print("=" * 50)
 
-    if args.noise:
-        jgind_metrics = []
-        jcsev_metrics = []
-        for i in range(0, 10):
-            ratios_jgind, ratios_jcsev = main()
-            jgind_metrics.append(ratios_jgind)
-            jcsev_metrics.append(ratios_jcsev)
-        jgind_averaged_metrics = np.mean(jgind_metrics, axis=0)
-        jcsev_averaged_metrics = np.mean(jcsev_metrics, axis=0)
-
-        for i in range(0, 2):
-            jgind_averaged_metrics[i] *= 100
-            jcsev_averaged_metrics[i] *= 100
-        print("JGIND", [round(v, 2) for v in jgind_averaged_metrics])
-        print("JCSEV", [round(v, 2) for v in jcsev_averaged_metrics])
+    if args.perturbations:
+        sensitivity_main()
+    elif args.rebalance:
+        backtest_main()
+    elif args.margins or args.betas or args.holding_periods:
+        sweep_main()
+    elif args.noise:
+        metrics = [main() for i in range(0, 10)]
+        for index_code in args.indices:
+            averaged_metrics = np.mean([metrics_[index_code] for metrics_ in metrics], axis=0)
+            for i in range(0, 2):
+                averaged_metrics[i] *= 100
+            print(index_code, [round(v, 2) for v in averaged_metrics])
     else:
         main()
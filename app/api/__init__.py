@@ -1,9 +1,13 @@
 from flask_restx import Api
 
 from .invest import namespace as invest
+from .jobs import namespace as jobs
+from .sweep import namespace as sweep
 
 api = Api(
     title='INVEST API',
     version='1.0',
 )
 api.add_namespace(invest)
+api.add_namespace(jobs)
+api.add_namespace(sweep)
@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import json
+
+import msgpack
+from flask import make_response, request
+
+INDICES = ["jgind", "jcsev"]
+SECTIONS = {
+    "ip": ["shares", "annualReturns", "compoundReturn", "averageAnnualReturn", "treynor", "sharpe"],
+    "benchmark": ["annualReturns", "compoundReturn", "averageAnnualReturn", "treynor", "sharpe"],
+}
+FORMATS = {"json": "application/json", "msgpack": "application/msgpack"}
+MIN_COMPRESS_BYTES = 512
+
+
+def parse_fields(fields):
+    """
+    Parses a comma separated field selection into the (index, section, metric) leaves of the portfolio it selects.
+    A field selects every leaf whose path ends with it, e.g. "sharpe", "ip.sharpe" or "jgind.ip.sharpe".
+
+    Parameters
+    ----------
+    fields : str
+        Comma separated field selection, None or empty to select every field
+
+    Returns
+    -------
+    set
+        Selected leaves
+
+    Raises
+    ------
+    ValueError
+        If a field matches no leaf
+    """
+    leaves = {(index, section, metric) for index in INDICES for section, metrics in SECTIONS.items()
+              for metric in metrics}
+    if not fields:
+        return leaves
+    selected = set()
+    for field in fields.split(','):
+        path = tuple(field.strip().split('.'))
+        matched = {leaf for leaf in leaves if leaf[len(leaf) - len(path):] == path}
+        if not matched:
+            raise ValueError("Unknown field: {}".format(field.strip()))
+        selected |= matched
+    return selected
+
+
+def project(portfolio, leaves):
+    """
+    Returns the portfolio restricted to the selected leaves
+
+    Parameters
+    ----------
+    portfolio : dict
+        Portfolio of each index as returned by investment_portfolio
+    leaves : set
+        Selected (index, section, metric) leaves
+
+    Returns
+    -------
+    dict
+    """
+    projected = {}
+    for index, section, metric in sorted(leaves):
+        projected.setdefault(index, {}).setdefault(section, {})[metric] = portfolio[index][section][metric]
+    return projected
+
+
+def encode(body, format_='json'):
+    """
+    Serialises a response body
+
+    Parameters
+    ----------
+    body : dict
+        Response body
+    format_ : str, optional
+        json or msgpack
+
+    Returns
+    -------
+    bytes
+    """
+    if format_ == 'msgpack':
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(',', ':'), sort_keys=True).encode()
+
+
+def encoded_response(body, format_='json', status=200):
+    """
+    Returns a response holding the encoded body with a weak ETag, answering 304 when the client already holds
+    the same content and compressing it with gzip when accepted by the client
+
+    Parameters
+    ----------
+    body : dict
+        Response body
+    format_ : str, optional
+        json or msgpack
+    status : int, optional
+        HTTP status code
+
+    Returns
+    -------
+    flask.Response
+    """
+    payload = encode(body, format_)
+    etag = hashlib.sha1(payload).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(payload, status)
+        response.mimetype = FORMATS[format_]
+        if len(payload) >= MIN_COMPRESS_BYTES and 'gzip' in request.accept_encodings:
+            response.set_data(gzip.compress(payload, compresslevel=6))
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag, weak=True)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -1,13 +1,14 @@
-import json
 import logging
 
 from flask import jsonify, make_response
 from flask_restx import Resource, Namespace, reqparse, fields
 
-from invest.decision import investment_portfolio
-from invest.preprocessing.dataloader import load_data
+from app.api.encoding import FORMATS, encoded_response, parse_fields, project
+from app.coalescing import invest_flights
+from invest.decision import investment_portfolios
+from invest.preprocessing.dataloader import compact_data, load_data, load_panel
 
-df = load_data()
+df = load_panel() if compact_data() else load_data()
 
 namespace = Namespace('invest')
 
@@ -24,6 +25,8 @@ invest_resource_model = namespace.model("INVEST Resource", {
     "gnn": fields.Boolean(required=False),
     "ablation": fields.Boolean(required=False),
     "network": fields.String(required=False),
+    "fields": fields.String(required=False, description="Comma separated fields, e.g. compoundReturn,sharpe"),
+    "format": fields.String(required=False, enum=list(FORMATS)),
 })
 
 metrics_model = namespace.model("IP Metrics", {
@@ -84,11 +87,19 @@ parser.add_argument("network", type=str, default='v')
 parser.add_argument("gnn", type=str2bool, default=False)
 parser.add_argument("period", type=int, default=-1)
 parser.add_argument("horizon", type=int, default=10)
+parser.add_argument("fields", type=str, default=None)
+parser.add_argument("format", type=str, default="json", choices=list(FORMATS))
 
-companies_jcsev = json.load(open('data/jcsev.json'))['names']
-companies_jgind = json.load(open('data/jgind.json'))['names']
-companies = companies_jcsev + companies_jgind
-companies_dict = {"JCSEV": companies_jcsev, "JGIND": companies_jgind}
+# Arguments the portfolio depends on, fields and format only affect how it is returned
+KEY_ARGUMENTS = ["start", "end", "margin_of_safety", "beta", "extension", "noise", "ablation", "network", "gnn",
+                 "holding_period", "horizon"]
+
+
+def request_key(args, index_codes, benchmark):
+    """
+    Returns the normalised key of a portfolio query, equal for queries that compute the same portfolios
+    """
+    return tuple(args[name] for name in KEY_ARGUMENTS) + (tuple(index_codes), benchmark)
 
 
 @namespace.route("/")
@@ -108,31 +119,52 @@ class Invest(Resource):
     @namespace.expect(invest_resource_model)
     @namespace.response(200, "Success", invest_response_model)
     @namespace.response(400, "Bad Request")
+    @namespace.response(503, "Identical query in flight did not finish in time")
     def get(self):
         args = parser.parse_args()
         args['margin_of_safety'] = args['margin']
         args['holding_period'] = args['period']
-        if args['start'] >= args['end']:
+        try:
+            leaves = parse_fields(args['fields'])
+        except ValueError:
+            leaves = None
+        if args['start'] >= args['end'] or not leaves:
             response = jsonify(
                 {
                     'code': 400,
                     'status': "Bad Request",
                 }
             )
+            response.status_code = 400
         else:
-            jgind = investment_portfolio(df, args, "JGIND")
-            jcsev = investment_portfolio(df, args, "JCSEV")
-            response = jsonify(
-                {
-                    'code': 200,
-                    'status': "OK",
-                    'portfolio': {
-                        'jgind': jgind,
-                        'jcsev': jcsev
+            index_codes = [index_code for index_code in ["JGIND", "JCSEV"]
+                           if any(leaf[0] == index_code.lower() for leaf in leaves)]
+            benchmark = any(leaf[1] == "benchmark" for leaf in leaves)
+            try:
+                # Noisy and GNN backtests are not memoised, so there is nothing to share with other workers
+                portfolios = invest_flights.do(request_key(args, index_codes, benchmark),
+                                               lambda: investment_portfolios(df, args, index_codes,
+                                                                             benchmark=benchmark),
+                                               processes=not (args['noise'] or args['gnn']))
+            except TimeoutError:
+                response = jsonify(
+                    {
+                        'code': 503,
+                        'status': "Service Unavailable",
+                    }
+                )
+                response.status_code = 503
+            else:
+                portfolio = {index_code.lower(): portfolios[index_code] for index_code in index_codes}
+                response = encoded_response(
+                    {
+                        'code': 200,
+                        'status': "OK",
+                        'portfolio': project(portfolio, leaves),
                     },
-                }
-            )
-            response.headers.add("Access-Control-Allow-Origin", "*")
-            return response
+                    args['format']
+                )
+                response.headers.add("Access-Control-Allow-Origin", "*")
+                return response
         response.headers.add("Access-Control-Allow-Origin", "*")
         return response
@@ -0,0 +1,137 @@
+import json
+import os
+
+from flask import Response, jsonify, make_response, request
+from flask_restx import Resource, Namespace, fields
+
+from app.api.invest import df, invest_resource_model, parser, portfolio_model
+from app.jobs import TERMINAL_STATES, jobs
+
+namespace = Namespace('jobs', description="Asynchronous INVEST backtests")
+
+# Milliseconds before a client reconnects to the event stream for further events
+STREAM_RETRY = int(os.environ.get("INVEST_STREAM_RETRY", 1000))
+
+progress_model = namespace.model("Job Progress", {
+    "completed": fields.Integer(required=True),
+    "total": fields.Integer(required=True),
+    "years": fields.List(fields.Integer(required=True)),
+})
+
+job_model = namespace.model("Job", {
+    "id": fields.String(required=True),
+    "state": fields.String(required=True, enum=["queued", "running", "completed", "failed"]),
+    "progress": fields.Nested(namespace.model("Index Progress", {
+        "JGIND": fields.Nested(progress_model),
+        "JCSEV": fields.Nested(progress_model),
+    })),
+    "submitted": fields.Float(required=True),
+    "finished": fields.Float(required=False),
+    "error": fields.String(required=False),
+    "portfolio": fields.Nested(portfolio_model, allow_null=True),
+})
+
+
+def job_response(status, code=200):
+    body = {k: status[k] for k in ["id", "state", "progress", "submitted", "finished", "error", "portfolio"]}
+    body["links"] = {"status": namespace.path + "/" + status["id"],
+                     "stream": namespace.path + "/" + status["id"] + "/stream"}
+    response = jsonify(body)
+    response.status_code = code
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+
+def not_found():
+    response = jsonify({'code': 404, 'status': "Not Found"})
+    response.status_code = 404
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+
+@namespace.route("/")
+@namespace.header("Access-Control-Allow-Origin", "*")
+class Jobs(Resource):
+
+    @namespace.response(200, "Success", headers={"Access-Control-Allow-Origin": "*",
+                                                 "Access-Control-Allow-Headers": "*",
+                                                 "Access-Control-Allow-Methods": "POST, OPTIONS"})
+    def options(self):
+        response = make_response()
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add("Access-Control-Allow-Headers", "*")
+        response.headers.add("Access-Control-Allow-Methods", "*")
+        return response
+
+    @namespace.expect(invest_resource_model)
+    @namespace.response(202, "Accepted", job_model)
+    @namespace.response(400, "Bad Request")
+    def post(self):
+        """
+        Queues a backtest of both indices and returns its job id
+        """
+        args = parser.parse_args()
+        args['margin_of_safety'] = args['margin']
+        args['holding_period'] = args['period']
+        if args['start'] is None or args['end'] is None or args['start'] >= args['end']:
+            response = jsonify({'code': 400, 'status': "Bad Request"})
+            response.status_code = 400
+            response.headers.add("Access-Control-Allow-Origin", "*")
+            return response
+        status = jobs.submit(df, args)
+        response = job_response(status, 202)
+        response.headers["Location"] = namespace.path + "/" + status["id"]
+        return response
+
+
+@namespace.route("/<string:job_id>")
+@namespace.header("Access-Control-Allow-Origin", "*")
+class Job(Resource):
+
+    @namespace.response(200, "Success", job_model)
+    @namespace.response(404, "Not Found")
+    def get(self, job_id):
+        """
+        Returns the state, per index and per year progress and, once completed, the portfolio of a job
+        """
+        status = jobs.get(job_id)
+        if status is None:
+            return not_found()
+        return job_response(status)
+
+
+@namespace.route("/<string:job_id>/stream")
+@namespace.header("Access-Control-Allow-Origin", "*")
+class JobStream(Resource):
+
+    @namespace.response(200, "Server-sent event stream")
+    @namespace.response(204, "No further events")
+    @namespace.response(404, "Not Found")
+    def get(self, job_id):
+        """
+        Returns the investable shares and annual return of each year decided so far, followed by the portfolio of
+        each index once the job completes, as server-sent events. The response ends after the events already
+        written, so a stream never holds a worker for the length of a backtest. Clients reconnect after the retry
+        interval and resume after Last-Event-ID, or the offset argument, until the job finishes.
+        """
+        status = jobs.get(job_id)
+        if status is None:
+            return not_found()
+        try:
+            offset = int(request.args.get("offset", request.headers.get("Last-Event-ID", 0)))
+        except ValueError:
+            offset = 0
+
+        events = list(jobs.events(job_id, offset, follow=False))
+        if not events and status["state"] in TERMINAL_STATES:
+            # No content tells EventSource clients to stop reconnecting
+            response = make_response("", 204)
+            response.headers.add("Access-Control-Allow-Origin", "*")
+            return response
+
+        body = "retry: {}\n\n".format(STREAM_RETRY) + "".join(
+            "id: {}\nevent: {}\ndata: {}\n\n".format(n, event, json.dumps(data)) for n, event, data in events)
+        response = Response(body, mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
@@ -0,0 +1,82 @@
+from flask import jsonify, make_response
+from flask_restx import Resource, Namespace, reqparse, fields
+
+from app.api.encoding import FORMATS, encoded_response
+from app.api.invest import df, str2bool
+from invest.sweep import sweep
+
+namespace = Namespace('sweep', description="INVEST backtests over a grid of margins, betas and holding periods")
+
+sweep_resource_model = namespace.model("Sweep Resource", {
+    "start": fields.Integer(required=True),
+    "end": fields.Integer(required=True),
+    "margins": fields.String(required=True, description="Comma separated margins of safety, e.g. 0.05,0.1,0.2"),
+    "betas": fields.String(required=True, description="Comma separated beta thresholds, e.g. 0.8,1.0,1.2"),
+    "periods": fields.String(required=False, description="Comma separated holding periods, e.g. -1,5"),
+    "extension": fields.Boolean(required=False),
+    "gnn": fields.Boolean(required=False),
+    "ablation": fields.Boolean(required=False),
+    "network": fields.String(required=False),
+    "format": fields.String(required=False, enum=list(FORMATS)),
+})
+
+
+def float_list(v):
+    return [float(x) for x in v.split(',')]
+
+
+def int_list(v):
+    return [int(x) for x in v.split(',')]
+
+
+parser = reqparse.RequestParser()
+parser.add_argument('start', type=int)
+parser.add_argument('end', type=int)
+parser.add_argument('margins', type=float_list, default=[0.1])
+parser.add_argument('betas', type=float_list, default=[0.2])
+parser.add_argument('periods', type=int_list, default=[-1])
+parser.add_argument("extension", type=str2bool, default=False)
+parser.add_argument("noise", type=str2bool, default=False)
+parser.add_argument("ablation", type=str2bool, default=False)
+parser.add_argument("network", type=str, default='v')
+parser.add_argument("gnn", type=str2bool, default=False)
+parser.add_argument("horizon", type=int, default=10)
+parser.add_argument("format", type=str, default="json", choices=list(FORMATS))
+
+
+def to_lists(cube):
+    return {k: to_lists(v) if isinstance(v, dict) else v.tolist() if hasattr(v, 'tolist') else v
+            for k, v in cube.items()}
+
+
+@namespace.route("/")
+@namespace.header("Access-Control-Allow-Origin", "*")
+class Sweep(Resource):
+
+    @namespace.response(200, "Success", headers={"Access-Control-Allow-Origin": "*",
+                                                 "Access-Control-Allow-Headers": "*",
+                                                 "Access-Control-Allow-Methods": "GET, OPTIONS"})
+    def options(self):
+        response = make_response()
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add("Access-Control-Allow-Headers", "*")
+        response.headers.add("Access-Control-Allow-Methods", "*")
+        return response
+
+    @namespace.expect(sweep_resource_model)
+    @namespace.response(200, "Success")
+    @namespace.response(400, "Bad Request")
+    def get(self):
+        """
+        Returns the shares selected and the metrics cube of both indices for every grid point
+        """
+        args = parser.parse_args()
+        if args['start'] is None or args['end'] is None or args['start'] >= args['end']:
+            response = jsonify({'code': 400, 'status': "Bad Request"})
+            response.status_code = 400
+            response.headers.add("Access-Control-Allow-Origin", "*")
+            return response
+        result = sweep(df, args, args['margins'], args['betas'], args['periods'])
+        response = encoded_response({'code': 200, 'status': "OK", 'sweep': to_lists(result)}, args['format'])
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
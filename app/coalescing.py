@@ -0,0 +1,149 @@
+import contextlib
+import hashlib
+import os
+import threading
+import time
+
+from invest.tracing import cache_access
+
+try:
+    import fcntl
+except ImportError:
+    # Without file locks calls only coalesce within a process
+    fcntl = None
+
+
+class _Flight:
+    """
+    Computation in flight and its outcome
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single computation. The first caller computes the result
+    and every caller that arrives while it is in flight waits for and receives the same result, or exception.
+    Results are not kept once the computation finishes, later calls compute afresh.
+
+    Callers in other processes, such as the workers of a preforking server, cannot share the result in memory.
+    When a lock directory is given, the computations of a key are serialised across processes by a lock on a file
+    named after the key, so a computation that persists its outcome, as investment_portfolios does in the
+    backtest memo, only runs once and the waiting processes read the outcome.
+    """
+
+    def __init__(self, timeout=None, directory=None, poll_interval=0.05):
+        """
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds a caller waits for a computation started by another caller, without limit if None
+        directory : str, optional
+            Directory of the lock files that coalesce calls across processes, calls only coalesce within the
+            process if None
+        poll_interval : float, optional
+            Seconds between attempts to take the lock of a computation in another process
+        """
+        self.timeout = timeout
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    @contextlib.contextmanager
+    def _process_lock(self, key):
+        # Waits for any other process computing the key. The holder removes the lock file before releasing it, so
+        # files do not accumulate, and a waiter that then takes the lock of the removed file retries on a new one.
+        if self.directory is None or fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.lock')
+        start = time.time()
+        while True:
+            f = open(path, 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                if self.timeout is not None and time.time() - start > self.timeout:
+                    raise TimeoutError("Computation of {} did not finish within {}s".format(key, self.timeout))
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                current = os.stat(path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(f.fileno()).st_ino:
+                break
+            f.close()
+        try:
+            yield
+        finally:
+            os.remove(path)
+            f.close()
+
+    def do(self, key, func, processes=True):
+        """
+        Returns the result of func, sharing the computation with concurrent calls with the same key
+
+        Parameters
+        ----------
+        key : hashable
+            Normalised key of the computation
+        func : callable
+            Computes the result
+        processes : bool, optional
+            Also wait for computations of the key in other processes, only worthwhile if func reuses their
+            persisted outcome
+
+        Returns
+        -------
+        object
+            Result of func
+
+        Raises
+        ------
+        TimeoutError
+            If the computation of another caller does not finish within the timeout
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+        cache_access("flight", not leader)
+        if leader:
+            try:
+                if processes:
+                    with self._process_lock(key):
+                        flight.result = func()
+                else:
+                    flight.result = func()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self.lock:
+                    del self.flights[key]
+                flight.done.set()
+        elif not flight.done.wait(self.timeout):
+            raise TimeoutError("Computation of {} did not finish within {}s".format(key, self.timeout))
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def in_flight(self):
+        """
+        Returns the number of computations in flight
+        """
+        with self.lock:
+            return len(self.flights)
+
+
+# Identical concurrent /invest/ queries share one backtest in a worker, and the backtest memo across workers
+invest_flights = SingleFlight(float(os.environ.get("INVEST_COALESCE_TIMEOUT", 300)) or None,
+                              os.environ.get("INVEST_FLIGHT_DIR", os.path.join("output", "flights")) or None)
@@ -0,0 +1,258 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.metrics import format_stages, registry
+from invest.decision import investment_portfolios
+from invest.tracing import recording
+
+INDICES = ["JGIND", "JCSEV"]
+TERMINAL_STATES = ["completed", "failed"]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    Queues backtests on a worker pool and keeps their status and events on disk. Each job has a status file and an
+    append-only event log, so any server process can report on or stream a job submitted to another process.
+    """
+
+    def __init__(self, directory, workers=2, ttl=3600):
+        """
+        Parameters
+        ----------
+        directory : str
+            Directory holding the job status files and event logs
+        workers : int, optional
+            Number of backtests run concurrently by each server process
+        ttl : int, optional
+            Seconds a finished job is kept before it is removed
+        """
+        self.directory = directory
+        self.workers = workers
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _path(self, job_id, extension):
+        return os.path.join(self.directory, job_id + extension)
+
+    def _executor_for_process(self):
+        # Threads do not survive a fork, so each worker process starts its own pool on first use
+        with self.lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='invest-job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _write_status(self, status):
+        path = self._path(status["id"], '.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(status, f)
+        os.replace(path + '.tmp', path)
+
+    def _append_event(self, job_id, event, data):
+        with open(self._path(job_id, '.jsonl'), 'a') as f:
+            f.write(json.dumps({"event": event, "data": data}) + '\n')
+
+    def submit(self, df, params):
+        """
+        Queues a backtest of both indices and returns its status
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Fundamental and price data
+        params : dict
+            Backtest parameters as parsed by the INVEST API
+
+        Returns
+        -------
+        dict
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        self.expire()
+        years = list(range(params["start"], params["end"]))
+        status = {
+            "id": uuid.uuid4().hex,
+            "state": "queued",
+            "pid": os.getpid(),
+            "params": dict(params),
+            "progress": {index_code: {"completed": 0, "total": len(years), "years": []} for index_code in INDICES},
+            "submitted": time.time(),
+            "finished": None,
+            "error": None,
+            "portfolio": None,
+        }
+        self._write_status(status)
+        open(self._path(status["id"], '.jsonl'), 'w').close()
+        submitted = copy.deepcopy(status)
+        self._executor_for_process().submit(self._run, df, status)
+        return submitted
+
+    def _run(self, df, status):
+        # Pool threads do not inherit the context of the submitting request, so each job traces its own stages
+        with recording() as recorder:
+            start = time.perf_counter()
+            self._run_traced(df, status)
+        registry.observe_stages(recorder)
+        logging.info("Job %s %s %.3fs | %s", status["id"], status["state"], time.perf_counter() - start,
+                     format_stages(recorder))
+
+    def _run_traced(self, df, status):
+        job_id = status["id"]
+        status["state"] = "running"
+        self._write_status(status)
+        portfolio = {}
+        try:
+            def on_year(index_code, year, shares, annual_return):
+                progress = status["progress"][index_code]
+                progress["completed"] += 1
+                progress["years"].append(year)
+                self._append_event(job_id, "year", {"index": index_code, "year": year, "shares": shares,
+                                                    "annualReturn": float(annual_return)})
+                self._write_status(status)
+
+            portfolios = investment_portfolios(df, _Params(status["params"]), INDICES, callback=on_year)
+            for index_code in INDICES:
+                portfolio[index_code.lower()] = portfolios[index_code]
+                self._append_event(job_id, "index", {"index": index_code,
+                                                     "portfolio": portfolio[index_code.lower()]})
+            status["state"] = "completed"
+            status["portfolio"] = portfolio
+            self._append_event(job_id, "completed", {"id": job_id})
+        except Exception as e:
+            logging.exception("Job %s failed", job_id)
+            status["state"] = "failed"
+            status["error"] = repr(e)
+            self._append_event(job_id, "failed", {"id": job_id, "error": repr(e)})
+        status["finished"] = time.time()
+        self._write_status(status)
+
+    def get(self, job_id):
+        """
+        Returns the status of a job, or None if it does not exist. A job left unfinished by a server process that
+        has since exited is reported as failed.
+
+        Parameters
+        ----------
+        job_id : str
+            Job id
+
+        Returns
+        -------
+        dict
+        """
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id, '.json'), 'r') as f:
+                status = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if status["state"] not in TERMINAL_STATES and not _pid_alive(status["pid"]):
+            status["state"] = "failed"
+            status["error"] = "Server process {} exited before the job finished".format(status["pid"])
+        return status
+
+    def events(self, job_id, offset=0, follow=True, poll_interval=0.25, timeout=None):
+        """
+        Yields the events of a job, starting after the given number of events. Ends when the job finishes, or its
+        files are removed.
+
+        Parameters
+        ----------
+        job_id : str
+            Job id
+        offset : int, optional
+            Number of events already received
+        follow : bool, optional
+            Wait for events as they are appended until the job finishes, otherwise only yield the events already
+            written
+        poll_interval : float, optional
+            Seconds between checks for new events
+        timeout : float, optional
+            Stop waiting for new events after this many seconds
+
+        Returns
+        -------
+        generator
+            (event number, event name, data) tuples
+        """
+        start = time.time()
+        position = 0
+        n = 0
+        while True:
+            try:
+                with open(self._path(job_id, '.jsonl'), 'r') as f:
+                    f.seek(position)
+                    for line in iter(f.readline, ''):
+                        if not line.endswith('\n'):
+                            break
+                        position += len(line.encode())
+                        n += 1
+                        if n <= offset:
+                            continue
+                        event = json.loads(line)
+                        yield n, event["event"], event["data"]
+                        if event["event"] in TERMINAL_STATES:
+                            return
+            except FileNotFoundError:
+                return
+            if not follow:
+                return
+            status = self.get(job_id)
+            if status is None or (status["state"] == "failed" and status["finished"] is None):
+                return
+            if timeout is not None and time.time() - start > timeout:
+                return
+            time.sleep(poll_interval)
+
+    def expire(self):
+        """
+        Removes finished jobs older than the time to live
+        """
+        now = time.time()
+        for path in os.listdir(self.directory):
+            if not path.endswith('.json'):
+                continue
+            status = self.get(path[:-len('.json')])
+            if status is not None and status["finished"] is not None and now - status["finished"] > self.ttl:
+                for extension in ['.json', '.jsonl']:
+                    try:
+                        os.remove(self._path(status["id"], extension))
+                    except FileNotFoundError:
+                        pass
+
+
+class _Params(dict):
+    """
+    Backtest parameters with attribute access, as expected by investment_portfolios
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+jobs = JobStore(os.environ.get("INVEST_JOB_DIR", os.path.join("output", "jobs")),
+                workers=int(os.environ.get("INVEST_JOB_WORKERS", 2)),
+                ttl=int(os.environ.get("INVEST_JOB_TTL", 3600)))
@@ -0,0 +1,235 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from flask import Response, g, request
+
+from invest.tracing import StageRecorder, activate, deactivate
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in escaped) + '}'
+
+
+class Counter:
+    """
+    A monotonically increasing Prometheus counter
+    """
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Parameters
+        ----------
+        name : str
+            Metric name
+        documentation : str
+            Metric help text
+        labels : tuple, optional
+            Label names
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, label_values=(), amount=1):
+        """
+        Increments the counter for the given label values
+        """
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        """
+        Returns the counter in Prometheus text exposition format
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} counter'.format(self.name)]
+        for label_values, value in sorted(self.values.items()):
+            lines.append('{}{} {}'.format(self.name, _format_labels(self.labels, label_values), value))
+        return lines
+
+
+class Histogram:
+    """
+    A Prometheus latency histogram with cumulative buckets. A sliding window of the most recent observations is
+    also kept to expose p50/p95/p99 as a companion summary metric.
+    """
+
+    def __init__(self, name, summary_name, documentation, labels=(), buckets=BUCKETS, window=1024):
+        """
+        Parameters
+        ----------
+        name : str
+            Histogram metric name
+        summary_name : str
+            Quantile summary metric name
+        documentation : str
+            Metric help text
+        labels : tuple, optional
+            Label names
+        buckets : tuple, optional
+            Upper bounds of the histogram buckets in seconds
+        window : int, optional
+            Number of recent observations used to estimate quantiles
+        """
+        self.name = name
+        self.summary_name = summary_name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.window = window
+        self.series = {}
+
+    def observe(self, label_values, value):
+        """
+        Records an observation for the given label values
+        """
+        if label_values not in self.series:
+            self.series[label_values] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0,
+                                         'recent': deque(maxlen=self.window)}
+        series = self.series[label_values]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+        series['recent'].append(value)
+
+    def render(self):
+        """
+        Returns the histogram and its quantile summary in Prometheus text exposition format
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} histogram'.format(self.name)]
+        for label_values, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, _format_labels(self.labels, label_values, [('le', repr(float(bound)))]), cumulative))
+            lines.append('{}_bucket{} {}'.format(
+                self.name, _format_labels(self.labels, label_values, [('le', '+Inf')]), series['count']))
+            lines.append('{}_sum{} {}'.format(self.name, _format_labels(self.labels, label_values), series['sum']))
+            lines.append('{}_count{} {}'.format(self.name, _format_labels(self.labels, label_values),
+                                                series['count']))
+
+        lines += ['# HELP {} {} (recent quantiles)'.format(self.summary_name, self.documentation),
+                  '# TYPE {} summary'.format(self.summary_name)]
+        for label_values, series in sorted(self.series.items()):
+            quantiles = np.quantile(np.fromiter(series['recent'], dtype=np.float64), QUANTILES)
+            for q, value in zip(QUANTILES, quantiles):
+                lines.append('{}{} {}'.format(
+                    self.summary_name, _format_labels(self.labels, label_values, [('quantile', str(q))]), value))
+            lines.append('{}_sum{} {}'.format(self.summary_name, _format_labels(self.labels, label_values),
+                                              series['sum']))
+            lines.append('{}_count{} {}'.format(self.summary_name, _format_labels(self.labels, label_values),
+                                                series['count']))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Aggregates request and pipeline stage metrics for the API process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter('invest_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+        self.request_duration = Histogram('invest_request_duration_seconds', 'invest_request_latency_seconds',
+                                          'Request latency in seconds', ('endpoint',))
+        self.stage_duration = Histogram('invest_stage_duration_seconds', 'invest_stage_latency_seconds',
+                                        'Time spent in a pipeline stage per request in seconds', ('stage',))
+        self.stage_calls = Counter('invest_stage_calls_total', 'Pipeline stage calls', ('stage',))
+        self.cache_hits = Counter('invest_cache_hits_total', 'Cache lookups served from the cache', ('cache',))
+        self.cache_misses = Counter('invest_cache_misses_total', 'Cache lookups that required computation',
+                                    ('cache',))
+
+    def observe(self, endpoint, method, status, seconds, recorder):
+        """
+        Records a completed request and the stages traced while handling it
+        """
+        with self.lock:
+            self.requests.inc((endpoint, method, str(status)))
+            self.request_duration.observe((endpoint,), seconds)
+        self.observe_stages(recorder)
+
+    def observe_stages(self, recorder):
+        """
+        Records the stages and cache lookups traced by work done outside a request, such as an asynchronous job
+        """
+        with self.lock:
+            for name, stats in recorder.stages.items():
+                self.stage_duration.observe((name,), stats['seconds'])
+                self.stage_calls.inc((name,), stats['calls'])
+            for (cache, hit), count in recorder.caches.items():
+                (self.cache_hits if hit else self.cache_misses).inc((cache,), count)
+
+    def render(self):
+        """
+        Returns all metrics in Prometheus text exposition format
+        """
+        with self.lock:
+            lines = []
+            for metric in [self.requests, self.request_duration, self.stage_duration, self.stage_calls,
+                           self.cache_hits, self.cache_misses]:
+                lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def format_stages(recorder):
+    """
+    Returns the duration and number of calls of each stage traced by a recorder on a single line
+    """
+    return ' '.join('{}={:.3f}s/{}'.format(name, stats['seconds'], stats['calls'])
+                    for name, stats in recorder.stages.items())
+
+
+def init_metrics(app):
+    """
+    Traces every request with a stage recorder, logs where its time went and exposes the aggregated
+    metrics at /metrics. Metrics are aggregated per process.
+
+    Parameters
+    ----------
+    app : flask.Flask
+        Application to instrument
+    """
+
+    @app.before_request
+    def start_trace():
+        g.trace_start = time.perf_counter()
+        g.trace_recorder = StageRecorder()
+        g.trace_token = activate(g.trace_recorder)
+
+    @app.after_request
+    def record_trace(response):
+        if 'trace_recorder' not in g or request.path == '/metrics':
+            return response
+        seconds = time.perf_counter() - g.trace_start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        registry.observe(endpoint, request.method, response.status_code, seconds, g.trace_recorder)
+        if g.trace_recorder.stages:
+            logging.info("%s %s %s %.3fs | %s", request.method, request.full_path.rstrip('?'),
+                         response.status_code, seconds, format_stages(g.trace_recorder))
+        return response
+
+    @app.teardown_request
+    def end_trace(exception=None):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            deactivate(token)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
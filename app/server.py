@@ -1,6 +1,22 @@
-from flask import Flask
+import os
+
+from flask import Flask, jsonify
 
 from app.api import api
+from app.metrics import init_metrics
+from app.warmup import status, warm_up
 
 app = Flask(__name__)
 api.init_app(app)
+init_metrics(app)
+warm_up()
+
+
+@app.route('/ready')
+def ready():
+    """
+    Readiness check reporting whether warm-up has completed and whether it ran in a preforking master
+    """
+    body = {"ready": status["ready"], "complete": status["complete"], "pid": os.getpid(),
+            "preloaded": status["pid"] != os.getpid(), "components": status["components"]}
+    return jsonify(body), 200 if status["ready"] else 503
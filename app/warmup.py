@@ -0,0 +1,68 @@
+import logging
+import os
+import time
+
+from invest.networks.invest_recommendation import investment_recommendation
+from invest.networks.quality_evaluation import quality_network
+from invest.networks.value_evaluation import value_network
+from invest.prediction.main import inference_directory, load_inference_model, load_price_data
+from invest.preprocessing.dataloader import load_benchmark_data
+from invest.states import Quality, Relative, SystematicRisk, Value
+from invest.universe import universe
+
+status = {"ready": False, "complete": False, "pid": None, "components": {}}
+
+# Components that may fail without blocking readiness, only the requests that need them fail
+OPTIONAL = ["gnn"]
+# torch and the GNN model take seconds to load, so they are only loaded during warm-up when requested and
+# otherwise on the first request with GNN predictions
+WARM_GNN = os.environ.get("INVEST_WARM_GNN", "false").lower() in ('yes', 'true', 't', 'y', '1')
+
+
+def _warm(component, func):
+    start = time.perf_counter()
+    try:
+        func()
+        status["components"][component] = {"ready": True, "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        logging.warning("Warm-up of %s failed: %r", component, e)
+        status["components"][component] = {"ready": False, "error": repr(e)}
+
+
+def _warm_benchmark_data():
+    # An index without a benchmark file, such as a custom index, is only backtested without a benchmark
+    for index_code in universe.index_codes():
+        try:
+            load_benchmark_data(index_code)
+        except FileNotFoundError:
+            logging.info("No benchmark data for %s", index_code)
+
+
+def _warm_networks():
+    # Compiles each network of the specification once
+    value_network(Value.CHEAP, Value.CHEAP, Value.CHEAP)
+    quality_network(Relative.ABOVE, Relative.ABOVE, Relative.ABOVE)
+    quality_network(Relative.ABOVE, Relative.ABOVE, Relative.ABOVE, SystematicRisk.GREATER, True)
+    investment_recommendation(Value.CHEAP, Quality.HIGH)
+
+
+def _warm_gnn(horizon=10):
+    load_price_data("INVEST_GNN_clean")
+    load_inference_model(inference_directory(horizon=horizon))
+
+
+def warm_up():
+    """
+    Loads the benchmark data, exercises the decision networks and, if INVEST_WARM_GNN is set, loads the GNN
+    model so that they are resident before serving. When called in a preforking master, workers share the
+    loaded objects copy-on-write. The share data is loaded when the API module is imported. The process is
+    ready once warm-up is complete and every required component loaded.
+    """
+    _warm("benchmark_data", _warm_benchmark_data)
+    _warm("networks", _warm_networks)
+    if WARM_GNN:
+        _warm("gnn", _warm_gnn)
+    status["pid"] = os.getpid()
+    status["complete"] = True
+    status["ready"] = all(c["ready"] for name, c in status["components"].items() if name not in OPTIONAL)
+    logging.info("Warm-up complete: %s", status["components"])
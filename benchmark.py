@@ -0,0 +1,479 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from invest.cache import backtest_cache, ratio_cache
+from invest.decision import investment_portfolios
+from invest.preprocessing import synthetic
+from invest.preprocessing.dataloader import load_data, load_panel
+from invest.tracing import StageRecorder, recording, stage
+
+DEFAULTS = {"start": 2015, "end": 2018, "margin_of_safety": 0.10, "beta": 1.00, "extension": False,
+            "noise": False, "ablation": False, "network": 'v', "gnn": False, "holding_period": -1, "horizon": 10,
+            "compact": False}
+
+SCENARIOS = {
+    "default": {},
+    "full_history": {"start": 2015, "end": 2021},
+    "gnn": {"gnn": True},
+    "extension": {"extension": True},
+    "ablation_v": {"ablation": True, "network": 'v'},
+    "ablation_q": {"ablation": True, "network": 'q'},
+    "noise": {"noise": True},
+    "compact": {"compact": True},
+    "noise_compact": {"noise": True, "compact": True},
+}
+
+INDICES = ["JGIND", "JCSEV"]
+
+# Start-up of a non-GNN backtest and of an API worker, measured in a fresh interpreter
+STARTUP = {
+    "startup_cli": ["app.py", "--help"],
+    "startup_api": ["-c", "import app.server"],
+}
+# Packages loaded on first use, which start-up must not import
+LAZY = ["torch", "matplotlib", "seaborn", "gnn"]
+# Scaling runs backtest synthetic datasets ending in this year, skipping the years needed for the first ratios
+SCALING_END = 2021
+SCALING_WARMUP_YEARS = 4
+# Stages whose duration grows faster than this power of the number of companies are reported as superlinear
+SUPERLINEAR = 1.1
+
+
+def run_scenario(overrides, memory=False):
+    """
+    Runs a single INVEST backtest for both indices and records its stages
+
+    Parameters
+    ----------
+    overrides : dict
+        Command line arguments that differ from the defaults
+    memory : bool, optional
+        Track the peak memory of each stage
+
+    Returns
+    -------
+    (float, dict)
+        Total duration in seconds and the recorded stages
+    """
+    params = argparse.Namespace(**{**DEFAULTS, "indices": INDICES, **overrides})
+    random.seed(0)
+    np.random.seed(0)
+    recorder = StageRecorder(memory)
+    # Every run decides each year afresh and reads ratios from disk, if at all, rather than from a previous run
+    backtest_cache.clear()
+    ratio_cache.clear()
+    if memory:
+        tracemalloc.start()
+    try:
+        with recording(recorder), redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            with stage("load_data"):
+                df = load_panel() if params.compact else load_data()
+            investment_portfolios(df, params, params.indices)
+            total = time.perf_counter() - start
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return total, recorder.stages
+
+
+def benchmark_scenario(overrides, repeats=3, memory=True):
+    """
+    Benchmarks a scenario, reporting the median duration of each stage over repeated runs.
+    Peak memory is measured in a separate run so that tracing does not inflate the timings.
+
+    Parameters
+    ----------
+    overrides : dict
+        Command line arguments that differ from the defaults
+    repeats : int, optional
+        Number of timed runs
+    memory : bool, optional
+        Measure the peak memory of each stage
+
+    Returns
+    -------
+    dict
+    """
+    runs = [run_scenario(overrides) for _ in range(repeats)]
+    stages = {}
+    for name in runs[0][1]:
+        stages[name] = {"calls": runs[0][1][name]["calls"],
+                        "seconds": statistics.median(r[1][name]["seconds"] for r in runs if name in r[1])}
+    if memory:
+        _, traced_stages = run_scenario(overrides, memory=True)
+        for name, stats in traced_stages.items():
+            if name in stages:
+                stages[name]["peak_mb"] = stats["peak_bytes"] / 2 ** 20
+    return {"total": statistics.median(r[0] for r in runs), "stages": stages}
+
+
+def synthetic_dataset(companies, years, indices, seed=0):
+    """
+    Returns the directory of a synthetic dataset and its index codes, writing the dataset on first use
+
+    Parameters
+    ----------
+    companies : int
+        Number of companies
+    years : int
+        Number of years
+    indices : int
+        Number of sector indices
+    seed : int, optional
+        Random seed
+
+    Returns
+    -------
+    (str, list)
+    """
+    directory = os.path.join('output', 'synthetic', '{}x{}x{}_{}'.format(companies, years, indices, seed))
+    if not os.path.isfile(os.path.join(directory, 'INVEST_clean.csv')):
+        synthetic.write(directory, companies, SCALING_END - years, SCALING_END, indices, seed)
+    index_codes = [os.path.splitext(f)[0].upper() for f in sorted(os.listdir(directory)) if f.endswith('.json')]
+    return directory, index_codes
+
+
+def benchmark_scaling(sizes, years=30, indices=4, repeats=3, memory=True):
+    """
+    Benchmarks the default scenario on synthetic datasets of increasing numbers of companies. Each size runs in a
+    fresh interpreter reading its dataset through INVEST_DATA_DIR, without the on-disk ratio and backtest caches.
+
+    Parameters
+    ----------
+    sizes : list
+        Numbers of companies
+    years : int, optional
+        Number of years of each dataset
+    indices : int, optional
+        Number of sector indices of each dataset
+    repeats : int, optional
+        Number of timed runs of each size
+    memory : bool, optional
+        Measure the peak memory of each stage
+
+    Returns
+    -------
+    dict
+        Benchmark result of each size
+    """
+    results = {}
+    for companies in sizes:
+        directory, index_codes = synthetic_dataset(companies, years, indices)
+        with tempfile.TemporaryDirectory() as output:
+            path = os.path.join(output, 'scaling.json')
+            command = [sys.executable, os.path.abspath(__file__), "--scenarios", "default",
+                       "--start", str(SCALING_END - years + SCALING_WARMUP_YEARS), "--end", str(SCALING_END),
+                       "--indices"] + index_codes + ["--repeats", str(repeats), "--memory", str(memory),
+                                                     "--save", "true", "--baseline", path]
+            completed = subprocess.run(command, capture_output=True, text=True,
+                                       env={**os.environ, "INVEST_DATA_DIR": directory, "INVEST_RATIO_CACHE": "",
+                                            "INVEST_BACKTEST_CACHE": ""})
+            if completed.returncode != 0:
+                raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+            with open(path, 'r') as f:
+                results[companies] = json.load(f)["scenarios"]["default"]
+        if "error" in results[companies]:
+            raise RuntimeError(results[companies]["error"])
+    return results
+
+
+def scaling_exponents(results):
+    """
+    Returns the exponent of the power law fitted to the duration of each stage against the number of companies
+
+    Parameters
+    ----------
+    results : dict
+        Benchmark result of each size
+
+    Returns
+    -------
+    dict
+    """
+    sizes = sorted(results)
+    stages = ["total"] + [name for name in results[sizes[-1]]["stages"]]
+    exponents = {}
+    for name in stages:
+        seconds = [results[size]["total"] if name == "total" else results[size]["stages"].get(name, {}).get("seconds")
+                   for size in sizes]
+        points = [(size, s) for size, s in zip(sizes, seconds) if s]
+        if len(points) > 1:
+            exponents[name] = np.polyfit(np.log([p[0] for p in points]), np.log([p[1] for p in points]), 1)[0]
+    return exponents
+
+
+def report_scaling(results):
+    """
+    Prints the duration and peak memory of each stage against the number of companies, with the fitted scaling
+    exponent
+    """
+    sizes = sorted(results)
+    exponents = scaling_exponents(results)
+    print("\nscaling")
+    print("-" * 50)
+    print("{:<30} ".format("companies") + " ".join("{:>9}".format(size) for size in sizes) + "  exponent")
+    for name in exponents:
+        seconds = [results[size]["total"] if name == "total" else results[size]["stages"].get(name, {}).get("seconds")
+                   for size in sizes]
+        line = "{:<30} ".format(name) + " ".join("{:>8.3f}s".format(s) if s is not None else "{:>9}".format("-")
+                                                  for s in seconds)
+        line += "  {:>8.2f}".format(exponents[name])
+        if exponents[name] > SUPERLINEAR:
+            line += " superlinear"
+        print(line)
+    for name in results[sizes[-1]]["stages"]:
+        peaks = [results[size]["stages"].get(name, {}).get("peak_mb") for size in sizes]
+        if any(peak is not None for peak in peaks):
+            print("{:<30} ".format(name + " MB") + " ".join("{:>9.2f}".format(p) if p is not None else
+                                                            "{:>9}".format("-") for p in peaks))
+
+
+def chart_scaling(results, path):
+    """
+    Plots the duration and peak memory of each stage against the number of companies on log-log axes
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    sizes = sorted(results)
+    figure, (runtime, memory) = plt.subplots(1, 2, figsize=(14, 6))
+    runtime.plot(sizes, [results[size]["total"] for size in sizes], 'k-o', label="total")
+    for name in results[sizes[-1]]["stages"]:
+        stats = [results[size]["stages"].get(name, {}) for size in sizes]
+        runtime.plot(sizes, [s.get("seconds", np.nan) for s in stats], '-o', label=name)
+        memory.plot(sizes, [s.get("peak_mb", np.nan) for s in stats], '-o', label=name)
+    for axis, label in [(runtime, "Duration (s)"), (memory, "Peak memory (MB)")]:
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("Companies")
+        axis.set_ylabel(label)
+        axis.grid(True, which="both", alpha=0.3)
+    runtime.legend(fontsize="small")
+    figure.tight_layout()
+    if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def import_times(stderr):
+    """
+    Returns the cumulative import time in seconds of each package from the output of python -X importtime. A
+    package imported by another package counts towards both.
+
+    Parameters
+    ----------
+    stderr : str
+        Standard error of the interpreter
+
+    Returns
+    -------
+    dict
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((len(name) - len(name.lstrip()), int(cumulative), name.strip().split(".")[0]))
+    packages = {}
+    # Modules are listed after the modules they import, so importers are visited first in reverse
+    importers = []
+    for indent, cumulative, package in reversed(entries):
+        while importers and importers[-1][0] >= indent:
+            importers.pop()
+        if not importers or importers[-1][1] != package:
+            packages[package] = packages.get(package, 0) + cumulative / 1e6
+        importers.append((indent, package))
+    return packages
+
+
+def benchmark_startup(command, repeats=3):
+    """
+    Benchmarks the start-up of a command in a fresh interpreter, reporting the median wall time and the median
+    import time of the ten slowest top-level packages. Importing a package that should load on first use is an
+    error.
+
+    Parameters
+    ----------
+    command : list
+        Interpreter arguments
+    repeats : int, optional
+        Number of timed runs
+
+    Returns
+    -------
+    dict
+    """
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime"] + command, capture_output=True, text=True,
+                                   env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+        total = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        runs.append((total, import_times(completed.stderr)))
+    lazy = sorted(package for package in runs[0][1] if package in LAZY)
+    if lazy:
+        raise RuntimeError("start-up imports {}".format(", ".join(lazy)))
+    slowest = sorted(runs[0][1], key=runs[0][1].get, reverse=True)[:10]
+    stages = {"import." + package: {"calls": 1, "seconds": statistics.median(r[1].get(package, 0) for r in runs)}
+              for package in slowest}
+    return {"total": statistics.median(r[0] for r in runs), "stages": stages}
+
+
+def compare(results, baseline, threshold=0.25, min_seconds=0.05):
+    """
+    Returns the stages whose duration regressed beyond the threshold relative to the baseline.
+    Differences smaller than min_seconds are ignored to avoid flagging timer noise on short stages.
+
+    Parameters
+    ----------
+    results : dict
+        Current benchmark results
+    baseline : dict
+        Baseline benchmark results
+    threshold : float, optional
+        Allowed relative slowdown
+    min_seconds : float, optional
+        Allowed absolute slowdown
+
+    Returns
+    -------
+    list
+    """
+    regressions = []
+    for scenario, result in results.items():
+        if scenario not in baseline or "error" in result or "error" in baseline[scenario]:
+            continue
+        timings = {"total": result["total"]}
+        timings.update({name: stats["seconds"] for name, stats in result["stages"].items()})
+        expected = {"total": baseline[scenario]["total"]}
+        expected.update({name: stats["seconds"] for name, stats in baseline[scenario]["stages"].items()})
+        for name, seconds in timings.items():
+            if name not in expected:
+                continue
+            if seconds > expected[name] * (1 + threshold) and seconds - expected[name] > min_seconds:
+                regressions.append("{}.{} {:.3f}s -> {:.3f}s (+{:.0%})".format(
+                    scenario, name, expected[name], seconds, seconds / expected[name] - 1))
+    return regressions
+
+
+def report(results, baseline):
+    """
+    Prints per-stage timings and memory, alongside the baseline timings when available
+    """
+    for scenario, result in results.items():
+        print("\n{}".format(scenario))
+        print("-" * 50)
+        if "error" in result:
+            print("Error: {}".format(result["error"]))
+            continue
+        expected = baseline.get(scenario, {}).get("stages", {})
+        for name, stats in result["stages"].items():
+            line = "{:<26} {:>6} calls {:>9.3f}s".format(name, stats["calls"], stats["seconds"])
+            if "peak_mb" in stats:
+                line += " {:>9.2f} MB".format(stats["peak_mb"])
+            if name in expected:
+                line += " (baseline {:.3f}s)".format(expected[name]["seconds"])
+            print(line)
+        print("{:<26} {:>16.3f}s".format("total", result["total"]))
+
+
+def main():
+    backtest_cache.directory = None
+    if args.scaling:
+        results = benchmark_scaling(args.scaling, args.scaling_years, args.scaling_indices, args.repeats, args.memory)
+        report_scaling(results)
+        chart_scaling(results, args.chart)
+        print("\nChart saved to {}".format(args.chart))
+        return 0
+
+    overrides = {name: getattr(args, name) for name in ["start", "end", "indices"] if getattr(args, name) is not None}
+    results = {}
+    for scenario in args.scenarios:
+        try:
+            if scenario in STARTUP:
+                results[scenario] = benchmark_startup(STARTUP[scenario], args.repeats)
+            else:
+                results[scenario] = benchmark_scenario({**SCENARIOS[scenario], **overrides}, args.repeats,
+                                                       args.memory)
+        except Exception as e:
+            results[scenario] = {"error": repr(e)}
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["scenarios"]
+    report(results, baseline)
+
+    if args.save:
+        if os.path.dirname(args.baseline) and not os.path.exists(os.path.dirname(args.baseline)):
+            os.makedirs(os.path.dirname(args.baseline))
+        with open(args.baseline, 'w') as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "scenarios": results},
+                      f, indent=2)
+        print("\nBaseline saved to {}".format(args.baseline))
+        return 0
+
+    failed = False
+    errors = [scenario for scenario, result in results.items() if "error" in result]
+    if errors:
+        print("\nFailed scenarios: {}".format(", ".join(errors)))
+        failed = True
+    regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    if regressions:
+        print("\nRegressions")
+        for regression in regressions:
+            print(regression)
+        failed = True
+    return 1 if failed else 0
+
+
+def str2bool(v):
+    if isinstance(v, bool):
+        return v
+    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Boolean value expected.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='INVEST backtest pipeline benchmarks')
+    parser.add_argument("--scenarios", type=str, nargs='+', default=list(SCENARIOS) + list(STARTUP),
+                        choices=list(SCENARIOS) + list(STARTUP))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--memory", type=str2bool, default=True)
+    parser.add_argument("--baseline", type=str, default=os.path.join('benchmarks', 'baseline.json'))
+    parser.add_argument("--save", type=str2bool, default=False)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min_seconds", type=float, default=0.05)
+    parser.add_argument("--start", type=int, default=None, help="First year of every scenario")
+    parser.add_argument("--end", type=int, default=None, help="Year after the last year of every scenario")
+    parser.add_argument("--indices", type=str, nargs='+', default=None, help="Share index codes of every scenario")
+    parser.add_argument("--scaling", type=int, nargs='+', default=None,
+                        help="Benchmark synthetic datasets of these numbers of companies instead of the scenarios")
+    parser.add_argument("--scaling_years", type=int, default=30)
+    parser.add_argument("--scaling_indices", type=int, default=4)
+    parser.add_argument("--chart", type=str, default=os.path.join('benchmarks', 'scaling.png'))
+    args = parser.parse_args()
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def rolling_correlation(data, window, output_file=None, refresh=250):
+    """
+    Computes the Pearson correlation matrix of every rolling window over a price panel. Running sums of the
+    window are updated with the entering and leaving day, an O(N^2) update per day instead of a full
+    recomputation per window. The sums are recomputed exactly every refresh days to bound rounding drift.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Price panel (T x N)
+    window : int
+        Window length in days
+    output_file : str, optional
+        .npy file to write the correlation matrices to as a memory-mapped array, held in memory if None
+    refresh : int, optional
+        Number of days between exact recomputations of the running sums
+
+    Returns
+    -------
+    numpy.ndarray
+        Correlation matrices (T - window + 1 x N x N) in float32, where entry t covers days t to t + window - 1
+    """
+    data = np.asarray(data, dtype=np.float64)
+    data = data - data.mean(axis=0)
+    steps, nodes = data.shape[0] - window + 1, data.shape[1]
+    if output_file:
+        corr = np.lib.format.open_memmap(output_file, mode='w+', dtype=np.float32, shape=(steps, nodes, nodes))
+    else:
+        corr = np.empty((steps, nodes, nodes), dtype=np.float32)
+
+    for t in range(steps):
+        if t % refresh == 0:
+            sums = data[t:t + window].sum(axis=0)
+            products = data[t:t + window].T.dot(data[t:t + window])
+        else:
+            entering, leaving = data[t + window - 1], data[t - 1]
+            sums += entering - leaving
+            products += np.outer(entering, entering)
+            products -= np.outer(leaving, leaving)
+        mean = sums / window
+        cov = products / window - np.outer(mean, mean)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_std = 1 / np.sqrt(np.diag(cov))
+        corr[t] = np.clip(cov * inv_std[:, None] * inv_std[None, :], -1, 1)
+
+    if output_file:
+        corr.flush()
+    return corr
+
+
+def load_rolling_correlation(output_file):
+    """
+    Memory-maps correlation matrices written by rolling_correlation
+
+    Parameters
+    ----------
+    output_file : str
+        .npy file containing the correlation matrices
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.load(output_file, mmap_mode='r')
+
+
+def rolling_correlation_matrix(dataset, window, period=-1):
+    """
+    Returns the correlation matrix of a single rolling window of a dataset. The rolling matrices are computed
+    once and cached next to the dataset, so later periods are read from the memory-mapped file.
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset CSV file
+    window : int
+        Window length in days
+    period : int, optional
+        Index of the window, the latest window by default
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    output_file = os.path.splitext(dataset)[0] + '_corr_' + str(window) + '.npy'
+    if os.path.isfile(output_file):
+        corr = load_rolling_correlation(output_file)
+    else:
+        corr = rolling_correlation(pd.read_csv(dataset).values, window, output_file)
+    return np.array(corr[period], dtype=np.float64)
@@ -8,12 +8,18 @@ import seaborn as sn
 from matplotlib import cm
 
 from cluster import spectral_bicluster
-from network import build_network, generate_network_metrics, build_hierarchical_network, generate_adjacency_network
+from correlation import rolling_correlation_matrix
+from network import build_network, generate_network_metrics, build_hierarchical_network, generate_adjacency_network, \
+    network_adjacency, adjacency_graph
 
 
 def run():
     df = pd.read_csv(args.raw, delimiter=',')
-    corr = df.corr()
+    if args.window:
+        corr = pd.DataFrame(rolling_correlation_matrix(args.raw, args.window, args.period),
+                            index=df.columns, columns=df.columns)
+    else:
+        corr = df.corr()
     df_cluster = pd.DataFrame()
     graph = None
 
@@ -21,12 +27,14 @@ def run():
         df_cluster = spectral_bicluster(corr, 2)
 
     if args.network:
-        if args.hierarchical:
+        if args.window:
+            graph = adjacency_graph(network_adjacency(corr.values, args.n, args.hierarchical), corr.columns)
+        elif args.hierarchical:
             graph = build_hierarchical_network(df, args.n)
-            df_metrics = generate_network_metrics(df, args.n, True)
         else:
             graph = build_network(df, args.n)
-            df_metrics = generate_network_metrics(df, args.n)
+        df_metrics = generate_network_metrics(df, args.n, args.hierarchical, args.k, args.workers, args.cache_dir,
+                                              corr)
         if args.save:
             df_metrics.to_csv('network_metrics.csv', index=False)
 
@@ -89,6 +97,11 @@ if __name__ == '__main__':
     parser.add_argument('--hierarchical', type=str2bool, default=False)
     parser.add_argument('--n', type=int, default=5)
     parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--k', type=int, default=None)
+    parser.add_argument('--window', type=int, default=None)
+    parser.add_argument('--period', type=int, default=-1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache_dir', type=str, default=os.path.join('output', 'network_metrics'))
     parser.add_argument('--save', type=str2bool, default=True)
     args = parser.parse_args()
     run()
@@ -1,9 +1,93 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import networkx as nx
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from networkx.algorithms import community
 
 
+def top_k_edges(v_corr, n):
+    """
+    Returns the directed edges linking each share to its n maximally correlated shares. The diagonal is masked
+    so that a share is never selected as one of its own correlations.
+
+    Parameters
+    ----------
+    v_corr : numpy.ndarray
+        Correlation matrix (N x N)
+    n : int
+        Number of maximal correlations
+
+    Returns
+    -------
+    numpy.ndarray
+        Edge array (N * n x 2) of row and column indices
+    """
+    v_corr = np.array(v_corr, dtype=np.float64)
+    np.fill_diagonal(v_corr, -np.inf)
+    n = min(n, v_corr.shape[0] - 1)
+    idx = np.argpartition(v_corr, -n, axis=1)[:, -n:]
+    return np.column_stack([np.repeat(np.arange(v_corr.shape[0]), n), idx.ravel()])
+
+
+def network_adjacency(v_corr, n, hierarchical=False):
+    """
+    Returns the symmetric sparse adjacency matrix of a correlation network. The maximal n correlations for each
+    share specify the edges. The hierarchical network also links each share to the maximal correlations of its
+    maximally correlated shares, computed as the product of the top-n adjacency matrix with itself.
+
+    Parameters
+    ----------
+    v_corr : numpy.ndarray
+        Correlation matrix (N x N)
+    n : int
+        Number of maximal correlations
+    hierarchical: bool, optional
+        Build a hierarchical correlation network
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+    """
+    edges = top_k_edges(v_corr, n)
+    adj = sp.csr_matrix((np.ones(edges.shape[0], dtype=np.int32), (edges[:, 0], edges[:, 1])),
+                        shape=(len(v_corr), len(v_corr)))
+    if hierarchical:
+        adj = adj + adj.dot(adj)
+    adj = adj + adj.T
+    adj.setdiag(0)
+    adj.eliminate_zeros()
+    adj.data[:] = 1
+    return adj
+
+
+def adjacency_graph(adj, columns):
+    """
+    Builds a network from a sparse adjacency matrix, labelling nodes with share names
+
+    Parameters
+    ----------
+    adj : scipy.sparse.spmatrix
+        Symmetric adjacency matrix
+    columns : pandas.Index
+        Share names
+
+    Returns
+    -------
+    graph : networkx.Graph
+    """
+    upper = sp.triu(adj, k=1).tocoo()
+    names = np.asarray(columns)
+    graph = nx.Graph()
+    graph.add_edges_from(zip(names[upper.row], names[upper.col]))
+    return graph
+
+
 def build_network(df, n=5):
     """
     Builds a correlation network using correlation matrix data. The maximal n correlations for each share
@@ -21,20 +105,7 @@ def build_network(df, n=5):
     graph : networkx.Graph
     """
     corr = df.corr()
-    v_corr = corr.values
-    graph = nx.Graph()
-    edges = {}
-
-    for i, a in enumerate(v_corr):
-        idx = np.argpartition(np.delete(a, i), -n)[-n:]
-        edges[corr.columns[i]] = \
-            np.delete(corr.columns[idx].values, np.where(corr.columns[idx].values == corr.columns[i]))
-
-    for k, v in edges.items():
-        for n_ in v:
-            graph.add_edge(k, n_)
-
-    return graph
+    return adjacency_graph(network_adjacency(corr.values, n), corr.columns)
 
 
 def build_hierarchical_network(df, n=5):
@@ -55,31 +126,87 @@ def build_hierarchical_network(df, n=5):
     graph : networkx.Graph
     """
     corr = df.corr()
-    v_corr = corr.values
-    graph = nx.Graph()
-    edges = {}
+    return adjacency_graph(network_adjacency(corr.values, n, True), corr.columns)
 
-    for i, a in enumerate(v_corr):
-        idx = np.argpartition(np.delete(a, i), -n)[-n:]
-        edges[corr.columns[i]] = \
-            np.delete(corr.columns[idx].values, np.where(corr.columns[idx].values == corr.columns[i]))
 
-    for k, v in edges.items():
-        for n_ in v:
-            graph.add_edge(k, n_)
-            for e in edges[n_]:
-                if graph.has_edge(k, e) or k == e:
-                    continue
-                graph.add_edge(k, e)
-
-    # print(dict(reversed(sorted(nx.betweenness_centrality(graph).items(), key=lambda item: item[1]))))
-    # print(dict(reversed(sorted(nx.degree_centrality(graph).items(), key=lambda item: item[1]))))
-    return graph
+def _level_metrics(v_corr, columns, i, hierarchical=False, k=None):
+    """
+    Computes the core network metrics of the correlation network for density level i
 
+    Parameters
+    ----------
+    v_corr : numpy.ndarray
+        Correlation matrix
+    columns : pandas.Index
+        Share names
+    i : int
+        Number of maximal correlations
+    hierarchical: bool, optional
+        Build a hierarchical correlation network
+    k : int, optional
+        Number of sampled nodes used to approximate betweenness centrality, exact if None
 
-def generate_network_metrics(df, n=10, hierarchical=False):
+    Returns
+    -------
+    dict
     """
-    Builds successively denser correlation networks and computes and returns core network metrics
+    graph = adjacency_graph(network_adjacency(v_corr, i, hierarchical), columns)
+    degree_dict = nx.degree_centrality(graph)
+    if k is not None:
+        k = min(k, graph.number_of_nodes())
+    betweenness_dict = nx.betweenness_centrality(graph, k=k, normalized=True, endpoints=True, seed=0)
+    closeness_dict = nx.closeness_centrality(graph)
+    communities_generator = community.girvan_newman(graph)
+    top_level_communities = next(communities_generator)
+    next_level_communities = next(communities_generator)
+
+    return {'Edges': graph.number_of_edges(), 'Network Density': round(nx.density(graph), 2),
+            'Betweenness Centrality': round(np.mean(list(betweenness_dict.values())), 2),
+            'Degree Centrality': round(np.mean(list(degree_dict.values())), 2),
+            'Closeness Centrality': round(np.mean(list(closeness_dict.values())), 2), '# Correlations': i,
+            'Top Level Communities': len(top_level_communities),
+            'Next Level Communities': len(next_level_communities),
+            'Transitivity': round(nx.transitivity(graph), 2)}
+
+
+METRICS_VERSION = 2
+
+_shared_corr = None
+
+
+def _init_worker(v_corr, columns):
+    """
+    Stores the correlation matrix once per worker process so that it is not sent with every density level
+    """
+    global _shared_corr
+    _shared_corr = (v_corr, columns)
+
+
+def _worker_level_metrics(i, hierarchical, k):
+    return _level_metrics(*_shared_corr, i, hierarchical, k)
+
+
+def _cache_key(v_corr, columns, hierarchical, k):
+    """
+    Returns the digest of the correlation matrix and the metric options that keys the cached levels
+    """
+    key = hashlib.sha1(np.ascontiguousarray(v_corr).tobytes())
+    key.update(json.dumps([METRICS_VERSION, [str(c) for c in columns], hierarchical, k]).encode())
+    return key.hexdigest()
+
+
+def _cache_file(cache_dir, key, i):
+    """
+    Returns the cache file of a density level
+    """
+    return os.path.join(cache_dir, key, str(i) + '.json')
+
+
+def generate_network_metrics(df, n=10, hierarchical=False, k=None, workers=None, cache_dir=None, corr=None):
+    """
+    Builds successively denser correlation networks and computes and returns core network metrics.
+    The correlation matrix is computed once and density levels are processed in parallel worker processes.
+    Levels found in the cache are not recomputed.
 
     Parameters
     ----------
@@ -89,58 +216,53 @@ def generate_network_metrics(df, n=10, hierarchical=False):
         Number of maximal correlations
     hierarchical: bool, optional
         Build a hierarchical correlation network
+    k : int, optional
+        Number of sampled nodes used to approximate betweenness centrality, exact if None
+    workers : int, optional
+        Number of worker processes, defaults to the number of processors
+    cache_dir : str, optional
+        Directory to cache per-level metrics, caching is disabled if None
+    corr : pandas.DataFrame, optional
+        Precomputed correlation matrix, such as a single rolling window, used instead of the full history
 
     Returns
     -------
     df : pandas.DataFrame
     """
-    corr = df.corr()
+    if corr is None:
+        corr = df.corr()
     v_corr = corr.values
+    columns = corr.columns
 
-    df = pd.DataFrame(columns=['Edges', 'Network Density', 'Betweenness Centrality', 'Degree Centrality',
-                               'Closeness Centrality', '# Correlations', 'Top Level Communities',
-                               'Next Level Communities', 'Transitivity'])
-
+    # The matrix is hashed once for all levels
+    key = _cache_key(v_corr, columns, hierarchical, k) if cache_dir else None
+    rows = {}
     for i in range(1, n + 1):
-        graph = nx.Graph()
-        edges = {}
-        for j, a in enumerate(v_corr):
-            idx = np.argpartition(np.delete(a, j), -i)[-i:]
-            edges[corr.columns[j]] = \
-                np.delete(corr.columns[idx].values, np.where(corr.columns[idx].values == corr.columns[j]))
-
-        for k, v in edges.items():
-            for n_ in v:
-                graph.add_edge(k, n_)
-                if hierarchical:
-                    for e in edges[n_]:
-                        if graph.has_edge(k, e):
-                            continue
-                        graph.add_edge(k, e)
-
-        degree_dict = nx.degree_centrality(graph)
-        betweenness_dict = nx.betweenness_centrality(graph, normalized=True, endpoints=True)
-        closeness_dict = nx.closeness_centrality(graph)
-        communities_generator = community.girvan_newman(graph)
-        top_level_communities = next(communities_generator)
-        next_level_communities = next(communities_generator)
-
-        df = df.append({'Edges': graph.number_of_edges(), 'Network Density': round(nx.density(graph), 2),
-                        'Betweenness Centrality': round(np.mean(list(betweenness_dict.values())), 2),
-                        'Degree Centrality': round(np.mean(list(degree_dict.values())), 2), 'Closeness Centrality':
-                            round(np.mean(list(closeness_dict.values())), 2), 'Correlations': i,
-                        'Top Level Communities': len(sorted(map(sorted, top_level_communities))),
-                        'Next Level Communities': len(sorted(map(sorted, next_level_communities))),
-                        'Transitivity': round(nx.transitivity(graph), 2)}, ignore_index=True)
-
-    d = nx.coloring.greedy_color(graph, strategy="largest_first")
-    d_ = {}
-    for k, v in d.items():
-        if v not in d_:
-            d_[v] = [k]
-        else:
-            d_[v].append(k)
-    return df
+        if cache_dir and os.path.isfile(_cache_file(cache_dir, key, i)):
+            with open(_cache_file(cache_dir, key, i), 'r') as f:
+                rows[i] = json.load(f)
+    levels = [i for i in range(1, n + 1) if i not in rows]
+
+    if workers == 1 or len(levels) <= 1:
+        computed = [_level_metrics(v_corr, columns, i, hierarchical, k) for i in levels]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(v_corr, columns)) as executor:
+            computed = list(executor.map(_worker_level_metrics, levels, repeat(hierarchical), repeat(k)))
+
+    for i, row in zip(levels, computed):
+        rows[i] = row
+        if cache_dir:
+            output_file = _cache_file(cache_dir, key, i)
+            if not os.path.exists(os.path.dirname(output_file)):
+                os.makedirs(os.path.dirname(output_file))
+            with open(output_file, 'w') as f:
+                json.dump(row, f, default=float)
+
+    return pd.DataFrame([rows[i] for i in range(1, n + 1)],
+                        columns=['Edges', 'Network Density', 'Betweenness Centrality', 'Degree Centrality',
+                                 'Closeness Centrality', '# Correlations', 'Top Level Communities',
+                                 'Next Level Communities', 'Transitivity'])
 
 
 def generate_adjacency_network(df):
@@ -1,9 +1,7 @@
 import json
 import os
 
-import matplotlib.pyplot as plt
 import pandas as pd
-import seaborn as sn
 import torch
 import torch.utils.data
 
@@ -96,6 +94,10 @@ def custom_test(test_data, args, result_train_file):
     model = load_model(result_train_file)
 
     if model.final_adj:
+        # Plotting libraries are only needed for the adjacency heatmap
+        import matplotlib.pyplot as plt
+        import seaborn as sn
+
         adj = model.final_adj[0].detach().cpu().numpy()
         sn.set(font_scale=0.5)
         columns = pd.read_csv('data/' + args.dataset + '.csv').columns
@@ -133,6 +133,26 @@ class ForecastDataset(torch_data.Dataset):
         return x_end_idx
 
 
+def load_price_matrix(dataset):
+    """
+    Loads a price matrix, preferring the memory-mapped .npy output of the preprocessing builder
+    over the CSV output when both exist
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset name
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    data_file = os.path.join('data', dataset)
+    if os.path.isfile(data_file + '.npy'):
+        return np.load(data_file + '.npy', mmap_mode='r')
+    return pd.read_csv(data_file + '.csv').values
+
+
 def load_dataset(dataset, train_length, valid_length, test_length):
     """
     Performs the inverse operation to return the denormalize the scaled data
@@ -152,8 +172,7 @@ def load_dataset(dataset, train_length, valid_length, test_length):
     -------
     (numpy.ndarray, numpy.ndarray, numpy.ndarray)
     """
-    data_file = os.path.join('data', dataset + '.csv')
-    data = pd.read_csv(data_file).values
+    data = load_price_matrix(dataset)
 
     train_ratio = train_length / (train_length + valid_length + test_length)
     valid_ratio = valid_length / (train_length + valid_length + test_length)
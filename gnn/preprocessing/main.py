@@ -1,42 +1,173 @@
 import argparse
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sn
 
 
+def read_share_file(path, columns, date_column='Date', delimiter=';'):
+    """
+    Reads only the date and price columns of a single share file, indexed by date
+
+    Parameters
+    ----------
+    path : str
+        Share file path
+    columns : list
+        Price columns to parse
+    date_column : str, optional
+        Name of the date column
+    delimiter : str, optional
+        Field delimiter
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    df = pd.read_csv(path, delimiter=delimiter, usecols=[date_column] + columns,
+                     dtype=dict.fromkeys(columns, np.float64))
+    df.index = pd.to_datetime(df.pop(date_column))
+    return df[~df.index.duplicated()]
+
+
+def build_price_matrix(paths, names, columns, price, date_column='Date', delimiter=';', min_rows=0, workers=None):
+    """
+    Reads share files in parallel and aligns their prices on a common date index with a single concatenation.
+    Missing prices are filled with zero and rows are ordered from oldest to newest.
+
+    Parameters
+    ----------
+    paths : list
+        Share file paths
+    names : list
+        Share names, one per path
+    columns : list
+        Price columns to parse from each file
+    price : callable
+        Maps the parsed columns of a share to its price series
+    date_column : str, optional
+        Name of the date column
+    delimiter : str, optional
+        Field delimiter
+    min_rows : int, optional
+        Shares with fewer rows are skipped
+    workers : int, optional
+        Number of reader threads
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    Raises
+    ------
+    ValueError
+        If no share file has at least min_rows rows
+    """
+
+    def read(path):
+        df = read_share_file(path, columns, date_column, delimiter)
+        if df.shape[0] < min_rows:
+            return None
+        return price(df)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        series = list(executor.map(read, paths))
+    prices = {name: s for name, s in zip(names, series) if s is not None}
+    if not prices:
+        directories = sorted(set(os.path.dirname(path) for path in paths)) or ["the given paths"]
+        raise ValueError("No share file in {} has at least {} rows".format(", ".join(directories), min_rows))
+    return pd.concat(prices, axis=1, copy=False).sort_index().fillna(0)
+
+
+def save_price_matrix(df, output_file, chunk_size=1024):
+    """
+    Writes a price matrix as a float32 .npy array in row chunks, alongside a .json file holding the share
+    names and dates. The array can be memory-mapped with numpy.load(..., mmap_mode='r').
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Price matrix (T x N)
+    output_file : str
+        Output path without extension
+    chunk_size : int, optional
+        Number of rows written per chunk
+    """
+    values = np.lib.format.open_memmap(output_file + '.npy', mode='w+', dtype=np.float32, shape=df.shape)
+    for start in range(0, df.shape[0], chunk_size):
+        values[start:start + chunk_size] = df.iloc[start:start + chunk_size].to_numpy(dtype=np.float32)
+    values.flush()
+    del values
+    with open(output_file + '.json', 'w') as f:
+        json.dump({'columns': [str(c) for c in df.columns], 'index': [str(i) for i in df.index]}, f)
+
+
+def write_output(df, output_file):
+    """
+    Writes a price matrix in the format selected on the command line
+    """
+    if args.format == 'npy':
+        save_price_matrix(df, output_file)
+    else:
+        df.to_csv(output_file + '.csv', index=False)
+
+
+def read_output(output_file):
+    """
+    Reads a price matrix written in the format selected on the command line
+    """
+    if args.format == 'npy':
+        with open(output_file + '.json', 'r') as f:
+            columns = json.load(f)['columns']
+        return pd.DataFrame(np.load(output_file + '.npy', mmap_mode='r'), columns=columns)
+    return pd.read_csv(output_file + '.csv')
+
+
+def output_exists(output_file):
+    """
+    Returns whether a price matrix has been written in the format selected on the command line
+    """
+    return os.path.isfile(output_file + '.' + args.format)
+
+
+def share_files(dir_):
+    """
+    Returns the share file paths in a directory, skipping hidden files
+    """
+    return [os.path.join(dir_, path) for path in sorted(os.listdir(dir_)) if not path.startswith('.')]
+
+
+def sb_name(path):
+    """
+    Returns the share name encoded in a SB file name
+    """
+    path = os.path.basename(path)
+    return path[path.index("-") + 1:path.index("2") - 1]
+
+
 def clean():
     if args.raw_folder and args.source == 'SB' and args.price == 'C':
-        if not os.path.isfile(args.output + '_clean_truncated.csv') or not os.path.isfile(args.output + '_clean.csv'):
+        if not output_exists(args.output + '_clean_truncated') or not output_exists(args.output + '_clean'):
             start_time = time.time()
-            clean_df = pd.DataFrame()
-            dir_ = args.raw_folder + '_' + args.source
-            for path in os.listdir(dir_):
-                if path == ".DS_Store":
-                    continue
-
-                name = path[path.index("-") + 1:path.index("2") - 1]
-                df = pd.read_csv(os.path.join(dir_, path), delimiter=';')
-                if args.truncate and df.shape[0] < 3000:
-                    continue
-                clean_df[name] = pd.to_numeric(df['Closing (c)'])
-                clean_df[name].fillna(0, inplace=True)
-
-            clean_df = clean_df.reindex(index=clean_df.index[::-1])
+            paths = share_files(args.raw_folder + '_' + args.source)
+            clean_df = build_price_matrix(paths, [sb_name(p) for p in paths], ['Closing (c)'],
+                                          lambda df: df['Closing (c)'], args.date_column,
+                                          min_rows=3000 if args.truncate else 0, workers=args.workers)
             if args.truncate:
-                output_file = args.output + "_clean_truncated.csv"
-                clean_df.tail(3146).to_csv(output_file, index=False)
+                write_output(clean_df.tail(3146), args.output + "_clean_truncated")
             else:
-                output_file = args.output + "_clean.csv"
-                clean_df.to_csv(output_file, index=False)
+                write_output(clean_df, args.output + "_clean")
             print("Processing Time: {:5.2f}s".format(time.time() - start_time))
 
         if args.truncate:
-            df = pd.read_csv(args.output + "_clean_truncated.csv")
+            df = read_output(args.output + "_clean_truncated")
         else:
-            df = pd.read_csv(args.output + "_clean.csv")
+            df = read_output(args.output + "_clean")
         corr = df.corr()
         if args.plot:
             sn.set(font_scale=0.5)
@@ -44,66 +175,43 @@ def clean():
             plt.savefig(os.path.join('img', 'JSE_corr.png'), dpi=300, bbox_inches='tight')
 
     elif args.raw_folder and args.source == 'SB' and args.price == 'VWAP':
-        if not os.path.isfile(args.output + '_clean_truncated_VWAP.csv') \
-                or not os.path.isfile(args.output + '_clean_VWAP.csv'):
+        if not output_exists(args.output + '_clean_truncated_VWAP') or not output_exists(args.output + '_clean_VWAP'):
             start_time = time.time()
-            clean_df = pd.DataFrame()
-            dir_ = args.raw_folder + '_' + args.source
-            for path in os.listdir(dir_):
-                if path == ".DS_Store":
-                    continue
-
-                name = path[path.index("-") + 1:path.index("2") - 1]
-                df = pd.read_csv(os.path.join(dir_, path), delimiter=';')
-                if args.truncate and df.shape[0] < 3000:
-                    continue
-                clean_df[name] = pd.to_numeric((df['Closing (c)'] + df['High (c)'] + df['Low (c)']) / 3)
-                clean_df[name].fillna(0, inplace=True)
-
-            clean_df = clean_df.reindex(index=clean_df.index[::-1])
+            paths = share_files(args.raw_folder + '_' + args.source)
+            clean_df = build_price_matrix(paths, [sb_name(p) for p in paths], ['Closing (c)', 'High (c)', 'Low (c)'],
+                                          lambda df: df.sum(axis=1, min_count=3) / 3, args.date_column,
+                                          min_rows=3000 if args.truncate else 0, workers=args.workers)
             if args.truncate:
-                output_file = args.output + "_clean_truncated_VWAP.csv"
-                clean_df.tail(3146).to_csv(output_file, index=False)
+                write_output(clean_df.tail(3146), args.output + "_clean_truncated_VWAP")
             else:
-                output_file = args.output + "_clean_VWAP.csv"
-                clean_df.to_csv(output_file, index=False)
+                write_output(clean_df, args.output + "_clean_VWAP")
             print("Processing Time: {:5.2f}s".format(time.time() - start_time))
 
     elif args.raw_folder and args.source == 'IRESS':
         if not os.path.isfile(args.output):
             start_time = time.time()
-            clean_df = pd.DataFrame()
-            for path in os.listdir(args.raw_folder):
-                if path == ".DS_Store":
-                    continue
-                name = path[0:path.index(".")]
-                print(name)
-                df = pd.read_csv(os.path.join(args.raw_folder, path), delimiter=';')
-                clean_df[name] = pd.to_numeric(df['Close'])
-                clean_df[name].fillna(0, inplace=True)
-
-            clean_df.reindex(index=clean_df.index[::-1]).to_csv(args.output + "_GNN_clean.csv", index=False)
+            paths = share_files(args.raw_folder)
+            names = [os.path.basename(p)[0:os.path.basename(p).index(".")] for p in paths]
+            clean_df = build_price_matrix(paths, names, ['Close'], lambda df: df['Close'], args.date_column,
+                                          workers=args.workers)
+            write_output(clean_df, args.output + "_GNN_clean")
             print("Processing Time: {:5.2f}s".format(time.time() - start_time))
 
-        df = pd.read_csv(args.output + "_GNN_clean.csv")
+        df = read_output(args.output + "_GNN_clean")
         print(df.head())
 
     elif "SP500" in args.raw:
         if not os.path.isfile(args.output):
             start_time = time.time()
-            df = pd.read_csv(args.raw + '_raw.csv')
-            clean_df = pd.DataFrame()
-            names = df['Name'].unique()
+            df = pd.read_csv(args.raw + '_raw.csv', usecols=['Name', 'close'], dtype={'close': np.float64})
+            prices = {name: pd.Series(group.values) for name, group in df.groupby('Name', sort=False)['close']
+                      if group.shape[0] == 1259}
+            clean_df = pd.concat(prices, axis=1, copy=False)
 
-            for name in names:
-                df_ = pd.DataFrame(df.loc[df['Name'] == name]['close'].values, columns=[name])
-                if df_.shape[0] == 1259:
-                    clean_df = pd.concat([clean_df, df_], axis=1)
-
-            clean_df.to_csv(args.output + "_clean.csv", index=False)
+            write_output(clean_df, args.output + "_clean")
             print("Processing Time: {:5.2f}s".format(time.time() - start_time))
 
-        df = pd.read_csv(args.output + "_clean.csv")
+        df = read_output(args.output + "_clean")
         sample_df = df[['AAPL', 'AMZN', 'FB', 'GOOGL', "MSFT", "XRAY"]]
         corr = sample_df.corr()
         if args.plot:
@@ -114,16 +222,13 @@ def clean():
     elif "INVEST" in args.raw:
         if not os.path.isfile(args.output):
             start_time = time.time()
-            df = pd.read_csv(args.raw + '_raw.csv', delimiter=";")
-            clean_df = pd.DataFrame()
-            names = df['Company'].unique()
-
-            for name in names:
-                df_ = pd.DataFrame(df.loc[df['Company'] == name]['Close'].values, columns=[name])
-                clean_df = pd.concat([clean_df, df_], axis=1)
+            df = pd.read_csv(args.raw + '_raw.csv', delimiter=";", usecols=['Company', 'Close'],
+                             dtype={'Close': np.float64})
+            prices = {name: pd.Series(group.values) for name, group in df.groupby('Company', sort=False)['Close']}
+            clean_df = pd.concat(prices, axis=1, copy=False)
 
             print(clean_df.shape)
-            clean_df.to_csv(args.output + "_clean.csv", index=False)
+            write_output(clean_df, args.output + "_clean")
             print("Processing Time: {:5.2f}s".format(time.time() - start_time))
 
 
@@ -136,5 +241,8 @@ if __name__ == '__main__':
     parser.add_argument('--price', type=str, default='C')
     parser.add_argument('--plot', type=bool, default=False)
     parser.add_argument('--truncate', type=bool, default=True)
+    parser.add_argument('--date_column', type=str, default='Date')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--format', type=str, default='csv', choices=['csv', 'npy'])
     args = parser.parse_args()
     clean()
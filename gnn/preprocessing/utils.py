@@ -1,5 +1,6 @@
 import numpy as np
 
+from gnn.analysis.correlation import rolling_correlation_matrix
 from gnn.utils import calculate_scaled_laplacian, symmetric_adjacency, asymmetric_adjacency, \
     calculate_normalized_laplacian, correlation_adjacency_matrix
 
@@ -41,7 +42,7 @@ def process_data(data, window_size, horizon):
     return x, y
 
 
-def process_adjacency_matrix(adj_data, adj_type):
+def process_adjacency_matrix(adj_data, adj_type, window=None, period=-1):
     """
     Preprocesses a Graph WaveNet adjacency matrix
 
@@ -51,12 +52,19 @@ def process_adjacency_matrix(adj_data, adj_type):
         File containing adjacency matrix data
     adj_type : str
         Adjacency matrix transformation type
+    window : int, optional
+        Rolling correlation window length, the full history is used if None
+    period : int, optional
+        Index of the rolling correlation window, the latest window by default
 
     Returns
     -------
     [numpy.ndarray]
     """
-    adj = correlation_adjacency_matrix(adj_data)
+    if window:
+        adj = rolling_correlation_matrix(adj_data, window, period)
+    else:
+        adj = correlation_adjacency_matrix(adj_data)
     if adj_type == "scaled_laplacian":
         adj = [calculate_scaled_laplacian(adj)]
     elif adj_type == "normalized_laplacian":
@@ -9,6 +9,7 @@ import torch
 import gnn.evaluation.test_
 import gnn.train
 import gnn.training.baseline
+from gnn.analysis.correlation import rolling_correlation_matrix
 from gnn.preprocessing.loader import load_dataset
 from gnn.preprocessing.utils import process_adjacency_matrix
 from gnn.utils import correlation_adjacency_matrix
@@ -69,6 +70,8 @@ parser.add_argument('--leakyrelu_rate', type=int, default=0.2)
 # GWN arguments
 parser.add_argument('--adj_data', type=str2bool, default=False)
 parser.add_argument('--adj_type', type=str, default='double_transition')
+parser.add_argument('--adj_window', type=int, default=None)
+parser.add_argument('--adj_period', type=int, default=-1)
 parser.add_argument('--gcn_bool', type=str2bool, default=True)
 parser.add_argument('--apt_only', type=str2bool, default=True)
 parser.add_argument('--adapt_adj', type=str2bool, default=True)
@@ -117,7 +120,8 @@ args.node_cnt = train_data.shape[1]
 
 if args.adj_data:
     if args.model == 'GWN':
-        adj_matrix = process_adjacency_matrix(os.path.join('data', args.dataset + '.csv'), args.adj_type)
+        adj_matrix = process_adjacency_matrix(os.path.join('data', args.dataset + '.csv'), args.adj_type,
+                                              args.adj_window, args.adj_period)
         args.supports = [torch.tensor(i).to(args.device) for i in adj_matrix]
         if args.apt_only:
             args.supports = None
@@ -129,7 +133,11 @@ if args.adj_data:
                 args.adj_init = args.supports[0]
 
     if args.model == 'MTGNN':
-        adj_matrix = correlation_adjacency_matrix(os.path.join('data', args.dataset + '.csv')).astype(np.float32)
+        if args.adj_window:
+            adj_matrix = rolling_correlation_matrix(os.path.join('data', args.dataset + '.csv'),
+                                                    args.adj_window, args.adj_period).astype(np.float32)
+        else:
+            adj_matrix = correlation_adjacency_matrix(os.path.join('data', args.dataset + '.csv')).astype(np.float32)
         adj_matrix = torch.tensor(adj_matrix) - torch.eye(args.node_cnt)
         args.adj_matrix = adj_matrix.to(args.device)
 else:
@@ -0,0 +1,25 @@
+import gc
+import multiprocessing
+import os
+
+# Production serving: gunicorn -c gunicorn.conf.py
+# The application, share data, benchmark data, decision networks and, with INVEST_WARM_GNN=1, the GNN model are
+# loaded once in the master and shared copy-on-write with the forked workers. Check /ready on a worker to confirm
+# warm-up.
+# Identical concurrent /invest/ queries are coalesced in memory within a worker. Across workers they are serialised
+# by lock files in INVEST_FLIGHT_DIR and later ones read the backtest memo, so INVEST_BACKTEST_CACHE must be set
+# for a query to be computed once by the whole server.
+wsgi_app = "wsgi:app"
+bind = "0.0.0.0:" + os.environ.get("PORT", "8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+
+def pre_fork(server, worker):
+    # Move the preloaded objects to the permanent generation so that garbage collection in the workers
+    # does not touch, and therefore copy, their pages
+    gc.freeze()
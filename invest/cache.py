@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from invest.networks.spec import network_spec
+from invest.store import universe_ratios
+from invest.tracing import cache_access, stage
+
+# Increment when universe_ratios changes so that persisted ratios are recomputed
+RATIOS_VERSION = 2
+# Increment when the decisions or prices of investment_portfolios change so that persisted backtests are recomputed
+BACKTEST_VERSION = 1
+# Parameters the outcome of a backtest year depends on
+BACKTEST_PARAMETERS = ["margin_of_safety", "beta", "extension", "ablation", "network", "gnn", "horizon",
+                       "holding_period"]
+
+
+def dataset_hash(df):
+    """
+    Returns a hash of the contents of a data frame
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Fundamental and price data
+
+    Returns
+    -------
+    str
+    """
+    h = hashlib.sha1(str(RATIOS_VERSION).encode())
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+class DatasetCache:
+    """
+    Base of the caches of values derived from a dataset by year, held in memory and, when a directory is given,
+    on disk as one JSON file per key and year
+    """
+
+    def __init__(self, directory=None):
+        """
+        Parameters
+        ----------
+        directory : str, optional
+            Directory the values are persisted to, values are only held in memory if None
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.years = {}
+        self._last = (None, None)
+
+    def _hash(self, df):
+        # Data frames are treated as immutable, so the hash of the most recent one is reused
+        last_df, last_hash = self._last
+        if last_df is df:
+            return last_hash
+        h = dataset_hash(df)
+        self._last = (df, h)
+        return h
+
+    def _path(self, h, year):
+        return os.path.join(self.directory, "{}_{}.json".format(h, year))
+
+    def _load(self, h, year):
+        if self.directory is None:
+            return {}
+        try:
+            with open(self._path(h, year), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, h, year, values):
+        # Each writer has its own temporary file, so concurrent processes saving the same year never write over
+        # each other and the last replace wins. The values stay in memory if they cannot be persisted.
+        path = self._path(h, year)
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(values, f)
+            os.replace(tmp, path)
+        except OSError:
+            logging.exception("Could not save %s", path)
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self):
+        """
+        Clears the values held in memory
+        """
+        with self.lock:
+            self.years = {}
+            self._last = (None, None)
+
+
+class RatioCache(DatasetCache):
+    """
+    Caches the raw ratios of each company by (dataset hash, year, company) in memory and, when a directory is
+    given, on disk as one JSON file per dataset and year. The ratios do not depend on the margin of safety or
+    beta threshold, so changing either only requires thresholding the cached ratios.
+    """
+
+    def year_ratios(self, df, companies, year):
+        """
+        Returns the ratios of each company for the given year, computing and persisting those not yet cached
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Fundamental and price data
+        companies : list
+            Companies to evaluate
+        year : int
+            The year calculations need to be computed for
+
+        Returns
+        -------
+        dict
+            Ratios named in invest.store.RATIOS of each company
+        """
+        # The ratios are computed outside the lock, so lookups of other datasets and years are not held up. Concurrent
+        # lookups of the same missing companies may both compute them, with the same result.
+        h = self._hash(df)
+        with self.lock:
+            if (h, year) not in self.years:
+                self.years[(h, year)] = self._load(h, year)
+            cached = self.years[(h, year)]
+            missing = [company for company in companies if company not in cached]
+        cache_access("ratios", not missing)
+        if missing:
+            with stage("ratios"):
+                ratios_ = universe_ratios(df, missing, [year])
+            with self.lock:
+                for i, company in enumerate(missing):
+                    cached[company] = {k: float(v[0, i]) for k, v in ratios_.items()}
+                if self.directory is not None:
+                    self._save(h, year, cached)
+        with self.lock:
+            return {company: cached[company] for company in companies}
+
+
+def backtest_key(params, spec=network_spec):
+    """
+    Returns a hash of the parameters and networks that the outcome of a backtest year depends on
+
+    Parameters
+    ----------
+    params : argparse.Namespace
+        Command line arguments
+    spec : invest.networks.spec.NetworkSpec, optional
+        Network specification
+
+    Returns
+    -------
+    str
+    """
+    key = {name: getattr(params, name) for name in BACKTEST_PARAMETERS}
+    key["version"] = BACKTEST_VERSION
+    key["networks"] = spec.digest
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class BacktestCache(DatasetCache):
+    """
+    Memo of the outcome of each backtest year by (dataset hash, parameters hash, year, company) in memory and,
+    when a directory is given, on disk as one JSON file per dataset, parameters and year. A company is stored
+    with its initial price, current price and beta when it is investable and None otherwise, so extending the
+    range of a backtest only decides the new years and companies. Backtests with GNN predictions are not memoised,
+    as the key does not cover the model and price data the predictions are made from.
+    """
+
+    def year_results(self, df, params, year, companies):
+        """
+        Returns the memoised outcome of each company in the given year
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Fundamental and price data
+        params : argparse.Namespace
+            Command line arguments
+        year : int
+            Backtest year
+        companies : list
+            Companies to return
+
+        Returns
+        -------
+        (dict, list)
+            Outcome of each memoised company and the companies that are not memoised
+        """
+        with self.lock:
+            h = "{}_{}".format(self._hash(df), backtest_key(params))
+            if (h, year) not in self.years:
+                self.years[(h, year)] = self._load(h, year)
+            cached = self.years[(h, year)]
+            missing = [company for company in companies if company not in cached]
+            if missing and self.directory is not None:
+                # Another process may have memoised them since the year was loaded
+                cached.update(self._load(h, year))
+                missing = [company for company in companies if company not in cached]
+            cache_access("backtest", not missing)
+            return {company: cached[company] for company in companies if company in cached}, missing
+
+    def update(self, df, params, year, results):
+        """
+        Memoises the outcome of companies in the given year
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Fundamental and price data
+        params : argparse.Namespace
+            Command line arguments
+        year : int
+            Backtest year
+        results : dict
+            Initial price, current price and beta of each investable company, None for the others
+        """
+        with self.lock:
+            h = "{}_{}".format(self._hash(df), backtest_key(params))
+            if (h, year) not in self.years:
+                self.years[(h, year)] = self._load(h, year)
+            cached = self.years[(h, year)]
+            cached.update(results)
+            if self.directory is not None:
+                self._save(h, year, cached)
+
+
+ratio_cache = RatioCache(os.environ.get("INVEST_RATIO_CACHE", os.path.join("output", "ratios")) or None)
+backtest_cache = BacktestCache(os.environ.get("INVEST_BACKTEST_CACHE", os.path.join("output", "backtests")) or None)
@@ -0,0 +1,214 @@
+import numpy as np
+
+# Array versions of invest.calculator.ratios. Inputs broadcast over leading dimensions, e.g. companies or
+# (years, companies), with histories along the last axis. Results are masked where an input is NaN or a
+# denominator is zero.
+
+
+def divide(numerator, denominator):
+    """
+    Returns numerator / denominator, masked where either is undefined or the denominator is zero
+
+    Parameters
+    ----------
+    numerator : array_like
+    denominator : array_like
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    numerator = np.ma.masked_invalid(numerator)
+    denominator = np.ma.masked_invalid(denominator)
+    denominator = np.ma.masked_equal(denominator, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.ma.divide(numerator, denominator)
+
+
+def mean(values, axis=-1):
+    """
+    Returns the mean along an axis, masked if any value along the axis is undefined
+
+    Parameters
+    ----------
+    values : array_like
+    axis : int, optional
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    values = np.ma.masked_invalid(values)
+    return np.ma.array(values.mean(axis=axis), mask=np.ma.getmaskarray(values).any(axis=axis))
+
+
+def historic_earnings_growth_rate(eps):
+    """
+    Returns the Historic Earnings Growth Rate
+
+    Parameters
+    ----------
+    eps : numpy.ndarray
+        Earnings per share for consecutive years along the last axis
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return mean(divide(eps[..., 1:], eps[..., :-1]).filled(np.nan))
+
+
+def historic_earnings_cagr(eps_n, eps_prev_x, x):
+    """
+    Returns the Historic Earnings Compound Growth Rate. As in the scalar version, growth from or to negative
+    earnings is taken as zero.
+
+    Parameters
+    ----------
+    eps_n : numpy.ndarray
+        Earnings per share for year N (current year)
+    eps_prev_x : numpy.ndarray
+        Earnings per share for year N-x
+    x : int
+        Number of years into the past
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    ratio = divide(eps_n, eps_prev_x)
+    with np.errstate(invalid='ignore'):
+        growth = np.power(ratio.filled(np.nan), 1 / x) - 1
+    zero_denominator = np.ma.getmaskarray(ratio) & ~np.isnan(eps_n) & ~np.isnan(eps_prev_x)
+    return np.ma.array(np.where(np.isnan(growth), 0, growth), mask=zero_denominator)
+
+
+def historic_price_to_earnings_share(prices, eps):
+    """
+    Returns the Historic Price to Earnings
+
+    Parameters
+    ----------
+    prices : numpy.ndarray
+        Share prices along the last axis
+    eps : numpy.ndarray
+        Earnings per share along the last axis
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return divide(mean(prices), mean(eps))
+
+
+def forward_earnings(eps, historic_earnings_growth_rate_):
+    """
+    Returns the Forward Earnings
+
+    Parameters
+    ----------
+    eps : numpy.ndarray
+        Earnings per share of current year
+    historic_earnings_growth_rate_ : numpy.ndarray
+        Historic Earning Growth Rate
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return np.ma.masked_invalid(eps) * historic_earnings_growth_rate_
+
+
+def forward_price_to_earnings(share_price, forward_earnings_):
+    """
+    Returns the Forward Price to Earnings
+
+    Parameters
+    ----------
+    share_price : numpy.ndarray
+        Current share price
+    forward_earnings_ : numpy.ndarray
+        Forward Earnings for current year
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return divide(share_price, forward_earnings_)
+
+
+def pe_relative(historic_price_to_earnings_share_, pe_reference):
+    """
+    Returns the Price to Earnings relative to the market or sector. Undefined reference PEs are skipped.
+
+    Parameters
+    ----------
+    historic_price_to_earnings_share_ : numpy.ndarray
+        Historic Price to Earnings of the share
+    pe_reference : numpy.ndarray
+        Price to Earnings of the market or sector for past years along the last axis
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    reference = np.ma.masked_invalid(pe_reference).mean(axis=-1)
+    return divide(historic_price_to_earnings_share_, np.ma.filled(reference, np.nan))
+
+
+def cost_of_equity(market_return_rate, risk_free_return_rate, share_beta):
+    """
+    Returns the Cost of Equity
+
+    Parameters
+    ----------
+    market_return_rate : numpy.ndarray
+         Market rate of return for the current year
+    risk_free_return_rate : numpy.ndarray
+        Risk free rate of return for the current year
+    share_beta: numpy.ndarray
+        Beta of share on last day of the year
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    risk_free_return_rate = np.ma.masked_invalid(risk_free_return_rate)
+    return risk_free_return_rate + np.ma.masked_invalid(share_beta) * (
+            np.ma.masked_invalid(market_return_rate) - risk_free_return_rate)
+
+
+def relative_debt_to_equity(debt_equity, debt_equity_industry):
+    """
+    Returns the Relative Debt to Equity
+
+    Parameters
+    ----------
+    debt_equity : numpy.ndarray
+         Debt Equity of the share
+    debt_equity_industry : numpy.ndarray
+        Debt Equity of the industry
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return divide(debt_equity, debt_equity_industry)
+
+
+def current_pe(current_share_pe, current_reference_pe):
+    """
+    Returns the Price to Earnings relative to the market or sector for the current year
+
+    Parameters
+    ----------
+    current_share_pe : numpy.ndarray
+        PE of the current share
+    current_reference_pe : numpy.ndarray
+        PE of the market or sector
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return divide(current_share_pe, current_reference_pe)
@@ -0,0 +1,221 @@
+import numpy as np
+
+from invest.calculator.array_ratios import divide
+from invest.states import STATE_DTYPE, Relative, SystematicRisk, Value
+
+# Array versions of invest.calculator.threshold returning int8 state codes from invest.states. Inputs and
+# thresholds broadcast, e.g. ratios over companies against margins of safety over a leading axis. States of
+# masked ratios are masked.
+
+
+def _relative_state(relative, margin_of_safety, lower, upper, within, lower_first):
+    relative = np.ma.masked_invalid(relative)
+    r = np.ma.getdata(relative)
+    m = np.asarray(margin_of_safety)
+    below, above = r <= -m, r >= m
+    conditions = [below, above] if lower_first else [above, below]
+    codes = np.select(conditions + [(m > r) & (r > -m)], [lower, upper, within] if lower_first else
+                      [upper, lower, within], default=-1).astype(STATE_DTYPE)
+    mask = np.broadcast_to(np.ma.getmaskarray(relative), codes.shape) | (codes < 0)
+    return np.ma.array(codes, mask=mask)
+
+
+# Negative Earnings - Rule 1
+def negative_earnings(forward_earnings):
+    """
+    Returns whether forward earnings are negative, False where undefined
+
+    Parameters
+    ----------
+    forward_earnings : numpy.ndarray
+        Forward earnings of the shares
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.ma.filled(np.ma.masked_invalid(forward_earnings) < 0, False)
+
+
+# Negative Shareholders Equity - Rule 2
+def negative_shareholders_equity(shareholders_equity):
+    """
+    Returns whether shareholders equity is negative, False where undefined
+
+    Parameters
+    ----------
+    shareholders_equity : numpy.ndarray
+        Shareholders Equity
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.ma.filled(np.ma.masked_invalid(shareholders_equity) < 0, False)
+
+
+# Specified Beta - Rule 3
+def beta_classify(share_beta, beta_threshold):
+    """
+    Returns whether share betas are within the beta threshold, False where undefined
+
+    Parameters
+    ----------
+    share_beta : numpy.ndarray
+        Beta of shares
+    beta_threshold : numpy.ndarray
+        Threshold for beta
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.ma.filled(np.ma.masked_invalid(share_beta) <= beta_threshold, False)
+
+
+# Acceptable Stock - Rule 4
+def acceptable_stock(negative_earnings_, negative_shareholders_equity_, beta):
+    """
+    Returns whether stocks are acceptable
+
+    Parameters
+    ----------
+    negative_earnings_ : numpy.ndarray
+         Classification of negative earnings
+    negative_shareholders_equity_ : numpy.ndarray
+        Classification of negative shareholders equity
+    beta : numpy.ndarray
+        Classification of share beta
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return ~negative_earnings_ & ~negative_shareholders_equity_ & beta
+
+
+def pe_relative_share(margin_of_safety, current_pe, historic_pe):
+    """
+    Returns Value states for the current PE relative to the share market or sector against its history
+
+    Parameters
+    ----------
+    margin_of_safety : numpy.ndarray
+        Margin of safety value
+    current_pe : numpy.ndarray
+        Current PE relative share market or sector
+    historic_pe : numpy.ndarray
+        Historic PE relative share market or sector
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return _relative_state(divide(current_pe, historic_pe) - 1, margin_of_safety, Value.CHEAP, Value.EXPENSIVE,
+                           Value.FAIR_VALUE, True)
+
+
+# ForwardPE Current vs. History - rule 7
+def forward_pe(margin_of_safety, forward_pe_, historical_pe):
+    """
+    Returns Value states for the forward PE current vs History value
+
+    Parameters
+    ----------
+    margin_of_safety : numpy.ndarray
+        Margin of safety value
+    forward_pe_ : numpy.ndarray
+        Forward PE
+    historical_pe : numpy.ndarray
+        Historical PE
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return pe_relative_share(margin_of_safety, forward_pe_, historical_pe)
+
+
+# ROE vs. COE - rule 8
+def roe_coe(margin_of_safety, roe, coe):
+    """
+    Returns Relative states for the ROE vs COE
+
+    Parameters
+    ----------
+    margin_of_safety : numpy.ndarray
+        Margin of safety value
+    roe : numpy.ndarray
+        Return on Equity
+    coe : numpy.ndarray
+        Cost of Equity
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return _relative_state(divide(roe, coe) - 1, margin_of_safety, Relative.BELOW, Relative.ABOVE,
+                           Relative.EQUAL_TO, False)
+
+
+# CAGR vs. Inflation - rule 9
+def cagr_inflation(margin_of_safety, cagr, inflation):
+    """
+    Returns Relative states for CAGR vs Inflation
+
+    Parameters
+    ----------
+    margin_of_safety : numpy.ndarray
+        Margin of safety value
+    cagr : numpy.ndarray
+        Compound Annual Growth Rate
+    inflation : numpy.ndarray
+        Inflation rate
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return _relative_state(divide(np.ma.masked_invalid(cagr) * 100, inflation) - 1, margin_of_safety,
+                           Relative.BELOW, Relative.ABOVE, Relative.EQUAL_TO, False)
+
+
+# Relative Debt to Equity - rule 10
+def relative_debt_to_equity(margin_of_safety, relative_d_e):
+    """
+    Returns Relative states for Relative Debt to Equity
+
+    Parameters
+    ----------
+    margin_of_safety : numpy.ndarray
+        Margin of safety value
+    relative_d_e : numpy.ndarray
+        Relative Debt to Equity
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    return _relative_state(np.ma.masked_invalid(relative_d_e) - 1, margin_of_safety, Relative.BELOW, Relative.ABOVE,
+                           Relative.EQUAL_TO, False)
+
+
+# Extension
+def systematic_risk_classification(share_beta):
+    """
+    Returns Systematic Risk states
+
+    Parameters
+    ----------
+    share_beta : numpy.ndarray
+       Beta of the shares
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    share_beta = np.ma.masked_invalid(share_beta)
+    b = np.ma.getdata(share_beta)
+    codes = np.select([b < 1, b == 1, b > 1], [SystematicRisk.LOWER, SystematicRisk.EQUAL_TO, SystematicRisk.GREATER],
+                      default=-1).astype(STATE_DTYPE)
+    return np.ma.array(codes, mask=np.ma.getmaskarray(share_beta) | (codes < 0))
@@ -1,3 +1,6 @@
+from invest.states import Relative, SystematicRisk, Value
+
+
 # Negative Earnings - Rule 1
 def negative_earnings(forward_earnings):
     """
@@ -106,15 +109,16 @@ def current_pe_relative_share_market(margin_of_safety, current_pe_relative_share
 
     Returns
     -------
-    str
+    invest.states.Value
+        None if undefined
     """
     if current_pe_relative_share_market_ / historic_pe_relative_share_market - 1 <= -margin_of_safety:
-        return "cheap"
+        return Value.CHEAP
     elif current_pe_relative_share_market_ / historic_pe_relative_share_market - 1 >= margin_of_safety:
-        return "expensive"
+        return Value.EXPENSIVE
     elif margin_of_safety > current_pe_relative_share_market_ / historic_pe_relative_share_market - 1 > \
             -margin_of_safety:
-        return "fairValue"
+        return Value.FAIR_VALUE
 
 
 def current_pe_relative_share_sector(margin_of_safety, current_pe_relative_share_sector_,
@@ -133,15 +137,16 @@ def current_pe_relative_share_sector(margin_of_safety, current_pe_relative_share
 
     Returns
     -------
-    str
+    invest.states.Value
+        None if undefined
     """
     if current_pe_relative_share_sector_ / historic_pe_relative_share_sector - 1 <= -margin_of_safety:
-        return "cheap"
+        return Value.CHEAP
     elif current_pe_relative_share_sector_ / historic_pe_relative_share_sector - 1 >= margin_of_safety:
-        return "expensive"
+        return Value.EXPENSIVE
     elif margin_of_safety > current_pe_relative_share_sector_ / historic_pe_relative_share_sector - 1 > \
             -margin_of_safety:
-        return "fairValue"
+        return Value.FAIR_VALUE
 
 
 # ForwardPE Current vs. History - rule 7
@@ -160,14 +165,15 @@ def forward_pe(margin_of_safety, forward_pe_, historical_pe):
 
     Returns
     -------
-    str
+    invest.states.Value
+        None if undefined
     """
     if forward_pe_ / historical_pe - 1 <= -margin_of_safety:
-        return "cheap"
+        return Value.CHEAP
     elif forward_pe_ / historical_pe - 1 >= margin_of_safety:
-        return "expensive"
+        return Value.EXPENSIVE
     elif margin_of_safety > forward_pe_ / historical_pe - 1 > -margin_of_safety:
-        return "fairValue"
+        return Value.FAIR_VALUE
 
 
 # ROE vs. COE - rule 8
@@ -186,14 +192,15 @@ def roe_coe(margin_of_safety, roe, coe):
 
     Returns
     -------
-    str
+    invest.states.Relative
+        None if undefined
     """
     if roe / coe - 1 >= margin_of_safety:
-        return "above"
+        return Relative.ABOVE
     elif roe / coe - 1 <= -margin_of_safety:
-        return "below"
+        return Relative.BELOW
     elif margin_of_safety > roe / coe - 1 > -margin_of_safety:
-        return "EqualTo"
+        return Relative.EQUAL_TO
 
 
 # CAGR vs. Inflation - rule 9
@@ -212,15 +219,16 @@ def cagr_inflation(margin_of_safety, cagr, inflation):
 
     Returns
     -------
-    str
+    invest.states.Relative
+        None if undefined
     """
     cagr = cagr * 100
     if cagr / inflation - 1 >= margin_of_safety:
-        return "above"
+        return Relative.ABOVE
     elif cagr / inflation - 1 <= -margin_of_safety:
-        return "below"
+        return Relative.BELOW
     elif margin_of_safety > cagr / inflation - 1 > -margin_of_safety:
-        return "EqualTo"
+        return Relative.EQUAL_TO
 
 
 # Relative Debt to Equity - rule 10
@@ -237,14 +245,15 @@ def relative_debt_to_equity(margin_of_safety, relative_d_e):
 
     Returns
     -------
-    str
+    invest.states.Relative
+        None if undefined
     """
     if relative_d_e - 1 >= margin_of_safety:
-        return "above"
+        return Relative.ABOVE
     elif relative_d_e - 1 <= -margin_of_safety:
-        return "below"
+        return Relative.BELOW
     elif margin_of_safety > relative_d_e - 1 > -margin_of_safety:
-        return "EqualTo"
+        return Relative.EQUAL_TO
 
 
 # Extension
@@ -259,11 +268,12 @@ def systematic_risk_classification(share_beta):
 
     Returns
     -------
-    str
+    invest.states.SystematicRisk
+        None if undefined
     """
     if share_beta < 1:
-        return "lower"
+        return SystematicRisk.LOWER
     if share_beta == 1:
-        return "EqualTo"
+        return SystematicRisk.EQUAL_TO
     if share_beta > 1:
-        return "greater"
+        return SystematicRisk.GREATER
@@ -1,22 +1,36 @@
-import json
-
+import numpy as np
 import pandas as pd
 
 import invest.evaluation.validation as validation
+from invest.cache import backtest_cache, ratio_cache
+from invest.networks import solver
 from invest.networks.invest_recommendation import investment_recommendation
 from invest.networks.quality_evaluation import quality_network
 from invest.networks.value_evaluation import value_network
 from invest.prediction.main import future_share_price_performance
-from invest.preprocessing.simulation import simulate
+from invest.preprocessing.simulation import perturb
+from invest.states import STATE_DTYPE, Investable, Quality, Value
 from invest.store import Store
+from invest.tracing import stage
+from invest.universe import universe
+
+INDEX_CODES = ["JGIND", "JCSEV"]
+
 
-companies_jcsev = json.load(open('data/jcsev.json'))['names']
-companies_jgind = json.load(open('data/jgind.json'))['names']
-companies = companies_jcsev + companies_jgind
-companies_dict = {"JCSEV": companies_jcsev, "JGIND": companies_jgind}
+def __getattr__(name):
+    # Module level universe lists of the original indices, loaded on demand
+    if name == "companies_jcsev":
+        return universe.members("JCSEV")
+    if name == "companies_jgind":
+        return universe.members("JGIND")
+    if name == "companies":
+        return universe.companies(["JCSEV", "JGIND"])
+    if name == "companies_dict":
+        return {index_code: universe.members(index_code) for index_code in ["JCSEV", "JGIND"]}
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
-def investment_portfolio(df_, params, index_code, verbose=False):
+def investment_portfolio(df_, params, index_code, verbose=False, callback=None, benchmark=True):
     """
     Decides the shares for inclusion in an investment portfolio using INVEST
     Bayesian networks. Computes performance metrics for the IP and benchmark index.
@@ -28,88 +42,188 @@ def investment_portfolio(df_, params, index_code, verbose=False):
     params : argparse.Namespace
         Command line arguments
     index_code: str,
-        Johannesburg Stock Exchange sector index code
+        Share index code of invest.universe
     verbose: bool, optional
         Print output to console
+    callback: callable, optional
+        Called with the year, its investable shares and their annual return as soon as each year is decided
+    benchmark: bool, optional
+        Compute the benchmark index metrics
 
     Returns
     -------
     portfolio: dict
     """
-    if params.noise:
-        df = simulate(df_)
-    else:
-        df = df_
+    callback_ = None
+    if callback is not None:
+        def callback_(index_code_, year, shares, annual_return):
+            callback(year, shares, annual_return)
+    return investment_portfolios(df_, params, [index_code], verbose, callback_, benchmark)[index_code]
+
+
+def investment_portfolios(df_, params, index_codes=INDEX_CODES, verbose=False, callback=None, benchmark=True):
+    """
+    Decides the shares for inclusion in the investment portfolio of each index using INVEST Bayesian networks.
+    The constituents of every index are thresholded in a single Store pass per year and each company is decided
+    once per year, however many indices it belongs to. The outcome of each year is memoised in
+    invest.cache.backtest_cache, unless testing noise, so only the years and companies not yet backtested with the
+    same data and parameters are decided. Computes performance metrics for the IP and benchmark index of each index.
+
+    Parameters
+    ----------
+    df_ : pandas.DataFrame
+        Fundamental and price data
+    params : argparse.Namespace
+        Command line arguments
+    index_codes: list, optional
+        Share index codes of invest.universe
+    verbose: bool, optional
+        Print output to console
+    callback: callable, optional
+        Called with the index code, year, its investable shares and their annual return as soon as each year is
+        decided
+    benchmark: bool, optional
+        Compute the benchmark index metrics
+
+    Returns
+    -------
+    dict
+        Portfolio of each index
+    """
+    # Noise is applied to the rows each Store reads rather than to a copy of the share data
+    overlay = perturb(df_) if params.noise else None
+    if verbose and overlay is not None:
+        print("\nNoise overlay: {:.2f} MB, share data: {:.2f} MB".format(
+            overlay.nbytes / 2 ** 20, df_.memory_usage(deep=True).sum() / 2 ** 20))
 
-    prices_initial = {}
-    prices_current = {}
-    betas = {}
-    investable_shares = {}
+    prices_initial = {index_code: {} for index_code in index_codes}
+    prices_current = {index_code: {} for index_code in index_codes}
+    betas = {index_code: {} for index_code in index_codes}
+    investable_shares = {index_code: {} for index_code in index_codes}
 
+    # Noisy backtests differ on every run, and GNN predictions depend on a model and price data outside the key
+    memo = None if params.noise or params.gnn else backtest_cache
     for year in range(params.start, params.end):
-        store = Store(df, companies, companies_jcsev, companies_jgind,
-                      params.margin_of_safety, params.beta, year, False)
-        investable_shares[str(year)] = []
-        prices_initial[str(year)] = []
-        prices_current[str(year)] = []
-        betas[str(year)] = []
-        if params.gnn:
-            df_future_performance = future_share_price_performance(year, horizon=params.horizon)
+        companies = universe.companies(index_codes, year)
+        if memo is not None:
+            results, missing = memo.year_results(df_, params, year, companies)
         else:
-            df_future_performance = pd.DataFrame()
-        for company in companies_dict[index_code]:
-            if store.get_acceptable_stock(company):
-                if not df_future_performance.empty:
-                    future_performance = df_future_performance[company][0]
-                else:
-                    future_performance = None
-                if investment_decision(store, company, future_performance, params.extension, params.ablation,
-                                       params.network) \
-                        == "Yes":
-                    mask = (df_['Date'] >= str(year) + '-01-01') & (
-                            df_['Date'] <= str(year) + '-12-31') & (df_['Name'] == company)
-                    df_year = df_[mask]
-
-                    investable_shares[str(year)].append(company)
-                    prices_initial[str(year)].append(df_year.iloc[0]['Price'])
-                    prices_current[str(year)].append(df_year.iloc[params.holding_period]['Price'])
-                    betas[str(year)].append(df_year.iloc[params.holding_period]["ShareBeta"])
-
-    if verbose:
-        print("\n{} {} - {}".format(index_code, params.start, params.end))
-        print("-" * 50)
-        print("\nInvestable Shares")
-        for year in range(params.start, params.end):
-            print(year, "IP." + index_code, len(investable_shares[str(year)]), investable_shares[str(year)])
-
-    ip_ar, ip_cr, ip_aar, ip_treynor, ip_sharpe = validation.process_metrics(df_,
-                                                                             prices_initial,
-                                                                             prices_current,
-                                                                             betas,
-                                                                             params.start,
-                                                                             params.end,
-                                                                             index_code)
-    benchmark_ar, benchmark_cr, benchmark_aar, benchmark_treynor, benchmark_sharpe = \
-        validation.process_benchmark_metrics(params.start, params.end, index_code, params.holding_period)
-
-    portfolio = {
-        "ip": {
-            "shares": investable_shares,
-            "annualReturns": ip_ar,
-            "compoundReturn": ip_cr,
-            "averageAnnualReturn": ip_aar,
-            "treynor": ip_treynor,
-            "sharpe": ip_sharpe,
-        },
-        "benchmark": {
-            "annualReturns": benchmark_ar,
-            "compoundReturn": benchmark_cr,
-            "averageAnnualReturn": benchmark_aar,
-            "treynor": benchmark_treynor,
-            "sharpe": benchmark_sharpe,
+            results, missing = {}, companies
+        if missing:
+            results_ = decide_year(df_, params, year, missing, overlay)
+            if memo is not None:
+                memo.update(df_, params, year, results_)
+            results.update(results_)
+
+        for index_code in index_codes:
+            investable_shares[index_code][str(year)] = []
+            prices_initial[index_code][str(year)] = []
+            prices_current[index_code][str(year)] = []
+            betas[index_code][str(year)] = []
+            for company in universe.members(index_code, year):
+                if results.get(company) is not None:
+                    price_initial, price_current, beta = results[company]
+                    investable_shares[index_code][str(year)].append(company)
+                    prices_initial[index_code][str(year)].append(price_initial)
+                    prices_current[index_code][str(year)].append(price_current)
+                    betas[index_code][str(year)].append(beta)
+            if callback is not None:
+                callback(index_code, year, investable_shares[index_code][str(year)],
+                         validation.portfolio_annual_return(prices_initial[index_code][str(year)],
+                                                            prices_current[index_code][str(year)]))
+
+    portfolios = {}
+    for index_code in index_codes:
+        if verbose:
+            print("\n{} {} - {}".format(index_code, params.start, params.end))
+            print("-" * 50)
+            print("\nInvestable Shares")
+            for year in range(params.start, params.end):
+                print(year, "IP." + index_code, len(investable_shares[index_code][str(year)]),
+                      investable_shares[index_code][str(year)])
+
+        ip_ar, ip_cr, ip_aar, ip_treynor, ip_sharpe = validation.process_metrics(df_,
+                                                                                 prices_initial[index_code],
+                                                                                 prices_current[index_code],
+                                                                                 betas[index_code],
+                                                                                 params.start,
+                                                                                 params.end,
+                                                                                 index_code)
+        portfolio = {
+            "ip": {
+                "shares": investable_shares[index_code],
+                "annualReturns": ip_ar,
+                "compoundReturn": ip_cr,
+                "averageAnnualReturn": ip_aar,
+                "treynor": ip_treynor,
+                "sharpe": ip_sharpe,
+            }
         }
-    }
-    return portfolio
+        if benchmark:
+            benchmark_ar, benchmark_cr, benchmark_aar, benchmark_treynor, benchmark_sharpe = \
+                validation.process_benchmark_metrics(df_, params.start, params.end, index_code,
+                                                     params.holding_period)
+            portfolio["benchmark"] = {
+                "annualReturns": benchmark_ar,
+                "compoundReturn": benchmark_cr,
+                "averageAnnualReturn": benchmark_aar,
+                "treynor": benchmark_treynor,
+                "sharpe": benchmark_sharpe,
+            }
+        portfolios[index_code] = portfolio
+    return portfolios
+
+
+def decide_year(df_, params, year, companies, overlay=None):
+    """
+    Decides the shares of the given companies in a year and looks up the prices of those that are investable
+
+    Parameters
+    ----------
+    df_ : pandas.DataFrame
+        Fundamental and price data
+    params : argparse.Namespace
+        Command line arguments
+    year : int
+        Backtest year
+    companies : list
+        Companies to decide
+    overlay : invest.preprocessing.simulation.Overlay, optional
+        Noise applied to the data the decisions are made on when testing noise, returns are computed without it
+
+    Returns
+    -------
+    dict
+        Initial price, current price and beta of each investable company, None for the others
+    """
+    store = Store(df_, companies, params.margin_of_safety, params.beta, year, False,
+                  None if params.noise else ratio_cache, overlay)
+    if params.gnn:
+        df_future_performance = future_share_price_performance(year, horizon=params.horizon)
+    else:
+        df_future_performance = pd.DataFrame()
+    decisions = {}
+    for company in store.companies:
+        if store.get_acceptable_stock(company):
+            if not df_future_performance.empty:
+                future_performance = df_future_performance[company][0]
+            else:
+                future_performance = None
+            decisions[company] = investment_decision(store, company, future_performance, params.extension,
+                                                     params.ablation, params.network) == Investable.YES
+    with stage("data_access"):
+        mask = (df_['Date'] >= str(year) + '-01-01') & (df_['Date'] <= str(year) + '-12-31') & \
+               df_['Name'].isin([company for company, investable in decisions.items() if investable])
+        df_year = {company: rows for company, rows in df_[mask].groupby('Name', sort=False)}
+    results = {}
+    for company in companies:
+        if decisions.get(company, False):
+            results[company] = [float(df_year[company].iloc[0]['Price']),
+                                float(df_year[company].iloc[params.holding_period]['Price']),
+                                float(df_year[company].iloc[params.holding_period]["ShareBeta"])]
+        else:
+            results[company] = None
+    return results
 
 
 def investment_decision(store, company, future_performance=None, extension=False, ablation=False, network='v'):
@@ -133,7 +247,7 @@ def investment_decision(store, company, future_performance=None, extension=False
 
     Returns
     -------
-    str
+    invest.states.Investable
     """
     pe_relative_market = store.get_pe_relative_market(company)
     pe_relative_sector = store.get_pe_relative_sector(company)
@@ -144,17 +258,131 @@ def investment_decision(store, company, future_performance=None, extension=False
     cagr_vs_inflation = store.get_cagr_vs_inflation(company)
     systematic_risk = store.get_systematic_risk(company)
 
+    return state_decision(pe_relative_market, pe_relative_sector, forward_pe, roe_vs_coe, relative_debt_equity,
+                          cagr_vs_inflation, systematic_risk, future_performance, extension, ablation, network)
+
+
+def state_decision(pe_relative_market, pe_relative_sector, forward_pe, roe_vs_coe, relative_debt_equity,
+                   cagr_vs_inflation, systematic_risk, future_performance=None, extension=False, ablation=False,
+                   network='v'):
+    """
+    Returns an investment decision from the discrete states of a share
+
+    Parameters
+    ----------
+    pe_relative_market : invest.states.Value
+        Current PE relative to market state
+    pe_relative_sector : invest.states.Value
+        Current PE relative to sector state
+    forward_pe : invest.states.Value
+        Forward PE state
+    roe_vs_coe : invest.states.Relative
+        ROE vs COE state
+    relative_debt_equity : invest.states.Relative
+        Relative Debt to Equity state
+    cagr_vs_inflation : invest.states.Relative
+        CAGR vs Inflation state
+    systematic_risk : invest.states.SystematicRisk
+        Systematic Risk state, MISSING or None if not classified
+    future_performance: str, optional
+        FutureSharePerformance node state
+    extension: bool, optional
+        Use Quality Network systematic risk extension
+    ablation: bool, optional
+        Conduct ablation test
+    network: str, optional
+        Complement of network to ablate
+
+    Returns
+    -------
+    invest.states.Investable
+    """
     value_decision = value_network(pe_relative_market, pe_relative_sector, forward_pe, future_performance)
     quality_decision = quality_network(roe_vs_coe, relative_debt_equity, cagr_vs_inflation,
                                        systematic_risk, extension)
     if ablation and network == 'v':
-        if value_decision in ["Cheap", "FairValue"]:
-            return "Yes"
+        if value_decision in [Value.CHEAP, Value.FAIR_VALUE]:
+            return Investable.YES
         else:
-            return "No"
+            return Investable.NO
     if ablation and network == 'q':
-        if quality_decision in ["High", "Medium"]:
-            return "Yes"
+        if quality_decision in [Quality.HIGH, Quality.MEDIUM]:
+            return Investable.YES
         else:
-            return "No"
+            return Investable.NO
     return investment_recommendation(value_decision, quality_decision)
+
+
+def state_decisions(pe_relative_market, pe_relative_sector, forward_pe, roe_vs_coe, relative_debt_equity,
+                    cagr_vs_inflation, systematic_risk, future_performance=None, extension=False, ablation=False,
+                    network='v', parameters=None):
+    """
+    Returns the investment decisions of a batch of shares from their discrete states, as state_decision does for
+    a single share, solving the networks with invest.networks.solver
+
+    Parameters
+    ----------
+    pe_relative_market : numpy.ndarray
+        Current PE relative to market states (N)
+    pe_relative_sector : numpy.ndarray
+        Current PE relative to sector states (N)
+    forward_pe : numpy.ndarray
+        Forward PE states (N)
+    roe_vs_coe : numpy.ndarray
+        ROE vs COE states (N)
+    relative_debt_equity : numpy.ndarray
+        Relative Debt to Equity states (N)
+    cagr_vs_inflation : numpy.ndarray
+        CAGR vs Inflation states (N)
+    systematic_risk : numpy.ndarray
+        Systematic Risk states (N), MISSING if not classified
+    future_performance: numpy.ndarray, optional
+        Whether a FutureSharePerformance prediction is entered for each share (N)
+    extension: bool, optional
+        Use Quality Network systematic risk extension
+    ablation: bool, optional
+        Conduct ablation test
+    network: str, optional
+        Complement of network to ablate
+    parameters : dict, optional
+        Solver parameters of the value, quality and recommendation networks, shared or per share, those of the
+        network specification for any network not given
+
+    Returns
+    -------
+    numpy.ndarray
+        invest.states.Investable codes (N)
+    """
+    parameters = parameters or {}
+    pe_relative_market, pe_relative_sector, forward_pe = [np.asarray(s) for s in
+                                                          (pe_relative_market, pe_relative_sector, forward_pe)]
+    if future_performance is not None:
+        future_performance = np.where(np.asarray(future_performance, dtype=bool)[:, np.newaxis],
+                                      solver.FUTURE_PERFORMANCE, 1)
+    _, utilities = solver.value_utilities_hard(pe_relative_market, pe_relative_sector, forward_pe, future_performance,
+                                               parameters.get("value"))
+    # value_network takes the greatest posterior utility of ValueRelativeToPrice, which pyAgrum reports as zero
+    # for the decisions its policy does not take
+    policy = np.eye(3, dtype=bool)[solver.decisions(utilities)]
+    value_decision = solver.decisions(np.where(policy, utilities, 0))
+    # Forced decisions
+    fair_value = ((pe_relative_market == Value.CHEAP) & (pe_relative_sector == Value.EXPENSIVE)) | \
+                 ((pe_relative_market == Value.EXPENSIVE) & (pe_relative_sector == Value.CHEAP)) | \
+                 ((pe_relative_market == Value.FAIR_VALUE) & (pe_relative_sector == Value.FAIR_VALUE) &
+                  (forward_pe == Value.FAIR_VALUE))
+    value_decision = np.where((value_decision == Value.EXPENSIVE) & fair_value, Value.FAIR_VALUE, value_decision)
+
+    quality_decision = solver.decisions(solver.quality_utilities(
+        solver.hard_evidence(roe_vs_coe), solver.hard_evidence(relative_debt_equity),
+        solver.hard_evidence(cagr_vs_inflation), solver.hard_evidence(systematic_risk) if extension else None,
+        parameters.get("quality")))
+
+    if ablation and network == 'v':
+        investable = np.isin(value_decision, [Value.CHEAP, Value.FAIR_VALUE])
+    elif ablation and network == 'q':
+        investable = np.isin(quality_decision, [Quality.HIGH, Quality.MEDIUM])
+    else:
+        return solver.decisions(solver.recommendation_utilities(
+            solver.hard_evidence(value_decision), solver.hard_evidence(quality_decision),
+            parameters.get("recommendation"))).astype(STATE_DTYPE)
+    return np.where(investable, Investable.YES, Investable.NO).astype(STATE_DTYPE)
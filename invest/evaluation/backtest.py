@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+
+# Backtest engine over a dense (dates x companies) price matrix at the resolution of the data. Portfolios are
+# rebalanced to target weights on each rebalance date and drift with prices in between, so the NAV of every date is
+# the cumulative product of the growth of the completed holding periods and the growth of the current one. The cost
+# is proportional to the number of dates and companies whatever the rebalance frequency. Selections have any
+# leading batch dimensions, as in invest.evaluation.portfolio.
+
+SCHEDULES = {"annual": "Y", "quarterly": "Q", "monthly": "M"}
+WEIGHTINGS = ["shares", "equal"]
+
+
+def price_matrix(df, companies, start_year, end_year):
+    """
+    Returns the share prices of every date from the start to the end year, forward filled over gaps in the data
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Fundamental and price data
+    companies : list
+        Companies (C)
+    start_year : int
+    end_year : int
+        Year after the last year
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        Dates (D) as datetime64 and share prices (D x C), NaN before the first price of a company
+    """
+    df = df[df['Name'].isin(companies) & (df['Date'] >= str(start_year)) & (df['Date'] < str(end_year))]
+    prices = df.pivot_table(index='Date', columns='Name', values='Price', aggfunc='last')
+    prices = prices.reindex(columns=companies).sort_index().ffill()
+    return prices.index.to_numpy(dtype='datetime64[D]'), prices.to_numpy(dtype=np.float64)
+
+
+def rebalance_dates(dates, schedule="annual"):
+    """
+    Returns the positions of the rebalance dates in the dates of a price matrix
+
+    Parameters
+    ----------
+    dates : numpy.ndarray
+        Sorted dates (D)
+    schedule : Union[str, list], optional
+        annual, quarterly or monthly to rebalance on the first date of each period, or the dates to rebalance on,
+        each moved to the first date on or after it
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted positions (R)
+    """
+    if isinstance(schedule, str):
+        if schedule not in SCHEDULES:
+            raise ValueError("Unknown rebalance schedule {}, expected one of {}".format(schedule, list(SCHEDULES)))
+        periods = pd.PeriodIndex(dates, freq=SCHEDULES[schedule])
+        return np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    positions = np.searchsorted(dates, np.array(schedule, dtype='datetime64[D]'))
+    return np.unique(positions[positions < len(dates)])
+
+
+def target_weights(selected, prices, weighting="shares"):
+    """
+    Returns the fraction of the portfolio value held in each share on rebalancing
+
+    Parameters
+    ----------
+    selected : numpy.ndarray
+        Shares selected on each rebalance date (... x R x C)
+    prices : numpy.ndarray
+        Share prices on each rebalance date (R x C)
+    weighting : str, optional
+        shares to hold an equal number of each share selected, as in invest.evaluation.portfolio, or equal to hold
+        an equal value of each
+
+    Returns
+    -------
+    numpy.ndarray
+        Weights (... x R x C), zero for shares without a price and on dates without any share selected
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError("Unknown weighting {}, expected one of {}".format(weighting, WEIGHTINGS))
+    held = np.asarray(selected, dtype=bool) & ~np.isnan(prices)
+    values = np.where(held, prices if weighting == "shares" else 1.0, 0)
+    total = values.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, values / total, 0)
+
+
+def backtest(selected, dates, prices, rebalance, weighting="shares"):
+    """
+    Backtests portfolios rebalanced to the shares selected on each rebalance date. Value not invested in shares,
+    before the first rebalance or while nothing is selected, is held as cash without return.
+
+    Parameters
+    ----------
+    selected : numpy.ndarray
+        Shares selected on each rebalance date (... x R x C)
+    dates : numpy.ndarray
+        Dates of the price matrix (D)
+    prices : numpy.ndarray
+        Share prices (D x C)
+    rebalance : numpy.ndarray
+        Positions of the rebalance dates (R)
+    weighting : str, optional
+        shares or equal, see target_weights
+
+    Returns
+    -------
+    dict
+        NAV and drawdown of each date (... x D), maximum drawdown (...), turnover of each rebalance (... x R) and
+        the dates and rebalance dates
+    """
+    rebalance = np.asarray(rebalance)
+    weights = target_weights(selected, prices[rebalance], weighting)
+    # Holding period of each date, -1 before the first rebalance
+    period = np.searchsorted(rebalance, np.arange(len(dates)), side='right') - 1
+    held = period >= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Growth of each share since the start of the holding period of each date and over each holding period
+        growth = np.nan_to_num(prices[held] / prices[rebalance[period[held]]], nan=1.0)
+        ends = np.r_[rebalance[1:], len(dates) - 1]
+        period_growth = np.nan_to_num(prices[ends] / prices[rebalance], nan=1.0)
+    cash = 1 - weights.sum(axis=-1)
+    period_value = np.einsum('...rc,rc->...r', weights, period_growth) + cash
+    # NAV at the start of each holding period
+    nav_start = np.cumprod(np.concatenate([np.ones(period_value.shape[:-1] + (1,)), period_value[..., :-1]], -1), -1)
+    nav = np.ones(weights.shape[:-2] + (len(dates),))
+    nav[..., held] = nav_start[..., period[held]] * \
+        (np.einsum('...dc,dc->...d', weights[..., period[held], :], growth) + cash[..., period[held]])
+
+    # Weights drifted to the end of each holding period, the portfolio starts in cash
+    drifted = np.zeros_like(weights)
+    drifted_cash = np.ones_like(cash)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drifted[..., 1:, :] = weights[..., :-1, :] * period_growth[:-1] / period_value[..., :-1, np.newaxis]
+        drifted_cash[..., 1:] = cash[..., :-1] / period_value[..., :-1]
+    turnover = (np.abs(weights - drifted).sum(axis=-1) + np.abs(cash - drifted_cash)) / 2
+
+    drawdown = nav / np.maximum.accumulate(nav, axis=-1) - 1
+    return {"dates": dates,
+            "rebalanceDates": dates[rebalance],
+            "nav": nav,
+            "drawdown": drawdown,
+            "maxDrawdown": drawdown.min(axis=-1),
+            "turnover": turnover}
+
+
+def period_returns(nav, dates, freq="Y"):
+    """
+    Returns the change in NAV over each period, from the last date of the previous period, or the initial NAV of 1
+    for the first period, to the last date of the period, so that the returns chain to the final NAV
+
+    Parameters
+    ----------
+    nav : numpy.ndarray
+        NAV of each date (... x D)
+    dates : numpy.ndarray
+        Dates (D)
+    freq : str, optional
+        Pandas period frequency, Y for years
+
+    Returns
+    -------
+    numpy.ndarray
+        Returns (... x P)
+    """
+    periods = pd.PeriodIndex(dates, freq=freq)
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    ends = np.r_[starts[1:] - 1, len(dates) - 1]
+    closing = nav[..., ends]
+    opening = np.concatenate([np.ones(closing.shape[:-1] + (1,)), closing[..., :-1]], -1)
+    return closing / opening - 1
+
+
+def selection_matrix(shares, companies, years):
+    """
+    Converts the shares selected in each year, as returned by investment_portfolios, to a selection matrix
+
+    Parameters
+    ----------
+    shares : dict
+        Shares selected in each year, keyed by the year as a string
+    companies : list
+        Companies (C)
+    years : list
+        Years (Y)
+
+    Returns
+    -------
+    numpy.ndarray
+        Selection (Y x C)
+    """
+    return np.array([np.isin(companies, shares.get(str(year), [])) for year in years], dtype=bool) \
+        .reshape(len(years), len(companies))
+
+
+def backtest_selections(df, selected, companies, years, schedule="annual", weighting="shares"):
+    """
+    Backtests the shares selected in each year with a rebalance schedule. On every rebalance date the portfolio
+    is rebalanced to the selection of the year of the date.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Fundamental and price data
+    selected : numpy.ndarray
+        Shares selected in each year (... x Y x C)
+    companies : list
+        Companies (C)
+    years : list
+        Consecutive years (Y)
+    schedule : Union[str, list], optional
+        Rebalance schedule, see rebalance_dates
+    weighting : str, optional
+        shares or equal, see target_weights
+
+    Returns
+    -------
+    dict
+        Result of backtest with the return of each year (... x Y), the compound annual return (...) and the mean
+        turnover of a rebalance (...)
+    """
+    dates, prices = price_matrix(df, companies, years[0], years[-1] + 1)
+    rebalance = rebalance_dates(dates, schedule)
+    year_index = dates[rebalance].astype('datetime64[Y]').astype(int) + 1970 - years[0]
+    result = backtest(np.asarray(selected)[..., year_index, :], dates, prices, rebalance, weighting)
+    result["annualReturns"] = period_returns(result["nav"], dates)
+    result["compoundReturn"] = result["nav"][..., -1] ** (1 / len(years)) - 1
+    result["meanTurnover"] = result["turnover"].mean(axis=-1)
+    return result
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+import invest.metrics.return_ as return_metrics
+from invest.preprocessing.dataloader import date_years
+
+# Vectorised portfolio analytics. Holdings are weights over (years x companies), with any leading batch dimensions,
+# e.g. noise trials or the margins and betas of a sweep, broadcast against (years x companies) price panels. A
+# portfolio of shares held in equal numbers has weights of 1 for the shares held and 0 otherwise, which gives the
+# metrics of process_metrics.
+
+
+def nth(groups, n):
+    """
+    Returns a mask of the nth row of each group, counted from the end of the group if n is negative
+
+    Parameters
+    ----------
+    groups : pandas.core.groupby.GroupBy
+        Grouped rows
+    n : int
+        Position of the row
+
+    Returns
+    -------
+    pandas.Series
+    """
+    if n < 0:
+        return groups.cumcount(ascending=False) == -n - 1
+    return groups.cumcount() == n
+
+
+def price_panel(df, companies, years, holding_period=-1):
+    """
+    Returns share prices at the start of each year and at the end of the holding period, and share betas at the
+    end of the holding period
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Fundamental and price data
+    companies : list
+        Companies (C)
+    years : list
+        Years (Y)
+    holding_period : int, optional
+        Month offset into each year the shares are held until
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        Initial prices, current prices and share betas (Y x C), NaN where a company has no data for a year
+    """
+    df = df[df['Name'].isin(companies)]
+    df = df.assign(Year=date_years(df['Date']))
+    groups = df.groupby(['Name', 'Year'], sort=False)
+    index = pd.MultiIndex.from_product([years, companies], names=['Year', 'Name'])
+
+    def panel(rows, column):
+        values = rows.set_index(['Year', 'Name'])[column].reindex(index)
+        return values.to_numpy(dtype=np.float64).reshape(len(years), len(companies))
+
+    first = df[nth(groups, 0)]
+    held = df[nth(groups, holding_period)]
+    return panel(first, 'Price'), panel(held, 'Price'), panel(held, 'ShareBeta')
+
+
+def risk_free_rates(df, years):
+    """
+    Returns the risk free rate of return at the end of each year as a fraction
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Fundamental and price data
+    years : list
+        Years (Y)
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    year = date_years(df['Date'])
+    last = df.groupby(year, sort=False).tail(1)
+    rates = pd.Series(last['RiskFreeRateOfReturn'].to_numpy(), index=year[last.index].to_numpy())
+    return rates.reindex(years).to_numpy(dtype=np.float64) / 100
+
+
+def _value(weights, prices):
+    # Prices of shares that are not held may be undefined
+    return np.sum(np.where(weights != 0, weights * prices, 0), axis=-1)
+
+
+def portfolio_returns(weights, prices_initial, prices_current):
+    """
+    Returns the Annual Returns, Compound Return and Average Annual Return of portfolios. Years in which the value
+    of a portfolio is unchanged have a return of zero.
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        Holdings (... x Y x C)
+    prices_initial : numpy.ndarray
+        Share prices at the start of each year (... x Y x C)
+    prices_current : numpy.ndarray
+        Share prices at the end of the holding period (... x Y x C)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        Annual Returns (... x Y), Compound Return (...) and Average Annual Return (...)
+    """
+    value_initial = _value(weights, prices_initial)
+    value_current = _value(weights, prices_current)
+    change = value_current - value_initial
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annual_returns = np.where(np.abs(change) > 0, np.abs(value_current / value_initial) - 1, 0)
+        # The compound return is taken from the value of the first year with shares
+        pv = np.take_along_axis(value_initial, np.argmax(value_initial != 0, axis=-1)[..., np.newaxis], -1)[..., 0]
+        pv_ = pv + change.sum(axis=-1)
+        n = value_initial.shape[-1]
+        compound_return = np.where(np.abs(pv_ - pv) > 0, np.abs(pv_ / pv) ** (1 / n) - 1, 0)
+    average_annual_return = return_metrics.average_annual_return(annual_returns, -1)
+    return annual_returns, compound_return, average_annual_return
+
+
+def risk_adjusted_metrics(annual_returns, compound_return, average_annual_return, beta, risk_free_rates_):
+    """
+    Returns the Treynor and Sharpe Ratios of portfolios, the Treynor Ratio is zero for portfolios without a positive
+    beta
+
+    Parameters
+    ----------
+    annual_returns : numpy.ndarray
+        Annual Returns (... x Y)
+    compound_return : numpy.ndarray
+        Compound Return (...)
+    average_annual_return : numpy.ndarray
+        Average Annual Return (...)
+    beta : numpy.ndarray
+        Beta of the portfolios (...)
+    risk_free_rates_ : numpy.ndarray
+        Risk free rate of return of each year (Y)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+    """
+    portfolio_return = compound_return * 100
+    risk_free_rate = np.mean(risk_free_rates_)
+    delta = average_annual_return - risk_free_rate
+    standard_deviation_excess_return = np.sqrt(
+        np.sum((annual_returns - risk_free_rates_ - delta[..., np.newaxis]) ** 2, axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        treynor_ratio = np.where(beta > 0, return_metrics.treynor_ratio(portfolio_return, risk_free_rate, beta), 0)
+        sharpe_ratio = return_metrics.sharpe_ratio(portfolio_return, risk_free_rate, standard_deviation_excess_return)
+    return treynor_ratio, sharpe_ratio
+
+
+def portfolio_metrics(weights, prices_initial, prices_current, share_betas, risk_free_rates_, beta=None):
+    """
+    Returns the return and risk adjusted return metrics of a batch of portfolios
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        Holdings (... x Y x C)
+    prices_initial : numpy.ndarray
+        Share prices at the start of each year (... x Y x C)
+    prices_current : numpy.ndarray
+        Share prices at the end of the holding period (... x Y x C)
+    share_betas : numpy.ndarray
+        Share betas at the end of the holding period (... x Y x C), ignored if beta is given
+    risk_free_rates_ : numpy.ndarray
+        Risk free rate of return of each year (Y)
+    beta : numpy.ndarray, optional
+        Beta of the portfolios (...), the weighted mean beta of the shares held if None
+
+    Returns
+    -------
+    dict
+        Annual Returns (... x Y) and Compound Return, Average Annual Return, Treynor and Sharpe Ratios (...)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    annual_returns, compound_return, average_annual_return = portfolio_returns(weights, prices_initial, prices_current)
+    if beta is None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = _value(weights, share_betas).sum(axis=-1) / weights.sum(axis=(-2, -1))
+    treynor_ratio, sharpe_ratio = risk_adjusted_metrics(annual_returns, compound_return, average_annual_return,
+                                                        np.asarray(beta), risk_free_rates_)
+    return {"annualReturns": annual_returns,
+            "compoundReturn": compound_return,
+            "averageAnnualReturn": average_annual_return,
+            "treynor": treynor_ratio,
+            "sharpe": sharpe_ratio}
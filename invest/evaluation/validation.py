@@ -1,163 +1,162 @@
-import math
-
 import numpy as np
 import pandas as pd
 
+import invest.evaluation.portfolio as portfolio
 import invest.metrics.return_ as return_metrics
 from invest.preprocessing.dataloader import load_benchmark_data
+from invest.tracing import stage, traced
+
+
+def portfolio_annual_return(prices_initial, prices_current):
+    """
+    Returns the annual return of the shares selected for a single year, zero if the portfolio value is unchanged
+
+    Parameters
+    ----------
+    prices_initial : list
+        Share prices at the start of the year
+    prices_current : list
+        Share prices at the end of the holding period
+
+    Returns
+    -------
+    float
+    """
+    if np.abs(sum(prices_current) - sum(prices_initial)) > 0:
+        return return_metrics.annual_return(np.array(prices_initial), np.array(prices_current))
+    return 0
 
 
+def holdings(prices_initial_dict, prices_current_dict, share_betas_dict, start_year, end_year):
+    """
+    Converts the shares selected for each year to holdings and price panels for invest.evaluation.portfolio
+
+    Parameters
+    ----------
+    prices_initial_dict : dict
+        Share prices at the start of each year
+    prices_current_dict : dict
+        Share prices at the end of the holding period of each year
+    share_betas_dict : dict
+        Share betas at the end of the holding period of each year
+    start_year : int
+    end_year : int
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        Weights, initial prices, current prices and share betas (years x shares), shares are padded with zero
+        weights to the largest number selected in a year
+    """
+    years = [str(year) for year in range(start_year, end_year)]
+    width = max([len(prices_initial_dict[year]) for year in years] + [1])
+    weights = np.zeros((len(years), width))
+    panels = np.zeros((3, len(years), width))
+    for y, year in enumerate(years):
+        n = len(prices_initial_dict[year])
+        weights[y, :n] = 1
+        for panel, values in zip(panels, [prices_initial_dict, prices_current_dict, share_betas_dict]):
+            panel[y, :n] = values[year]
+    return weights, panels[0], panels[1], panels[2]
+
+
+@traced('process_metrics')
 def process_metrics(df, prices_initial_dict, prices_current_dict, share_betas_dict, start_year,
-                    end_year, index_code):
+                    end_year, index_code, verbose=True):
     """
     Processes risk return metrics (Annual Return, Compound Return, Annual Average Return) for selected portfolio
     """
-    annual_returns = []
-    total_return = 0
-    for year in range(start_year, end_year):
-        return_ = sum(prices_current_dict[str(year)]) - sum(prices_initial_dict[str(year)])
-        total_return += return_
-        if np.abs(return_) > 0:
-            annual_return = return_metrics.annual_return(np.array(prices_initial_dict[str(year)]),
-                                                         np.array(prices_current_dict[str(year)]))
-        else:
-            annual_return = 0
-        annual_returns.append(annual_return)
-    print("\nAnnual Returns")
-    print("IP." + index_code, ["{}%".format(round(v * 100, 2)) for v in annual_returns])
-
-    pv = sum(prices_initial_dict[str(start_year)])
-    y = start_year
-    while pv == 0 and y != (end_year - 1):
-        y += 1
-        pv = sum(prices_initial_dict[str(y)])
-    pv_ = pv + total_return
-    n = end_year - start_year
-    if np.abs(pv_ - pv) > 0:
-        compound_return = return_metrics.compound_return(pv, pv_, n)
-    else:
-        compound_return = 0
-    average_annual_return = return_metrics.average_annual_return(annual_returns)
-    print("Performance Metrics")
-    print('IP.{} | CR {:5.2f}% | AAR {:5.2f}%'.format(index_code, compound_return * 100,
-                                                      average_annual_return * 100))
-    treynor_ratio, sharpe_ratio = process_risk_adjusted_return_metrics(df, share_betas_dict, start_year, end_year,
-                                                                       compound_return,
-                                                                       average_annual_return, annual_returns,
-                                                                       index_code)
+    weights, prices_initial, prices_current, share_betas = holdings(prices_initial_dict, prices_current_dict,
+                                                                    share_betas_dict, start_year, end_year)
+    metrics = portfolio.portfolio_metrics(weights, prices_initial, prices_current, share_betas,
+                                          portfolio.risk_free_rates(df, range(start_year, end_year)))
+    annual_returns = metrics["annualReturns"].tolist()
+    compound_return = metrics["compoundReturn"][()]
+    average_annual_return = metrics["averageAnnualReturn"][()]
+    treynor_ratio = metrics["treynor"][()]
+    sharpe_ratio = metrics["sharpe"][()]
+    if verbose:
+        print("\nAnnual Returns")
+        print("IP." + index_code, ["{}%".format(round(v * 100, 2)) for v in annual_returns])
+        print("Performance Metrics")
+        print('IP.{} | CR {:5.2f}% | AAR {:5.2f}%'.format(index_code, compound_return * 100,
+                                                          average_annual_return * 100))
+        print('IP.{} | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'.format(index_code, treynor_ratio, sharpe_ratio))
 
     return annual_returns, compound_return, average_annual_return, treynor_ratio, sharpe_ratio
 
 
 def process_risk_adjusted_return_metrics(df, share_betas_dict,
                                          start_year, end_year, compound_return, average_annual_return,
-                                         annual_returns, index_code):
+                                         annual_returns, index_code, verbose=True):
     """
     Processes risk adjusted return metrics (Treynor Ratio, Sharpe Ratio) for selected portfolio
     """
-    portfolio_return = compound_return * 100
-    betas = []
-    rf = []
-    for year in range(start_year, end_year):
-        betas += share_betas_dict[str(year)]
-        mask = (df['Date'] >= str(year) + '-01-01') & (df['Date'] <= str(year) + '-12-31')
-        rf.append(df[mask].iloc[-1]['RiskFreeRateOfReturn'] / 100)
-    beta_portfolio = np.mean(betas)
-    risk_free_rate = np.mean(rf)
-
-    if beta_portfolio > 0:
-        treynor_ratio = return_metrics.treynor_ratio(portfolio_return, risk_free_rate, beta_portfolio)
-    else:
-        treynor_ratio = 0
-
-    delta = average_annual_return - np.mean(rf)
-    excess_returns = []
-    for i, annual_return in enumerate(annual_returns):
-        excess_returns.append(annual_return - rf[i])
-
-    v = 0
-    for e in excess_returns:
-        v += (e - delta) ** 2
-    standard_deviation_excess_return = math.sqrt(v)
-    sharpe_ratio = return_metrics.sharpe_ratio(portfolio_return, risk_free_rate, standard_deviation_excess_return)
-    print('IP.{} | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'.format(index_code, treynor_ratio, sharpe_ratio))
-
-    return treynor_ratio, sharpe_ratio
-
-
-def process_benchmark_metrics(start_year, end_year, index_code, holding_period=-1):
+    betas = [beta for year in range(start_year, end_year) for beta in share_betas_dict[str(year)]]
+    treynor_ratio, sharpe_ratio = portfolio.risk_adjusted_metrics(
+        np.asarray(annual_returns), np.asarray(compound_return), np.asarray(average_annual_return),
+        np.mean(betas) if betas else np.nan, portfolio.risk_free_rates(df, range(start_year, end_year)))
+    if verbose:
+        print('IP.{} | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'.format(index_code, treynor_ratio, sharpe_ratio))
+
+    return treynor_ratio[()], sharpe_ratio[()]
+
+
+def benchmark_panel(df, start_year, end_year, holding_period=-1):
     """
-    Processes risk return metrics (Annual Return, Compound Return, Annual Average Return) for selected benchmark
+    Returns the closing values of a benchmark index at the start of each year and at the end of the holding period
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Benchmark data
+    start_year : int
+    end_year : int
+    holding_period : int, optional
+        Month offset into each year the index is held until
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        Initial and current values (years x 1)
     """
-    df = load_benchmark_data(index_code)
-    annual_returns = []
-    total_return = 0
-    for year in range(start_year, end_year):
-        mask = (df['Date'] >= str(year) + '/01/01') & (df['Date'] <= str(year) + '/12/31')
-        pv = float(df.loc[mask, 'Close'].iloc[0].replace(',', '.'))
-        pv_ = float(df.loc[mask, 'Close'].iloc[holding_period].replace(',', '.'))
-        return_ = pv_ - pv
-        total_return += return_
-        if np.abs(return_) > 0:
-            annual_return = return_metrics.annual_return(pv, pv_)
-        else:
-            annual_return = 0
-        annual_returns.append(annual_return)
-    print("\nAnnual Returns")
-    print("Benchmark." + index_code, ["{}%".format(round(v * 100, 2)) for v in annual_returns])
+    years = list(range(start_year, end_year))
+    close = pd.Series([float(x.replace(',', '.')) for x in df['Close']], index=df.index)
+    year = df['Date'].str[:4].astype(int)
+    groups = close.groupby(year, sort=False)
 
-    mask = (df['Date'] >= str(start_year) + '/01/01') & (df['Date'] <= str(start_year) + '/12/31')
-    pv = float(df.loc[mask, 'Close'].iloc[0].replace(',', '.'))
-    y = start_year
-    while pv == 0 and y != end_year:
-        y += 1
-        mask = (df['Date'] >= str(y) + '-01-01') & (df['Date'] <= str(y) + '-12-31')
-        pv = float(df.loc[mask, 'Close'].iloc[0].replace(',', '.'))
-    pv_ = pv + total_return
-    n = end_year - start_year
-    compound_return = return_metrics.compound_return(pv, pv_, n)
-    average_annual_return = return_metrics.average_annual_return(annual_returns)
-
-    print("Performance Measures")
-    print('Benchmark.{} | CR {:5.2f}% | AAR {:5.2f}%'.format(index_code, compound_return * 100,
-                                                             average_annual_return * 100))
-    treynor_ratio, sharpe_ratio = process_benchmark_risk_adjusted_return_metrics(df, start_year, end_year, index_code,
-                                                                                 compound_return,
-                                                                                 average_annual_return, annual_returns)
+    def panel(mask):
+        return close[mask].set_axis(year[mask]).reindex(years).to_numpy()[:, np.newaxis]
 
-    return annual_returns, compound_return, average_annual_return, treynor_ratio, sharpe_ratio
+    return panel(portfolio.nth(groups, 0)), panel(portfolio.nth(groups, holding_period))
 
 
-def process_benchmark_risk_adjusted_return_metrics(df, start_year, end_year, index_code, compound_return,
-                                                   average_annual_return, annual_returns):
+@traced('benchmark_metrics')
+def process_benchmark_metrics(df_, start_year, end_year, index_code, holding_period=-1, verbose=True):
     """
-    Processes risk adjusted return metrics (Treynor Ratio, Sharpe Ratio) for selected benchmark
+    Processes risk return metrics (Annual Return, Compound Return, Annual Average Return) for selected benchmark,
+    with the risk free rates of the share data df_
     """
-    df_ = pd.read_csv('data/INVEST_clean.csv')
-    portfolio_return = compound_return * 100
-    rf = []
-    for year in range(start_year, end_year):
-        mask = (df_['Date'] >= str(year) + '-01-01') & (df_['Date'] <= str(year) + '-12-31')
-        rf.append(df_[mask].iloc[-1]['RiskFreeRateOfReturn'] / 100)
-
+    with stage("data_access"):
+        df = load_benchmark_data(index_code)
+    prices_initial, prices_current = benchmark_panel(df, start_year, end_year, holding_period)
     mask = (df['Date'] >= str(start_year) + '/01/01') & (df['Date'] <= str(start_year) + '/12/31')
-    df.loc[mask, 'Beta Weekly Leveraged'] = [x.replace(',', '.') for x in df.loc[mask, 'Beta Weekly Leveraged']]
-    beta_portfolio = np.mean(df.loc[mask, 'Beta Weekly Leveraged'].values.astype(np.float32))
-    risk_free_rate = np.mean(rf)
-
-    treynor_ratio = return_metrics.treynor_ratio(portfolio_return, risk_free_rate, beta_portfolio)
-
-    delta = average_annual_return - np.mean(rf)
-    excess_returns = []
-    for i, annual_return in enumerate(annual_returns):
-        excess_returns.append(annual_return - rf[i])
-
-    v = 0
-    for e in excess_returns:
-        v += (e - delta) ** 2
-    standard_deviation_excess_return = math.sqrt(v)
-    sharpe_ratio = return_metrics.sharpe_ratio(portfolio_return, risk_free_rate, standard_deviation_excess_return)
-    print(
-        'Benchmark.{} | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'.format(index_code, treynor_ratio, sharpe_ratio))
-
-    return treynor_ratio, sharpe_ratio
+    beta_portfolio = np.mean(np.array([x.replace(',', '.') for x in df.loc[mask, 'Beta Weekly Leveraged']],
+                                      dtype=np.float32))
+    metrics = portfolio.portfolio_metrics(np.ones_like(prices_initial), prices_initial, prices_current, None,
+                                          portfolio.risk_free_rates(df_, range(start_year, end_year)), beta_portfolio)
+    annual_returns = metrics["annualReturns"].tolist()
+    compound_return = metrics["compoundReturn"][()]
+    average_annual_return = metrics["averageAnnualReturn"][()]
+    treynor_ratio = metrics["treynor"][()]
+    sharpe_ratio = metrics["sharpe"][()]
+    if verbose:
+        print("\nAnnual Returns")
+        print("Benchmark." + index_code, ["{}%".format(round(v * 100, 2)) for v in annual_returns])
+        print("Performance Measures")
+        print('Benchmark.{} | CR {:5.2f}% | AAR {:5.2f}%'.format(index_code, compound_return * 100,
+                                                                 average_annual_return * 100))
+        print('Benchmark.{} | Treynor Ratio {:5.2f} | Sharpe Ratio: {:5.2f}'.format(index_code, treynor_ratio,
+                                                                                     sharpe_ratio))
+
+    return annual_returns, compound_return, average_annual_return, treynor_ratio, sharpe_ratio
@@ -0,0 +1,304 @@
+import numpy as np
+
+from invest.networks.spec import network_spec
+from invest.states import MISSING
+
+# NumPy solver for the fixed structure influence diagrams of invest.networks. Evidence is a batch of likelihoods
+# over the states of a node (N x states), one-hot for hard evidence, and every query of a batch is solved at once.
+# Parameters are read from the network specification: CPTs are indexed (parent, state) and utilities (decision,
+# parent state). They may also be given per query, with a leading batch dimension (N x ...), to solve variants of
+# the networks at once. Utilities are those of taking each decision given the evidence. With hard evidence on the
+# parents of the decisions they equal the posterior utilities of pyAgrum, see invest.networks.solver_validation.
+
+
+def value_parameters(spec=network_spec):
+    """
+    Returns the CPTs and utilities of the Value Network
+
+    Parameters
+    ----------
+    spec : invest.networks.spec.NetworkSpec, optional
+        Network specification
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "performance": spec.table("value", "FutureSharePerformance"),
+        "pe_relative_market": spec.table("value", "PERelative_ShareMarket"),
+        "pe_relative_sector": spec.table("value", "PERelative_ShareSector"),
+        # ForwardPE_CurrentVsHistory | Expensive_E (No, Yes), FutureSharePerformance
+        "forward_pe": spec.table("value", "ForwardPE_CurrentVsHistory"),
+        # Expensive_Utility (No, Yes) and VRP_Utility (Cheap, FairValue, Expensive) by FutureSharePerformance
+        "expensive_utility": spec.table("value", "Expensive_Utility"),
+        "value_utility": spec.table("value", "VRP_Utility"),
+    }
+
+
+def quality_parameters(spec=network_spec):
+    """
+    Returns the CPTs and utilities of the Quality Network
+
+    Parameters
+    ----------
+    spec : invest.networks.spec.NetworkSpec, optional
+        Network specification
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "performance": spec.table("quality", "FutureSharePerformance"),
+        "relative_debt_equity": spec.table("quality", "RelDE"),
+        "roe_vs_coe": spec.table("quality", "ROEvsCOE"),
+        "cagr_vs_inflation": spec.table("quality", "CAGRvsInflation"),
+        "systematic_risk": spec.table("quality", "SystematicRisk"),
+        # Q_Utility (High, Medium, Low) by FutureSharePerformance
+        "utility": spec.table("quality", "Q_Utility"),
+    }
+
+
+def recommendation_parameters(spec=network_spec):
+    """
+    Returns the CPTs and utilities of the Investment Recommendation Network
+
+    Parameters
+    ----------
+    spec : invest.networks.spec.NetworkSpec, optional
+        Network specification
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "performance": spec.table("recommendation", "Performance"),
+        "value": spec.table("recommendation", "Value"),
+        "quality": spec.table("recommendation", "Quality"),
+        # I_Utility (Yes, No) by Performance
+        "utility": spec.table("recommendation", "I_Utility"),
+    }
+
+
+# Soft evidence entered for FutureSharePerformance by value_network whenever a prediction is given
+FUTURE_PERFORMANCE = np.array([0.8, 0.1, 0.1])
+
+
+def hard_evidence(states, n=3):
+    """
+    Returns hard evidence for a batch of states. Undefined states are entered as the last state, as in
+    invest.states.evidence.
+
+    Parameters
+    ----------
+    states : array_like
+        State codes, MISSING if undefined
+    n : int, optional
+        Number of node states
+
+    Returns
+    -------
+    numpy.ndarray
+        Evidence (N x n)
+    """
+    states = np.asarray(states)
+    return np.eye(n)[np.where(states == MISSING, n - 1, states)]
+
+
+def _per_query(parameter, n, ndim):
+    # Parameters shared by every query are broadcast along the batch
+    parameter = np.asarray(parameter)
+    return np.broadcast_to(parameter, (n,) + parameter.shape[parameter.ndim - ndim:])
+
+
+def _likelihood(cpt, evidence_):
+    return np.einsum('nfx,nx->nf', _per_query(cpt, len(evidence_), 2), evidence_)
+
+
+def _posterior_utilities(performance, likelihoods, utility):
+    # Likelihoods of each evidence node given FutureSharePerformance (N x 3) are combined with its prior
+    joint = performance * np.prod(likelihoods, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.einsum('nf,ndf->nd', joint / joint.sum(axis=-1, keepdims=True),
+                         _per_query(utility, len(joint), 2))
+
+
+def quality_utilities(roe_vs_coe, relative_debt_equity, cagr_vs_inflation, systematic_risk=None,
+                      parameters=None):
+    """
+    Returns the expected utility of each Quality decision
+
+    Parameters
+    ----------
+    roe_vs_coe : numpy.ndarray
+        ROEvsCOE evidence (N x 3)
+    relative_debt_equity : numpy.ndarray
+        RelDE evidence (N x 3)
+    cagr_vs_inflation : numpy.ndarray
+        CAGRvsInflation evidence (N x 3)
+    systematic_risk : numpy.ndarray, optional
+        SystematicRisk evidence (N x 3) for the extended network
+    parameters : dict, optional
+        CPTs and utilities, shared or per query, those of the network specification if None
+
+    Returns
+    -------
+    numpy.ndarray
+        Expected utilities (N x 3) of High, Medium and Low
+    """
+    if parameters is None:
+        parameters = quality_parameters()
+    evidence_ = {"roe_vs_coe": roe_vs_coe, "relative_debt_equity": relative_debt_equity,
+                 "cagr_vs_inflation": cagr_vs_inflation}
+    if systematic_risk is not None:
+        evidence_["systematic_risk"] = systematic_risk
+    likelihoods = np.stack([_likelihood(parameters[node], e) for node, e in evidence_.items()])
+    return _posterior_utilities(parameters["performance"], likelihoods, parameters["utility"])
+
+
+def recommendation_utilities(value, quality, parameters=None):
+    """
+    Returns the expected utility of each Investable decision
+
+    Parameters
+    ----------
+    value : numpy.ndarray
+        Value evidence (N x 3)
+    quality : numpy.ndarray
+        Quality evidence (N x 3)
+    parameters : dict, optional
+        CPTs and utilities, shared or per query, those of the network specification if None
+
+    Returns
+    -------
+    numpy.ndarray
+        Expected utilities (N x 2) of Yes and No
+    """
+    if parameters is None:
+        parameters = recommendation_parameters()
+    likelihoods = np.stack([_likelihood(parameters["value"], value), _likelihood(parameters["quality"], quality)])
+    return _posterior_utilities(parameters["performance"], likelihoods, parameters["utility"])
+
+
+def value_utilities(pe_relative_market, pe_relative_sector, forward_pe, future_performance=None, parameters=None):
+    """
+    Returns the expected utilities of the Expensive_E and ValueRelativeToPrice decisions. Policies are solved by
+    backward induction under the no-forgetting assumption: ValueRelativeToPrice observes both PEs, the Forward PE
+    and Expensive_E, which observes both PEs.
+
+    Parameters
+    ----------
+    pe_relative_market : numpy.ndarray
+        PERelative_ShareMarket evidence (N x 3)
+    pe_relative_sector : numpy.ndarray
+        PERelative_ShareSector evidence (N x 3)
+    forward_pe : numpy.ndarray
+        ForwardPE_CurrentVsHistory evidence (N x 3)
+    future_performance : numpy.ndarray, optional
+        FutureSharePerformance evidence (N x 3)
+    parameters : dict, optional
+        CPTs and utilities, shared or per query, those of the network specification if None
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        Expected utilities (N x 2) of Expensive_E No and Yes, each followed by the optimal ValueRelativeToPrice
+        policy, and (N x 3) of Cheap, FairValue and Expensive under the optimal Expensive_E policy
+    """
+    if parameters is None:
+        parameters = value_parameters()
+    n = len(pe_relative_market)
+    performance = parameters["performance"] * (1 if future_performance is None else future_performance)
+    performance = np.broadcast_to(performance, (n, 3))
+    # Joint of FutureSharePerformance, both PEs, the Forward PE and Expensive_E with the evidence (N f m s x E)
+    joint = np.einsum('nf,nfm,nm,nfs,ns,nefx,nx->nfmsxe', performance,
+                      _per_query(parameters["pe_relative_market"], n, 2), pe_relative_market,
+                      _per_query(parameters["pe_relative_sector"], n, 2), pe_relative_sector,
+                      _per_query(parameters["forward_pe"], n, 3), forward_pe, optimize=True)
+    expensive_utility = _per_query(parameters["expensive_utility"], n, 2)
+    value_utility = _per_query(parameters["value_utility"], n, 2)
+
+    # ValueRelativeToPrice policy for each observation (N m s x E v)
+    value_policy = np.eye(3)[np.argmax(np.einsum('nfmsxe,nvf->nmsxev', joint, value_utility), axis=-1)]
+    # Expensive_E policy for each observation (N m s E), followed by the ValueRelativeToPrice policy. As in
+    # pyAgrum, each choice is compared by its utility conditional on the choice and the evidence.
+    expensive = np.einsum('nfmsxe,nef->nmse', joint, expensive_utility) + \
+        np.einsum('nfmsxe,nvf,nmsxev->nmse', joint, value_utility, value_policy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expensive_policy = np.eye(2)[np.argmax(np.nan_to_num(expensive / joint.sum(axis=(1, 4)), nan=-np.inf),
+                                               axis=-1)]
+        expensive_utilities = expensive.sum(axis=(1, 2)) / joint.sum(axis=(1, 2, 3, 4))
+        weights = joint * expensive_policy[:, np.newaxis, :, :, np.newaxis, :]
+        value_utilities_ = (np.einsum('nfmsxe,nef->n', weights, expensive_utility)[:, np.newaxis] +
+                            np.einsum('nfmsxe,nvf->nv', weights, value_utility)) / \
+            weights.sum(axis=(1, 2, 3, 4, 5))[:, np.newaxis]
+    return expensive_utilities, value_utilities_
+
+
+def decisions(utilities):
+    """
+    Returns the decisions with the greatest expected utility
+
+    Parameters
+    ----------
+    utilities : numpy.ndarray
+        Expected utilities (N x decisions)
+
+    Returns
+    -------
+    numpy.ndarray
+        Decision codes (N)
+    """
+    return np.argmax(utilities, axis=-1)
+
+
+def value_utilities_hard(pe_relative_market, pe_relative_sector, forward_pe, future_performance=None,
+                         parameters=None):
+    """
+    Returns the expected utilities of value_utilities for hard evidence on both PEs and the Forward PE. Only the
+    observed states have a nonzero joint, so the policies are solved for those states alone.
+
+    Parameters
+    ----------
+    pe_relative_market : numpy.ndarray
+        PERelative_ShareMarket state codes (N), MISSING if undefined
+    pe_relative_sector : numpy.ndarray
+        PERelative_ShareSector state codes (N), MISSING if undefined
+    forward_pe : numpy.ndarray
+        ForwardPE_CurrentVsHistory state codes (N), MISSING if undefined
+    future_performance : numpy.ndarray, optional
+        FutureSharePerformance evidence (N x 3)
+    parameters : dict, optional
+        CPTs and utilities, shared or per query, those of the network specification if None
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        Expected utilities (N x 2) of Expensive_E No and Yes and (N x 3) of Cheap, FairValue and Expensive
+    """
+    if parameters is None:
+        parameters = value_parameters()
+    pe_relative_market, pe_relative_sector, forward_pe = [np.where(np.asarray(s) == MISSING, 2, s) for s in
+                                                          (pe_relative_market, pe_relative_sector, forward_pe)]
+    n = len(pe_relative_market)
+    queries = np.arange(n)
+    performance = parameters["performance"] * (1 if future_performance is None else future_performance)
+    performance = performance * _per_query(parameters["pe_relative_market"], n, 2)[queries, :, pe_relative_market] \
+        * _per_query(parameters["pe_relative_sector"], n, 2)[queries, :, pe_relative_sector]
+    # Joint of FutureSharePerformance and Expensive_E with the evidence (N f E)
+    joint = np.einsum('nf,nef->nfe', performance, _per_query(parameters["forward_pe"], n, 3)[queries, :, :, forward_pe])
+    expensive_utility = _per_query(parameters["expensive_utility"], n, 2)
+    value_utility = _per_query(parameters["value_utility"], n, 2)
+
+    # Utility of ValueRelativeToPrice under the optimal policy following each Expensive_E choice (N E)
+    value_policy = np.einsum('nfe,nvf->nev', joint, value_utility).max(axis=-1)
+    expensive = np.einsum('nfe,nef->ne', joint, expensive_utility) + value_policy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expensive_utilities = expensive / joint.sum(axis=1)
+        expensive_policy = np.eye(2)[np.argmax(np.nan_to_num(expensive_utilities, nan=-np.inf), axis=-1)]
+        weights = joint * expensive_policy[:, np.newaxis, :]
+        value_utilities_ = (np.einsum('nfe,nef->n', weights, expensive_utility)[:, np.newaxis] +
+                            np.einsum('nfe,nvf->nv', weights, value_utility)) / weights.sum(axis=(1, 2))[:, np.newaxis]
+    return expensive_utilities, value_utilities_
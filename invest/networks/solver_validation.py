@@ -0,0 +1,158 @@
+import argparse
+import itertools
+import sys
+
+import numpy as np
+import pyAgrum as gum
+
+from invest.decision import state_decision, state_decisions
+from invest.networks import solver
+from invest.networks.spec import network_spec
+
+
+def gum_solve(model, evidence_, decisions, no_forgetting=None):
+    """
+    Returns the posterior utilities and optimal decisions of an influence diagram solved by pyAgrum, and its
+    maximum expected utility
+
+    Parameters
+    ----------
+    model : pyAgrum.InfluenceDiagram
+        Influence diagram
+    evidence_ : dict
+        Evidence of each node
+    decisions : list
+        Decision nodes
+    no_forgetting : list, optional
+        Order of the decisions
+
+    Returns
+    -------
+    (list, list, float)
+    """
+    ie = gum.ShaferShenoyLIMIDInference(model)
+    if no_forgetting is not None:
+        ie.addNoForgettingAssumption(no_forgetting)
+    for node, e in evidence_.items():
+        ie.addEvidence(node, list(e))
+    ie.makeInference()
+    return ([ie.posteriorUtility(decision).toarray() for decision in decisions],
+            [int(np.argmax(ie.posterior(decision).toarray())) for decision in decisions], ie.MEU()['mean'])
+
+
+def evidence_grid(nodes):
+    """
+    Returns every combination of hard evidence for the nodes
+
+    Parameters
+    ----------
+    nodes : int
+        Number of evidence nodes with three states
+
+    Returns
+    -------
+    numpy.ndarray
+        Evidence (nodes x N x 3)
+    """
+    return solver.hard_evidence(np.array(list(itertools.product(range(3), repeat=nodes))).T)
+
+
+def validate_quality(extension):
+    """
+    Returns the largest difference between the Quality utilities of the solver and pyAgrum
+    """
+    nodes = ["ROEvsCOE", "RelDE", "CAGRvsInflation"] + (["SystematicRisk"] if extension else [])
+    grid = evidence_grid(len(nodes))
+    model = network_spec.model('quality', extension)
+    expected = np.array([gum_solve(model, dict(zip(nodes, e)), ['Quality'])[0][0] for e in grid.transpose(1, 0, 2)])
+    return np.abs(solver.quality_utilities(*grid) - expected).max()
+
+
+def validate_recommendation():
+    """
+    Returns the largest difference between the Investable utilities of the solver and pyAgrum
+    """
+    nodes = ["Value", "Quality"]
+    grid = evidence_grid(len(nodes))
+    model = network_spec.model('recommendation')
+    expected = np.array([gum_solve(model, dict(zip(nodes, e)), ['Investable'])[0][0] for e in grid.transpose(1, 0, 2)])
+    return np.abs(solver.recommendation_utilities(*grid) - expected).max()
+
+
+def validate_value(samples, rng):
+    """
+    Returns the largest difference between the Expensive_E utilities and the maximum expected utilities of the
+    solvers and pyAgrum, and the number of ValueRelativeToPrice decisions that differ. pyAgrum reports the
+    utility of ValueRelativeToPrice decisions its policy does not take as zero, so only the optimal decision and
+    its utility are compared.
+    """
+    nodes = ["PERelative_ShareMarket", "PERelative_ShareSector", "ForwardPE_CurrentVsHistory"]
+    hard = evidence_grid(len(nodes))
+    # Every hard evidence combination without a prediction, with each prediction and with random predictions
+    performance = np.concatenate([np.ones((1, 3)), solver.FUTURE_PERFORMANCE[np.newaxis], [[0.1, 0.2, 0.1]],
+                                  [[0.1, 0.1, 0.8]], rng.dirichlet(np.ones(3), size=samples)])
+    grid = np.repeat(hard, len(performance), axis=1)
+    performance = np.tile(performance, (hard.shape[1], 1))
+    model = network_spec.model('value')
+    expected_expensive, expected_decisions, expected_meu = [], [], []
+    for e, f in zip(grid.transpose(1, 0, 2), performance):
+        utilities, decisions, meu = gum_solve(model, {**dict(zip(nodes, e)), "FutureSharePerformance": f},
+                                              ['Expensive_E', 'ValueRelativeToPrice'],
+                                              network_spec.no_forgetting('value'))
+        expected_expensive.append(utilities[0])
+        expected_decisions.append(decisions[1])
+        expected_meu.append(meu)
+    errors = [0, 0, 0]
+    # Both the solver for likelihoods and the one for state codes
+    for expensive, value in [solver.value_utilities(*grid, performance),
+                             solver.value_utilities_hard(*np.argmax(grid, axis=-1), performance)]:
+        errors = [max(errors[0], np.abs(expensive - np.array(expected_expensive)).max()),
+                  max(errors[1], np.abs(value.max(-1) - expected_meu).max()),
+                  errors[2] + int((solver.decisions(value) != expected_decisions).sum())]
+    return tuple(errors)
+
+
+def validate_decisions(samples, rng):
+    """
+    Returns the number of investment decisions of invest.decision.state_decisions that differ from those of
+    state_decision over random states, MISSING included, with and without predictions, for every configuration
+    """
+    states = rng.integers(-1, 3, size=(7, samples))
+    future_performance = rng.random(samples) < 0.5
+    mismatches = 0
+    for extension, ablation, network in itertools.product([False, True], [False, True], ['v', 'q']):
+        if not ablation and network == 'q':
+            continue
+        expected = [state_decision(*s, 1 if f else None, extension, ablation, network)
+                    for s, f in zip(states.T.tolist(), future_performance)]
+        mismatches += int((state_decisions(*states, future_performance, extension, ablation, network) !=
+                           np.array(expected)).sum())
+    return mismatches
+
+
+def main():
+    errors = {
+        "quality": validate_quality(False),
+        "quality_extension": validate_quality(True),
+        "recommendation": validate_recommendation(),
+    }
+    expensive, meu, mismatches = validate_value(args.samples, np.random.default_rng(args.seed))
+    errors["value_expensive"] = expensive
+    errors["value_meu"] = meu
+    for name, error in errors.items():
+        print("{:<20} max error {:.3e}".format(name, error))
+    print("{:<20} {} decisions differ".format("value", mismatches))
+    investment_mismatches = validate_decisions(args.samples * 10, np.random.default_rng(args.seed))
+    print("{:<20} {} decisions differ".format("investment", investment_mismatches))
+    if mismatches or investment_mismatches or max(errors.values()) > args.tolerance:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validates the NumPy influence diagram solver against pyAgrum')
+    parser.add_argument("--samples", type=int, default=100,
+                        help="Random FutureSharePerformance evidence combined with each Value Network evidence")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args()
+    main()
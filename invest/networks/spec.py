@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import threading
+
+import numpy as np
+import pyAgrum as gum
+
+# Increment when the format of the network specification changes
+SPEC_VERSION = 1
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'networks.json')
+
+
+class NetworkSpec:
+    """
+    Declarative specification of the influence diagrams of the Value, Quality and Investment Recommendation
+    Networks. Nodes are listed with their labels and parents, CPTs are indexed (parents..., state) and utilities
+    (parents...). The specification is read once and each diagram compiled on first use, so decisions do not
+    rebuild or write networks. Loading another specification replaces the CPTs and utilities in use.
+    """
+
+    def __init__(self, path=DEFAULT_SPEC):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            JSON network specification
+        """
+        self.lock = threading.Lock()
+        self.load(path)
+
+    def load(self, path):
+        """
+        Reads a network specification, replacing the compiled networks and tables of the previous one
+
+        Parameters
+        ----------
+        path : str
+            JSON network specification
+        """
+        with open(path, 'r') as f:
+            spec = json.load(f)
+        if spec.get("version") != SPEC_VERSION:
+            raise ValueError("Unsupported network specification version {} in {}".format(spec.get("version"), path))
+        with self.lock:
+            self.path = path
+            self.networks = spec["networks"]
+            self.digest = hashlib.sha1(json.dumps(self.networks, sort_keys=True).encode()).hexdigest()
+            self.models = {}
+            self.tables = {}
+
+    def node(self, network, name):
+        """
+        Returns the specification of a node
+
+        Parameters
+        ----------
+        network : str
+            Network name, value, quality or recommendation
+        name : str
+            Node name
+
+        Returns
+        -------
+        dict
+        """
+        for node in self.networks[network]["nodes"]:
+            if node["name"] == name:
+                return node
+        raise KeyError("{} is not a node of the {} network".format(name, network))
+
+    def table(self, network, name):
+        """
+        Returns the CPT (parents... x states) or utility table (parents...) of a node
+
+        Parameters
+        ----------
+        network : str
+            Network name, value, quality or recommendation
+        name : str
+            Node name
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        key = (network, name)
+        if key not in self.tables:
+            node = self.node(network, name)
+            table = np.array(node["cpt"] if node["type"] == "chance" else node["utility"], dtype=np.float64)
+            table.flags.writeable = False
+            self.tables[key] = table
+        return self.tables[key]
+
+    def no_forgetting(self, network):
+        """
+        Returns the order of the decisions of a network, None if it has a single decision
+
+        Parameters
+        ----------
+        network : str
+            Network name, value, quality or recommendation
+
+        Returns
+        -------
+        Union[None, list]
+        """
+        return self.networks[network].get("no_forgetting")
+
+    def compile(self, network, extension=False):
+        """
+        Builds the influence diagram of a network
+
+        Parameters
+        ----------
+        network : str
+            Network name, value, quality or recommendation
+        extension : bool, optional
+            Include the nodes of the extended network
+
+        Returns
+        -------
+        pyAgrum.InfluenceDiagram
+        """
+        nodes = [node for node in self.networks[network]["nodes"] if extension or not node.get("extension")]
+        names = {node["name"] for node in nodes}
+        model = gum.InfluenceDiagram()
+        for node in nodes:
+            variable = gum.LabelizedVariable(node["name"], node.get("description", ""), len(node.get("labels", [0])))
+            for i, label in enumerate(node.get("labels", [])):
+                variable.changeLabel(i, label)
+            {"decision": model.addDecisionNode, "chance": model.addChanceNode,
+             "utility": model.addUtilityNode}[node["type"]](variable)
+        for node in nodes:
+            for parent in node["parents"]:
+                if parent in names:
+                    model.addArc(model.idFromName(parent), model.idFromName(node["name"]))
+
+        for node in nodes:
+            if node["type"] == "decision":
+                continue
+            table = self.table(network, node["name"])
+            if node["type"] == "chance":
+                potential = model.cpt(model.idFromName(node["name"]))
+            else:
+                potential = model.utility(model.idFromName(node["name"]))
+            if not node["parents"]:
+                potential.fillWith(table.tolist())
+                continue
+            labels = [self.node(network, parent)["labels"] for parent in node["parents"]]
+            for index in itertools.product(*[range(len(labels_)) for labels_ in labels]):
+                instantiation = {parent: labels[p][i] for p, (parent, i) in enumerate(zip(node["parents"], index))}
+                values = table[index]
+                potential[instantiation] = values.tolist() if node["type"] == "chance" else [float(values)]
+        return model
+
+    def model(self, network, extension=False):
+        """
+        Returns the compiled influence diagram of a network, compiling it on first use. The diagram is shared and
+        must not be modified.
+
+        Parameters
+        ----------
+        network : str
+            Network name, value, quality or recommendation
+        extension : bool, optional
+            Include the nodes of the extended network
+
+        Returns
+        -------
+        pyAgrum.InfluenceDiagram
+        """
+        key = (network, bool(extension))
+        with self.lock:
+            if key not in self.models:
+                self.models[key] = self.compile(network, extension)
+            return self.models[key]
+
+    def export(self, directory, extension=False):
+        """
+        Writes each network as BIFXML to its export path in a directory
+
+        Parameters
+        ----------
+        directory : str
+            Output directory
+        extension : bool, optional
+            Export the extended Quality Network
+
+        Returns
+        -------
+        list
+            Paths written
+        """
+        paths = []
+        for network, spec in self.networks.items():
+            path = os.path.join(directory, spec["export"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.model(network, extension).saveBIFXML(path)
+            paths.append(path)
+        return paths
+
+
+network_spec = NetworkSpec(os.environ.get("INVEST_NETWORK_SPEC") or DEFAULT_SPEC)
+
+
+def main():
+    if args.spec is not None:
+        network_spec.load(args.spec)
+    for path in network_spec.export(args.output, args.extension):
+        print(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exports the INVEST influence diagrams as BIFXML')
+    parser.add_argument("--output", type=str, default="res")
+    parser.add_argument("--spec", type=str, default=None,
+                        help="Network specification, defaults to INVEST_NETWORK_SPEC or the bundled specification")
+    parser.add_argument("--extension", action="store_true", help="Export the extended Quality Network")
+    args = parser.parse_args()
+    main()
@@ -1,17 +1,17 @@
+import functools
 import json
 import os
 
 import numpy as np
 import pandas as pd
-import torch
-import torch.utils.data
 
-from gnn.evaluation.validation import inference as inference_, custom_inference as custom_inference_
-from gnn.preprocessing.loader import CustomStandardScaler, ForecastDataset, CustomSimpleDataLoader
-from gnn.preprocessing.utils import process_data
-from gnn.utils import load_model, inverse_transform_
+from invest.preprocessing.dataloader import DATA_DIRECTORY
+from invest.tracing import traced
 
+# torch and the GNN stack are imported on first use, so that backtests without GNN predictions do not load them
 
+
+@traced('gnn_inference')
 def future_share_price_performance(year, model_name="GWN", dataset="INVEST_GNN_clean", horizon=10):
     """
     Estimates the future share price performance using a graph neural network model to
@@ -32,9 +32,9 @@ def future_share_price_performance(year, model_name="GWN", dataset="INVEST_GNN_c
     -------
     pandas.DataFrame
     """
-    result_file = os.path.join('output', model_name, dataset, str(40), str(horizon), 'train')
+    result_file = inference_directory(model_name, dataset, horizon)
     ub = ((year - 2009) * 365)
-    df = pd.read_csv(os.path.join('data', dataset + '.csv'))
+    df = load_price_data(dataset)
     data = df.values
     y = data[ub - 1, :]
 
@@ -48,6 +48,51 @@ def future_share_price_performance(year, model_name="GWN", dataset="INVEST_GNN_c
     return pd.DataFrame(d, columns=df.columns)
 
 
+def inference_directory(model_name="GWN", dataset="INVEST_GNN_clean", horizon=10):
+    """
+    Returns the directory holding the trained model parameter files for a model, dataset and horizon
+    """
+    return os.path.join('output', model_name, dataset, str(40), str(horizon), 'train')
+
+
+@functools.lru_cache(maxsize=None)
+def load_price_data(dataset):
+    """
+    Loads the share price dataset used for inference, cached for the lifetime of the process
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset name
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return pd.read_csv(os.path.join(DATA_DIRECTORY, dataset + '.csv'))
+
+
+@functools.lru_cache(maxsize=None)
+def load_inference_model(result_file):
+    """
+    Loads a trained model and its normalisation statistics, cached for the lifetime of the process
+
+    Parameters
+    ----------
+    result_file : str
+        Directory to load trained model parameter files
+
+    Returns
+    -------
+    (torch.nn.Module, dict)
+    """
+    from gnn.utils import load_model
+
+    with open(os.path.join(result_file, 'norm_stat.json'), 'r') as f:
+        normalize_statistic = json.load(f)
+    return load_model(result_file), normalize_statistic
+
+
 def inference(data, model_name, result_file, window_size=40, horizon=10):
     """
     Performs inference and returns a set of model predictions
@@ -69,9 +114,14 @@ def inference(data, model_name, result_file, window_size=40, horizon=10):
     -------
     numpy.ndarray
     """
-    with open(os.path.join(result_file, 'norm_stat.json'), 'r') as f:
-        normalize_statistic = json.load(f)
-    model = load_model(result_file)
+    import torch.utils.data
+
+    from gnn.evaluation.validation import inference as inference_, custom_inference as custom_inference_
+    from gnn.preprocessing.loader import CustomStandardScaler, ForecastDataset, CustomSimpleDataLoader
+    from gnn.preprocessing.utils import process_data
+    from gnn.utils import inverse_transform_
+
+    model, normalize_statistic = load_inference_model(result_file)
     if model_name == 'StemGNN':
         data_set = ForecastDataset(data, window_size=window_size, horizon=horizon,
                                    normalize_method='z_score',
@@ -1,9 +1,19 @@
+import argparse
+import functools
 import os
 
+import numpy as np
 import pandas as pd
 
+# Directory of the share, benchmark and index membership data, e.g. a dataset of invest.preprocessing.synthetic
+DATA_DIRECTORY = os.environ.get("INVEST_DATA_DIR", "data")
+# Columns of the share data read by the INVEST pipeline
+PANEL_COLUMNS = ["Date", "Name", "ShareBeta", "Price", "PE", "PEMarket", "PESector", "EPS", "ROE", "Debt/Equity",
+                 "Debt/EquityIndustry", "ShareholdersEquity", "InflationRate", "MarketRateOfReturn",
+                 "RiskFreeRateOfReturn"]
 
-def load_data(filename='data/INVEST_clean.csv'):
+
+def load_data(filename=os.path.join(DATA_DIRECTORY, 'INVEST_clean.csv')):
     """
     Loads and returns a dataframe containing company data
     """
@@ -11,9 +21,103 @@ def load_data(filename='data/INVEST_clean.csv'):
     return pd.read_csv(filename, sep=',')
 
 
-def load_benchmark_data(index_code, directory='data/INVEST_IRESS'):
+def load_panel(filename=os.path.join(DATA_DIRECTORY, 'INVEST_clean.csv'), columns=PANEL_COLUMNS, float_dtype=np.float32):
+    """
+    Loads the company data with compact types, Name as a category, Date as datetime64 and the remaining columns as
+    floats, keeping only the given columns
+
+    Parameters
+    ----------
+    filename : str, optional
+        CSV share data
+    columns : list, optional
+        Columns to keep, every column if None
+    float_dtype : numpy.dtype, optional
+        Type of the numeric columns
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    usecols = None if columns is None else lambda column: column in columns
+    df = pd.read_csv(filename, sep=',', usecols=usecols, parse_dates=['Date'], dtype={'Name': 'category'})
+    numeric = [column for column in df.columns if column not in ('Date', 'Name')]
+    df = df.astype({column: float_dtype for column in numeric})
+    return df[[column for column in columns if column in df.columns]] if columns is not None else df
+
+
+def compact_data():
+    """
+    Returns whether INVEST_COMPACT_DATA asks for the share data to be loaded with load_panel
+    """
+    return os.environ.get("INVEST_COMPACT_DATA", "false").lower() in ('yes', 'true', 't', 'y', '1')
+
+
+def date_years(dates):
+    """
+    Returns the year of each date, for dates as datetime64 or as YYYY-MM-DD strings
+
+    Parameters
+    ----------
+    dates : pandas.Series
+        Dates
+
+    Returns
+    -------
+    pandas.Series
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.year
+    return dates.str[:4].astype(int)
+
+
+def memory_report(df):
+    """
+    Returns the memory used by each column of a data frame, including the strings of object columns
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Data frame
+
+    Returns
+    -------
+    pandas.DataFrame
+        Type and bytes of each column, with a total row
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({"dtype": [str(df[c].dtype) if c in df.columns else "" for c in usage.index],
+                           "bytes": usage.to_numpy()}, index=usage.index)
+    report.loc["Total"] = ["", int(usage.sum())]
+    return report
+
+
+def load_benchmark_data(index_code, directory=os.path.join(DATA_DIRECTORY, 'INVEST_IRESS')):
     """
        Loads and returns a dataframe containing benchmark data
     """
+    return _read_benchmark_data(index_code, directory).copy()
+
+
+@functools.lru_cache(maxsize=None)
+def _read_benchmark_data(index_code, directory):
     df = pd.read_csv(os.path.join(directory, index_code + '.csv'), delimiter=';')
     return df.reindex(index=df.index[::-1])
+
+
+def main():
+    default = memory_report(load_data(args.filename))
+    compact = memory_report(load_panel(args.filename))
+    report = pd.concat({"load_data": default, "load_panel": compact}, axis=1)
+    for column in [("load_data", "bytes"), ("load_panel", "bytes")]:
+        report[column] = report[column].map(lambda v: "" if pd.isna(v) else int(v))
+    print(report.fillna("").to_string())
+    print("\nload_panel uses {:.1f}% of the memory of load_data".format(
+        compact.loc["Total", "bytes"] / default.loc["Total", "bytes"] * 100))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reports the memory footprint of the INVEST share data')
+    parser.add_argument("--filename", type=str, default=os.path.join(DATA_DIRECTORY, 'INVEST_clean.csv'))
+    args = parser.parse_args()
+    main()
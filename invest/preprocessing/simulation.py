@@ -1,9 +1,107 @@
 import random
 
+import numpy as np
 
+from invest.tracing import traced
+
+
+class Overlay:
+    """
+    Perturbed values of some rows and columns of a data frame. Only the perturbed values are stored, so a noise trial
+    costs the rows and columns it perturbs rather than a copy of the data frame. An overlay is applied to the rows a
+    computation reads, such as the companies and years of a Store, so the data frame itself is never copied.
+    """
+
+    def __init__(self, index, values):
+        """
+        Parameters
+        ----------
+        index : pandas.Index
+            Labels of the perturbed rows
+        values : dict
+            Perturbed values of each column, in the order of the rows
+        """
+        self.index = index
+        self.values = values
+
+    @property
+    def nbytes(self):
+        """
+        Returns the memory used by the perturbed values
+        """
+        return self.index.nbytes + sum(values.nbytes for values in self.values.values())
+
+    def apply(self, df_):
+        """
+        Returns rows of the data frame with the perturbed values. Only the given rows of the perturbed columns are
+        copied.
+
+        Parameters
+        ----------
+        df_ : pandas.DataFrame
+            Data frame the overlay was drawn from, or a selection of its rows
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        df = df_.copy(deep=False)
+        positions = self.index.get_indexer(df_.index)
+        rows = positions >= 0
+        for column, values in self.values.items():
+            column_values = df_[column].to_numpy(dtype=values.dtype, copy=True)
+            column_values[rows] = values[positions[rows]]
+            df[column] = column_values
+        return df
+
+
+def _float_dtype(dtype):
+    # Integer columns become float64 when perturbed, as when assigning noise in place
+    return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
+
+
+@traced('perturb')
+def perturb(df_, frac=0.3, scale=1, method='std'):
+    """
+    Draws noise for a fraction of the rows of every column but Name and Date
+
+    Parameters
+    ----------
+    df_ : pandas.DataFrame
+        Data frame containing company data
+    frac : int
+        Fraction of data to be replaced with noise
+    scale: int
+        Magnitude of noise
+    method: str
+        Method to create noisy data
+
+    Returns
+    -------
+    Overlay
+    """
+    idx = df_.sample(frac=frac).index
+    values = {}
+    for col in df_.columns:
+        if col == "Name" or col == "Date":
+            continue
+        dtype = _float_dtype(df_[col].dtype)
+        if method == 'std':
+            uniform = random.uniform(0, 1)
+            sign = 1 if uniform >= 0.5 else -1
+            values[col] = (df_.loc[idx, col].to_numpy(dtype=np.float64) + sign * df_[col].std() * scale).astype(dtype)
+        if method == 'zero':
+            values[col] = np.full(len(idx), 0.001, dtype=dtype)
+        if method == 'mean':
+            values[col] = np.full(len(idx), df_[col].mean() * scale, dtype=dtype)
+    return Overlay(idx, values)
+
+
+@traced('simulate')
 def simulate(df_, frac=0.3, scale=1, method='std'):
     """
-    Returns a dataframe containing noisy data
+    Returns a dataframe containing noisy data. This copies every perturbed column, the backtests instead apply the
+    overlay of perturb to the rows they read.
 
     Parameters
     ----------
@@ -19,25 +117,4 @@ def simulate(df_, frac=0.3, scale=1, method='std'):
     -------
     df_ : pandas.DataFrame
     """
-    df = df_.copy(deep=True)
-    idx = df.sample(frac=frac).index
-    if method == 'std':
-        for col in df.columns:
-            if col == "Name" or col == "Date":
-                continue
-            uniform = random.uniform(0, 1)
-            if uniform >= 0.5:
-                df.loc[idx, col] += df[col].std() * scale
-            else:
-                df.loc[idx, col] -= df[col].std() * scale
-    if method == 'zero':
-        for col in df.columns:
-            if col == "Name" or col == "Date":
-                continue
-            df.loc[idx, col] = 0.001
-    if method == 'mean':
-        for col in df.columns:
-            if col == "Name" or col == "Date":
-                continue
-            df.loc[idx, col] = df[col].mean() * scale
-    return df
+    return perturb(df_, frac, scale, method).apply(df_)
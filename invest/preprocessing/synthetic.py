@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns of data/INVEST_clean.csv and of the IRESS benchmark files, in order
+COLUMNS = ["Date", "Beta Monthly Leveraged", "Beta Monthly Unleveraged", "Beta Weekly Leveraged", "ShareBeta", "Price",
+           "Open", "PE", "Name", "Debt/EquityIndustry", "InflationRate", "MarketRateOfReturn", "RiskFreeRateOfReturn",
+           "PEMarket", "PESector", "EPS", "PEYear", "ROAE", "ROE", "Debt/Equity", "ShareholdersEquity"]
+BENCHMARK_COLUMNS = ["Date", "Beta Monthly Leveraged", "Beta Monthly Unleveraged", "Beta Weekly Leveraged",
+                     "Beta Weekly Unleveraged", "Close", "Open", "PE"]
+# First year of the GNN price matrix, from which invest.prediction.main counts days
+GNN_START_YEAR = 2009
+
+
+def _ar(rng, shape, mean, std, phi=0.9):
+    # AR(1) series along the last axis with the given stationary mean and standard deviation
+    noise = rng.normal(0, std * np.sqrt(1 - phi ** 2), shape)
+    values = np.empty(shape)
+    values[..., 0] = rng.normal(0, std, shape[:-1])
+    for t in range(1, shape[-1]):
+        values[..., t] = phi * values[..., t - 1] + noise[..., t]
+    return mean + values
+
+
+def synthesise(companies=1000, start_year=1991, end_year=2021, indices=4, seed=0):
+    """
+    Synthesises share data in the schema of data/INVEST_clean.csv. Prices follow a one factor market model, earnings
+    are derived from prices through sector PEs, and the macro-economic rates are autocorrelated series around the
+    means of the INVEST data. A fifth of the companies list after the start year, so they have fewer rows.
+
+    Parameters
+    ----------
+    companies : int, optional
+        Number of companies (C)
+    start_year : int, optional
+    end_year : int, optional
+        Year after the last year
+    indices : int, optional
+        Number of sector indices, each company belongs to one
+    seed : int, optional
+        Random seed
+
+    Returns
+    -------
+    (pandas.DataFrame, dict)
+        Monthly share data and the constituents of each index
+    """
+    rng = np.random.default_rng(seed)
+    months = 12 * (end_year - start_year)
+    dates = pd.date_range("{}-01-31".format(start_year), periods=months, freq="M").strftime("%Y-%m-%d").to_numpy()
+    names = np.array(["SYN{:05d}".format(c) for c in range(companies)])
+    codes = ["SYN{:02d}".format(k + 1) for k in range(indices)]
+    sector = np.arange(companies) % indices
+
+    # Macro-economic series (months) and sector series (indices x months)
+    market = rng.normal(0.008, 0.045, months)
+    inflation = np.round(_ar(rng, (months,), 5.2, 1.0), 2)
+    risk_free = np.round(_ar(rng, (months,), 8.3, 0.8), 2)
+    market_return = np.round(risk_free + _ar(rng, (months,), 3.5, 0.5), 2)
+    pe_market = _ar(rng, (months,), 17.2, 3.0, 0.95)
+    pe_sector = pe_market * np.exp(_ar(rng, (indices, months), 0, 0.15, 0.95))
+    debt_equity_industry = np.round(np.exp(rng.normal(np.log(1.86), 0.2, indices)), 2)
+
+    # Company series (C x months)
+    beta = rng.normal(0.41, 0.23, companies)
+    share_beta = beta[:, np.newaxis] + _ar(rng, (companies, months), 0, 0.05)
+    drift = rng.normal(0.005, 0.004, companies)
+    returns = beta[:, np.newaxis] * (market - 0.008) + drift[:, np.newaxis] + rng.normal(0, 0.08, (companies, months))
+    log_price = rng.normal(8.5, 0.9, companies)[:, np.newaxis] + np.cumsum(returns, axis=1)
+    price = np.maximum(np.round(np.exp(log_price)), 1)
+    open_ = np.maximum(np.round(np.concatenate([price[:, :1], price[:, :-1]], axis=1) *
+                                np.exp(rng.normal(0, 0.01, (companies, months)))), 0)
+    # Earnings are set at the start of each year from the price and a company PE around the sector PE
+    year_start = np.arange(0, months, 12)
+    pe_company = pe_sector[sector][:, year_start] * np.exp(_ar(rng, (companies, len(year_start)), 0, 0.35, 0.7))
+    eps_year = price[:, year_start] / pe_company
+    eps_year = np.where(rng.random(eps_year.shape) < 0.05, -0.5 * eps_year, eps_year)
+    eps = np.round(np.repeat(eps_year, 12, axis=1), 1)
+    eps = np.where(eps == 0, 0.1, eps)
+    roe = np.repeat(rng.normal(20, 15, companies)[:, np.newaxis] + rng.normal(0, 8, (companies, len(year_start))),
+                    12, axis=1)
+    debt_equity = np.exp(np.log(1.2) + rng.normal(0, 0.6, companies)[:, np.newaxis] +
+                         _ar(rng, (companies, months), 0, 0.2, 0.95))
+    equity = np.exp(np.log(4.2e6) + rng.normal(0, 0.9, companies)[:, np.newaxis] +
+                    np.cumsum(rng.normal(0.004, 0.02, (companies, months)), axis=1))
+
+    columns = {
+        "Date": np.tile(dates, companies),
+        "Beta Monthly Leveraged": share_beta + rng.normal(0.13, 0.1, (companies, months)),
+        "Beta Monthly Unleveraged": 0.9 * share_beta + rng.normal(0.0, 0.1, (companies, months)),
+        "Beta Weekly Leveraged": share_beta + rng.normal(0.15, 0.1, (companies, months)),
+        "ShareBeta": share_beta,
+        "Price": price.astype(np.int64),
+        "Open": open_.astype(np.int64),
+        "PE": price / eps,
+        "Name": np.repeat(names, months),
+        "Debt/EquityIndustry": np.repeat(debt_equity_industry[sector], months),
+        "InflationRate": np.tile(inflation, companies),
+        "MarketRateOfReturn": np.tile(market_return, companies),
+        "RiskFreeRateOfReturn": np.tile(risk_free, companies),
+        "PEMarket": np.tile(pe_market, companies),
+        "PESector": pe_sector[sector],
+        "EPS": eps,
+        "PEYear": price / eps * np.exp(rng.normal(0, 0.1, (companies, months))),
+        "ROAE": roe + rng.normal(1, 3, (companies, months)),
+        "ROE": roe,
+        "Debt/Equity": debt_equity,
+        "ShareholdersEquity": np.round(equity).astype(np.int64),
+    }
+    decimals = {"Beta Monthly Leveraged": 4, "Beta Monthly Unleveraged": 4, "Beta Weekly Leveraged": 4, "ShareBeta": 4,
+                "PE": 3, "PEMarket": 3, "PESector": 3, "PEYear": 4, "ROAE": 4, "ROE": 4, "Debt/Equity": 4}
+    df = pd.DataFrame({column: np.round(np.ravel(values), decimals[column]) if column in decimals else
+                       np.ravel(values) for column, values in columns.items()}, columns=COLUMNS)
+
+    # Companies listed after the start year have no rows before listing
+    listing = np.where(rng.random(companies) < 0.2, rng.integers(0, months // 2, companies), 0)
+    df = df[np.arange(months)[np.newaxis, :].repeat(companies, 0).ravel() >= np.repeat(listing, months)]
+    members = {code: names[sector == k].tolist() for k, code in enumerate(codes)}
+    return df.reset_index(drop=True), members
+
+
+def benchmark(df, members):
+    """
+    Returns the equally weighted index of the constituents in the IRESS benchmark format, latest date first
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Synthesised share data
+    members : list
+        Constituents of the index
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    df = df[df['Name'].isin(members)]
+    prices = df.pivot(index='Date', columns='Name', values='Price').sort_index()
+    returns = np.log(prices).diff().mean(axis=1).fillna(0)
+    close = 100 * np.exp(returns.cumsum())
+    betas = df.groupby('Date')[['Beta Monthly Leveraged', 'Beta Monthly Unleveraged', 'Beta Weekly Leveraged',
+                                'ShareBeta']].mean().reindex(close.index)
+    index = pd.DataFrame({"Date": close.index.str.replace('-', '/'),
+                          "Beta Monthly Leveraged": betas['Beta Monthly Leveraged'].to_numpy(),
+                          "Beta Monthly Unleveraged": betas['Beta Monthly Unleveraged'].to_numpy(),
+                          "Beta Weekly Leveraged": betas['Beta Weekly Leveraged'].to_numpy(),
+                          "Beta Weekly Unleveraged": 0,
+                          "Close": close.to_numpy(),
+                          "Open": close.shift(1).fillna(100).to_numpy(),
+                          "PE": df.groupby('Date')['PE'].median().reindex(close.index).to_numpy()},
+                         columns=BENCHMARK_COLUMNS)
+    return index.round(4).iloc[::-1]
+
+
+def gnn_prices(df, seed=0):
+    """
+    Returns daily share prices in the format of data/INVEST_GNN_clean.csv, 365 days a year from GNN_START_YEAR,
+    interpolated from the monthly prices with daily noise and back filled before listing
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Synthesised share data
+    seed : int, optional
+        Random seed
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    prices = df.pivot(index='Date', columns='Name', values='Price').sort_index()
+    prices = prices[prices.index >= str(GNN_START_YEAR)].bfill()
+    years = len(prices) // 12
+    days = np.arange(365 * years) * len(prices) / (365 * years)
+    log_prices = np.log(prices.to_numpy(dtype=np.float64))
+    daily = np.stack([np.interp(days, np.arange(len(prices)), log_prices[:, c]) for c in range(prices.shape[1])], 1)
+    daily += rng.normal(0, 0.01, daily.shape)
+    return pd.DataFrame(np.round(np.exp(daily)).astype(np.int64), columns=prices.columns)
+
+
+def write(directory, companies=1000, start_year=1991, end_year=2021, indices=4, seed=0, gnn=False):
+    """
+    Writes a synthetic dataset with the layout of the data directory, which INVEST reads when INVEST_DATA_DIR is set
+    to the directory: INVEST_clean.csv, an IRESS benchmark file and a membership file per index, and optionally
+    INVEST_GNN_clean.csv
+
+    Parameters
+    ----------
+    directory : str
+        Output directory
+    companies : int, optional
+        Number of companies
+    start_year : int, optional
+    end_year : int, optional
+        Year after the last year
+    indices : int, optional
+        Number of sector indices
+    seed : int, optional
+        Random seed
+    gnn : bool, optional
+        Write daily prices for GNN inference
+
+    Returns
+    -------
+    dict
+        Constituents of each index
+    """
+    df, members = synthesise(companies, start_year, end_year, indices, seed)
+    os.makedirs(os.path.join(directory, 'INVEST_IRESS'), exist_ok=True)
+    df.to_csv(os.path.join(directory, 'INVEST_clean.csv'), index=False)
+    for index_code, names in members.items():
+        benchmark(df, names).to_csv(os.path.join(directory, 'INVEST_IRESS', index_code + '.csv'), sep=';',
+                                    decimal=',', index=False)
+        with open(os.path.join(directory, index_code.lower() + '.json'), 'w') as f:
+            json.dump({"names": names}, f)
+    if gnn:
+        gnn_prices(df, seed).to_csv(os.path.join(directory, 'INVEST_GNN_clean.csv'), index=False)
+    return members
+
+
+def main():
+    members = write(args.output, args.companies, args.start, args.end, args.indices, args.seed, args.gnn)
+    print("{} companies in {} indices from {} to {} written to {}".format(
+        sum(len(names) for names in members.values()), len(members), args.start, args.end, args.output))
+    print("Run INVEST on the dataset with INVEST_DATA_DIR={} and --indices {}".format(args.output, " ".join(members)))
+
+
+def str2bool(v):
+    if isinstance(v, bool):
+        return v
+    if v.lower() in ('yes', 'true', 't', 'y', '1'):
+        return True
+    elif v.lower() in ('no', 'false', 'f', 'n', '0'):
+        return False
+    else:
+        raise argparse.ArgumentTypeError('Boolean value expected.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthesises INVEST datasets of a configurable size')
+    parser.add_argument("--output", type=str, required=True)
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--start", type=int, default=1991)
+    parser.add_argument("--end", type=int, default=2021)
+    parser.add_argument("--indices", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gnn", type=str2bool, default=False)
+    args = parser.parse_args()
+    main()
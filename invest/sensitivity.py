@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+import invest.evaluation.portfolio as portfolio
+from invest.cache import ratio_cache
+from invest.decision import state_decisions
+from invest.networks import solver
+from invest.networks.spec import network_spec
+from invest.prediction.main import future_share_price_performance
+from invest.preprocessing.simulation import perturb
+from invest.states import Investable
+from invest.store import Store
+from invest.tracing import stage, traced
+from invest.universe import universe
+
+METRICS = ["compoundReturn", "averageAnnualReturn", "treynor", "sharpe"]
+
+# Store fields entered as evidence, in the order taken by state_decisions
+EVIDENCE = ["current_PE_relative_share_market_to_historical", "current_PE_relative_share_sector_to_historical",
+            "forward_PE_current_to_historical", "roe_vs_coe", "relative_debt_to_equity", "growth_cagr_vs_inflation",
+            "systematic_risk"]
+
+
+class Perturbation:
+    """
+    Variant of the networks of a specification in which some CPTs or utilities are replaced. Tables are keyed by
+    network and node, e.g. "recommendation.Value", and have the shape of the table they replace.
+    """
+
+    def __init__(self, tables=None, spec=network_spec):
+        """
+        Parameters
+        ----------
+        tables : dict, optional
+            Replacement CPTs and utilities, the networks of the specification if None
+        spec : invest.networks.spec.NetworkSpec, optional
+            Network specification
+        """
+        self.spec = spec
+        self.tables = {}
+        for key, table in (tables or {}).items():
+            network, name = key.split('.', 1)
+            table = np.asarray(table, dtype=np.float64)
+            expected = spec.table(network, name).shape
+            if table.shape != expected:
+                raise ValueError("{} has shape {}, expected {}".format(key, table.shape, expected))
+            self.tables[(network, name)] = table
+
+    def table(self, network, name):
+        """
+        Returns the CPT or utility table of a node
+        """
+        if (network, name) in self.tables:
+            return self.tables[(network, name)]
+        return self.spec.table(network, name)
+
+    def parameters(self):
+        """
+        Returns the solver parameters of each network
+
+        Returns
+        -------
+        dict
+        """
+        return {"value": solver.value_parameters(self),
+                "quality": solver.quality_parameters(self),
+                "recommendation": solver.recommendation_parameters(self)}
+
+
+def dirichlet_perturbations(nodes, n, concentration=100, seed=0, spec=network_spec):
+    """
+    Returns random perturbations of CPTs, each row of a CPT is drawn from a Dirichlet distribution with a mean of
+    the row of the specification. The first perturbation leaves the networks unchanged.
+
+    Parameters
+    ----------
+    nodes : list
+        Chance nodes to perturb, as network.node
+    n : int
+        Number of perturbations, including the unperturbed networks
+    concentration : float, optional
+        Concentration of the Dirichlet distributions, perturbations are smaller as it increases
+    seed : int, optional
+        Random seed
+    spec : invest.networks.spec.NetworkSpec, optional
+        Network specification
+
+    Returns
+    -------
+    list
+        invest.sensitivity.Perturbation of each variant
+    """
+    rng = np.random.default_rng(seed)
+    perturbations = [Perturbation(spec=spec)]
+    for _ in range(n - 1):
+        tables = {}
+        for key in nodes:
+            cpt = spec.table(*key.split('.', 1))
+            rows = cpt.reshape(-1, cpt.shape[-1])
+            tables[key] = np.array([rng.dirichlet(concentration * row) for row in rows]).reshape(cpt.shape)
+        perturbations.append(Perturbation(tables, spec))
+    return perturbations
+
+
+def _stack(parameters):
+    # Solver parameters of each perturbation stacked along a leading perturbation axis
+    return {network: {k: np.stack([p[network][k] for p in parameters]) for k in parameters[0][network]}
+            for network in parameters[0]}
+
+
+@traced('sensitivity')
+def sensitivity(df_, params, perturbations, index_codes=("JGIND", "JCSEV"), chunk_size=4096):
+    """
+    Backtests INVEST for a batch of perturbations of the network CPTs and utilities. The evidence states of each
+    year are thresholded once, as in investment_portfolio, and every distinct set of evidence is solved for every
+    perturbation in vectorised chunks with invest.networks.solver. The portfolios of all perturbations are then
+    evaluated as a batch.
+
+    Parameters
+    ----------
+    df_ : pandas.DataFrame
+        Fundamental and price data
+    params : argparse.Namespace
+        Command line arguments
+    perturbations : list
+        invest.sensitivity.Perturbation of each variant (P)
+    index_codes : tuple, optional
+        Johannesburg Stock Exchange sector index codes
+    chunk_size : int, optional
+        Queries solved at once
+
+    Returns
+    -------
+    dict
+        Years and, per index, the shares selected (P x Y), Annual Returns (P x Y) and Compound Return, Average
+        Annual Return, Treynor and Sharpe Ratios (P) of each perturbation
+    """
+    # Noise is applied to the rows each Store reads rather than to a copy of the share data
+    overlay = perturb(df_) if params.noise else None
+    years = list(range(params.start, params.end))
+    columns = universe.companies(index_codes)
+
+    # Evidence of each acceptable share and year (Q)
+    evidence_, positions = [], []
+    for y, year in enumerate(years):
+        store = Store(df_, universe.companies(index_codes, year), params.margin_of_safety, params.beta, year, False,
+                      None if params.noise else ratio_cache, overlay)
+        if params.gnn:
+            df_future_performance = future_share_price_performance(year, horizon=params.horizon)
+        else:
+            df_future_performance = pd.DataFrame()
+        for company, share in zip(store.companies, store.shares):
+            if not share["acceptable_stock"]:
+                continue
+            if not df_future_performance.empty:
+                future_performance = bool(df_future_performance[company][0])
+            else:
+                future_performance = False
+            evidence_.append([share[field] for field in EVIDENCE] + [future_performance])
+            positions.append((y, columns.index(company)))
+
+    selected = np.zeros((len(perturbations), len(years), len(columns)), dtype=bool)
+    if evidence_:
+        # Distinct evidence (K) is solved once per perturbation, as queries (P x K)
+        keys, inverse = np.unique(np.array(evidence_, dtype=np.int64), axis=0, return_inverse=True)
+        parameters = _stack([p.parameters() for p in perturbations])
+        investable = np.empty(len(perturbations) * len(keys), dtype=bool)
+        with stage("solve"):
+            for start in range(0, len(investable), chunk_size):
+                queries = np.arange(start, min(start + chunk_size, len(investable)))
+                p, k = np.divmod(queries, len(keys))
+                chunk = {network: {name: table[p] for name, table in tables.items()}
+                         for network, tables in parameters.items()}
+                investable[queries] = state_decisions(*keys[k, :-1].T, keys[k, -1], params.extension,
+                                                      params.ablation, params.network, chunk) == Investable.YES
+        y, c = np.array(positions).T
+        selected[:, y, c] = investable.reshape(len(perturbations), len(keys))[:, inverse.ravel()]
+
+    with stage("data_access"):
+        panel = portfolio.price_panel(df_, columns, years, params.holding_period)
+    risk_free_rates = portfolio.risk_free_rates(df_, years)
+
+    result = {"perturbations": len(perturbations), "years": years}
+    for index_code in index_codes:
+        index_columns = [columns.index(c) for c in universe.members(index_code)]
+        members = universe.membership(index_code, years, universe.members(index_code))
+        weights = (selected[..., index_columns] & members).astype(np.float64)
+        metrics = portfolio.portfolio_metrics(weights, *[values[:, index_columns] for values in panel],
+                                              risk_free_rates)
+        shares = np.empty((len(perturbations), len(years)), dtype=object)
+        for p in range(len(perturbations)):
+            for y in range(len(years)):
+                shares[p, y] = [columns[c] for i, c in enumerate(index_columns) if weights[p, y, i]]
+        result[index_code.lower()] = {"shares": shares, **metrics}
+    return result
+
+
+def sensitivity_table(result, index_codes=("JGIND", "JCSEV")):
+    """
+    Returns the shares selected and annual return of each perturbation, year and index
+
+    Parameters
+    ----------
+    result : dict
+        Result of sensitivity
+    index_codes : tuple, optional
+        Johannesburg Stock Exchange sector index codes
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by perturbation, year and index
+    """
+    rows = []
+    for index_code in index_codes:
+        cube = result[index_code.lower()]
+        for p in range(result["perturbations"]):
+            for y, year in enumerate(result["years"]):
+                rows.append((p, year, index_code, cube["shares"][p, y], len(cube["shares"][p, y]),
+                             cube["annualReturns"][p, y]))
+    table = pd.DataFrame(rows, columns=["perturbation", "year", "index", "shares", "count", "annualReturn"])
+    return table.set_index(["perturbation", "year", "index"]).sort_index()
@@ -0,0 +1,131 @@
+from enum import IntEnum
+
+import numpy as np
+
+# Discrete states are stored as int8 codes. Codes match the label order of the network nodes they are entered as
+# evidence for, so a code can be used directly as an evidence index. Undefined states are coded as MISSING.
+STATE_DTYPE = np.int8
+MISSING = -1
+
+
+class Value(IntEnum):
+    """
+    PE relative to market and sector and Forward PE states, also the Value Network decision
+    """
+    CHEAP = 0
+    FAIR_VALUE = 1
+    EXPENSIVE = 2
+
+
+class Relative(IntEnum):
+    """
+    ROE vs COE, CAGR vs Inflation and Relative Debt to Equity states
+    """
+    ABOVE = 0
+    EQUAL_TO = 1
+    BELOW = 2
+
+
+class SystematicRisk(IntEnum):
+    """
+    Systematic Risk states of the Quality Network extension
+    """
+    GREATER = 0
+    EQUAL_TO = 1
+    LOWER = 2
+
+
+class Quality(IntEnum):
+    """
+    Quality Network decision
+    """
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+
+
+class Investable(IntEnum):
+    """
+    Investment Recommendation decision
+    """
+    YES = 0
+    NO = 1
+
+
+# Labels of the scalar thresholds in invest.calculator.threshold and by the networks
+LABELS = {
+    Value: ["cheap", "fairValue", "expensive"],
+    Relative: ["above", "EqualTo", "below"],
+    SystematicRisk: ["greater", "EqualTo", "lower"],
+}
+DECISION_LABELS = {
+    Value: ["Cheap", "FairValue", "Expensive"],
+    Quality: ["High", "Medium", "Low"],
+    Investable: ["Yes", "No"],
+}
+
+
+def evidence(state, n=3):
+    """
+    Returns hard evidence for a node in the given state. Undefined states are entered as the last state of the
+    node, as the networks have always done.
+
+    Parameters
+    ----------
+    state : int
+        State code, None or MISSING if undefined
+    n : int, optional
+        Number of node states
+
+    Returns
+    -------
+    list
+    """
+    index = n - 1 if state is None or state < 0 else int(state)
+    return [1 if i == index else 0 for i in range(n)]
+
+
+def to_labels(codes, enum, labels=LABELS):
+    """
+    Converts integer-coded states to string labels. Masked and MISSING codes become None.
+
+    Parameters
+    ----------
+    codes : numpy.ma.MaskedArray
+        Integer-coded states
+    enum : type
+        State enumeration of the codes
+    labels : dict, optional
+        Labels of each state enumeration
+
+    Returns
+    -------
+    numpy.ndarray
+        Labels with the shape of the codes
+    """
+    codes = np.ma.masked_less(np.ma.asarray(codes).astype(np.int64), 0)
+    table = np.array(labels[enum] + [None], dtype=object)
+    return table[np.ma.filled(codes, len(labels[enum]))]
+
+
+def from_labels(labels_, enum, labels=LABELS):
+    """
+    Converts string labels to integer-coded states. Labels that are None are masked.
+
+    Parameters
+    ----------
+    labels_ : array_like
+        String labels
+    enum : type
+        State enumeration of the labels
+    labels : dict, optional
+        Labels of each state enumeration
+
+    Returns
+    -------
+    numpy.ma.MaskedArray
+    """
+    lookup = {label: code for code, label in enumerate(labels[enum])}
+    labels_ = np.asarray(labels_, dtype=object)
+    codes = np.array([lookup.get(label, -1) for label in labels_.ravel()], dtype=STATE_DTYPE).reshape(labels_.shape)
+    return np.ma.masked_less(codes, 0)
@@ -1,8 +1,47 @@
 import numpy as np
 import pandas as pd
 
-import invest.calculator.ratios as ratios
-import invest.calculator.threshold as threshold
+import invest.calculator.array_ratios as array_ratios
+import invest.calculator.array_threshold as array_threshold
+from invest.preprocessing.dataloader import date_years
+from invest.states import MISSING, STATE_DTYPE
+from invest.tracing import traced
+
+# Ratios of each company returned by universe_ratios
+RATIOS = ["forward_earnings", "shareholders_equity", "share_beta", "pe_current_share_market", "pe_relative_market",
+          "pe_current_share_sector", "pe_relative_sector", "forward_price_to_earnings",
+          "historic_price_to_earnings_share", "roe", "cost_of_equity", "historic_earnings_cagr", "inflation",
+          "relative_debt_equity"]
+
+# Record of the thresholded states of a company, states are codes of invest.states
+STATES = np.dtype([("negative_earnings", np.bool_),
+                   ("negative_shareholders_equity", np.bool_),
+                   ("beta_classify", np.bool_),
+                   ("acceptable_stock", np.bool_),
+                   ("current_PE_relative_share_market_to_historical", STATE_DTYPE),
+                   ("current_PE_relative_share_sector_to_historical", STATE_DTYPE),
+                   ("forward_PE_current_to_historical", STATE_DTYPE),
+                   ("roe_vs_coe", STATE_DTYPE),
+                   ("growth_cagr_vs_inflation", STATE_DTYPE),
+                   ("relative_debt_to_equity", STATE_DTYPE),
+                   ("systematic_risk", STATE_DTYPE)])
+
+
+class ShareStates:
+    """
+    Thresholded states of a single company, one attribute per field of STATES
+    """
+    __slots__ = STATES.names
+
+    def __init__(self, record):
+        """
+        Parameters
+        ----------
+        record : numpy.void
+            Record of the STATES structured array
+        """
+        for field, value in zip(self.__slots__, record.item()):
+            setattr(self, field, value)
 
 
 class Store:
@@ -10,19 +49,15 @@ class Store:
     Performs ratio and threshold calculations needed by the Bayesian Networks as input
     """
 
-    def __init__(self, main_data, companies, companies_jcsev, companies_jgind, margin_of_safety,
-                 beta, years, extension):
+    def __init__(self, main_data, companies, margin_of_safety, beta, years, extension, ratio_cache=None,
+                 overlay=None):
         """
         Parameters
         ----------
         main_data : pandas.DataFrame,
             Pandas data frame containing all share data
         companies : list
-            All companies from JGIND & JCSEV
-        companies_jcsev :list
-            JCSEV companies
-        companies_jgind :list
-            JGIND companies
+            Constituents of every index evaluated, see invest.universe
         margin_of_safety :float
             Args parameter for safety threshold
         beta :float
@@ -31,217 +66,235 @@ class Store:
             The year calculations need to be computed for
         extension: bool
             Boolean indicating whether the extended experiment needs to be run
+        ratio_cache: invest.cache.RatioCache, optional
+            Cache of the raw ratios, which only need to be thresholded when cached
+        overlay: invest.preprocessing.simulation.Overlay, optional
+            Noise applied to the share data as it is read, the ratio cache is not used with an overlay
 
         """
         self.df_main = main_data
         self.companies = companies
-        self.companies_jcsev = companies_jcsev
-        self.companies_jgind = companies_jgind
         self.margin_of_safety = margin_of_safety
         self.beta = beta
         self.years = years
         self.extension = extension
-        self.column_names = ["company_name", "negative_earnings", "negative_shareholders_equity", "beta_classify",
-                             "acceptable_stock",
-                             "current_PE_relative_share_market_to_historical",
-                             "current_PE_relative_share_sector_to_historical",
-                             "forward_PE_current_to_historical", "roe_vs_coe",
-                             "growth_cagr_vs_inflation", "relative_debt_to_equity", "systematic_risk"]
-        self.df_shares = pd.DataFrame(columns=self.column_names)
+        self.ratio_cache = ratio_cache
+        self.overlay = overlay
+        self.shares = None
+        self.index = {}
+        self.records = {}
         self.process()
 
+    @traced('store')
     def process(self):
         """
         Performs the relevant calculations and thresholding for each company in the dataset
         """
-        for company in self.companies:
-            eps_year_list = []
-            pe_sector_list = []
-            pe_market_list = []
-
-            start_year = self.years - 4
-            end_year = self.years
-            df_current_year = None
-            current_price = None
-            for i in range(start_year, end_year):
-                mask_eps = (self.df_main['Date'] >= str(i) + '-01-01') & (
-                        self.df_main['Date'] <= str(i) + '-12-31') & (self.df_main['Name'] == company)
-                company_df_by_year = self.df_main.loc[mask_eps]
-
-                eps = company_df_by_year.iloc[-1]['EPS']
-                eps_year_list.append(eps)
-
-                mask_current_price = (self.df_main['Date'] >= str(end_year - 1) + '-' + '01-01') & (
-                        self.df_main['Date'] < str(end_year) + '-' + '01-01') & (self.df_main['Name'] == company)
-                df_current_year = self.df_main.loc[mask_current_price]
-                current_price = df_current_year.iloc[-1]['Price']
-
-                mask_pe_sector_market = (self.df_main['Date'] >= str(end_year - 3) + '-' + '01-01') & (
-                        self.df_main['Date'] < str(end_year) + '-' + '01-01') & (self.df_main['Name'] == company)
-                pe_sector_3_years = self.df_main.loc[mask_pe_sector_market]
-                pe_market_3_years = self.df_main.loc[mask_pe_sector_market]
-                for v in pe_sector_3_years['PESector'].to_numpy():
-                    if not np.isnan(v):
-                        pe_sector_list.append(float(v))
-
-                for v in pe_market_3_years['PEMarket'].to_numpy():
-                    if not np.isnan(v):
-                        pe_market_list.append(float(v))
-
-            # historic_earnings_growth_rate
-            growth_years_n = end_year - start_year
-            historic_earnings_growth_rate = ratios.historic_earnings_growth_rate(eps_year_list, growth_years_n)
-
-            # historic_earnings_cagr
-            historic_earnings_cagr = ratios.historic_earnings_cagr(eps_year_list[-1], eps_year_list[-4], 3)
-
-            # historic_price_to_earnings_share
-            mask_pe = (self.df_main['Date'] >= str(end_year - 1) + '-01-01') & (
-                    self.df_main['Date'] < str(end_year) + '-01-01') & (self.df_main['Name'] == company)
-            df_company_3_years = self.df_main.loc[mask_pe]
-            price_list_3_years = df_company_3_years['Price'].to_numpy()
-            eps_list_3_years = df_company_3_years['EPS'].to_numpy()
-            historic_price_to_earnings_share = ratios.historic_price_to_earnings_share(price_list_3_years,
-                                                                                       eps_list_3_years)
-            forward_earnings_current_year = ratios.forward_earnings(eps_year_list[-1], historic_earnings_growth_rate)
-
-            historic_earnings_growth_rate_past = ratios.historic_earnings_growth_rate(eps_year_list, 3)
-
-            forward_earnings_past = ratios.forward_earnings(eps_year_list[-1],
-                                                            historic_earnings_growth_rate_past)  # intermediate
-            forward_earnings_cagr = ratios.forward_earnings_cagr(forward_earnings_current_year, forward_earnings_past,
-                                                                 3)
-
-            forward_price_to_earnings = ratios.forward_price_to_earnings(current_price, forward_earnings_current_year)
-
-            # PE Relative
-            pe_relative_market = ratios.pe_relative_market(historic_price_to_earnings_share, pe_market_list)
-            pe_relative_sector = ratios.pe_relative_sector(historic_price_to_earnings_share, pe_sector_list)
-
-            # ROE
-            roe_current = df_current_year.iloc[-1]['ROE']
-            # COE
-            market_rate_of_return = df_current_year.iloc[-1]['MarketRateOfReturn']
-            risk_free_rate_of_return = df_current_year.iloc[-1]['RiskFreeRateOfReturn']
-            share_beta = df_current_year.iloc[-1]['ShareBeta']
-            cost_of_equity = ratios.cost_of_equity(float(market_rate_of_return), float(risk_free_rate_of_return),
-                                                   float(share_beta))
-            # Relative Debt/Equity
-            debt_equity = df_current_year.iloc[-1]['Debt/Equity']
-            debt_equity_industry = df_current_year.iloc[-1]['Debt/EquityIndustry']
-            relative_debt_equity = ratios.relative_debt_to_equity(float(debt_equity), float(
-                debt_equity_industry))
-            # Threshold
-            negative_earnings = threshold.negative_earnings(forward_earnings_current_year)
-            shareholders_equity = df_current_year.iloc[-1]['ShareholdersEquity']
-            negative_shareholders_equity = threshold.negative_shareholders_equity(float(shareholders_equity))
-            beta_classify = threshold.beta_classify(float(share_beta), self.beta)
-            acceptable_stock = threshold.acceptable_stock(negative_earnings, negative_shareholders_equity,
-                                                          beta_classify)
-
-            if acceptable_stock:
-                current_share_pe = df_current_year.iloc[-1]['PE']
-                current_market_pe = df_current_year.iloc[-1]['PEMarket']
-
-                current_sector_pe = df_current_year.iloc[-1]['PESector']
-
-                pe_current_share_market = ratios.current_pe_market(float(current_share_pe),
-                                                                   float(current_market_pe))  # PE value for this year
-
-                pe_current_share_sector = ratios.current_pe_sector(float(current_share_pe),
-                                                                   float(current_sector_pe))  # PE value for this year
-                pe_relative_market_ = threshold.current_pe_relative_share_market(self.margin_of_safety,
-                                                                                 pe_current_share_market,
-                                                                                 pe_relative_market)
-                pe_relative_sector_ = threshold.current_pe_relative_share_sector(self.margin_of_safety,
-                                                                                 pe_current_share_sector,
-                                                                                 pe_relative_sector)
-                # Forward PE
-                forward_pe = threshold.forward_pe(self.margin_of_safety, forward_price_to_earnings,
-                                                  historic_price_to_earnings_share)
-
-                # ROE vs COE
-                roe_coe = threshold.roe_coe(self.margin_of_safety, roe_current, cost_of_equity)
-
-                # CAGR inflation
-                inflation = df_current_year.iloc[-1]['InflationRate']
-                cagr_inflation = threshold.cagr_inflation(self.margin_of_safety, historic_earnings_cagr,
-                                                          float(inflation))
-
-                relative_debt_to_equity = threshold.relative_debt_to_equity(self.margin_of_safety, relative_debt_equity)
-
-                if self.extension:
-                    systematic_risk = threshold.systematic_risk_classification(float(share_beta))
-                else:
-                    systematic_risk = None
-
-                company_row = {"company_name": company,
-                               "negative_earnings": negative_earnings,
-                               "negative_shareholders_equity": negative_shareholders_equity,
-                               "beta_classify": beta_classify,
-                               "acceptable_stock": acceptable_stock,
-                               "current_PE_relative_share_market_to_historical": pe_relative_market_,
-                               "current_PE_relative_share_sector_to_historical": pe_relative_sector_,
-                               "forward_PE_current_to_historical": forward_pe, "roe_vs_coe": roe_coe,
-                               "growth_cagr_vs_inflation": cagr_inflation,
-                               "relative_debt_to_equity": relative_debt_to_equity,
-                               "systematic_risk": systematic_risk}
-                self.df_shares = self.df_shares.append(company_row, ignore_index=True)
-            else:
-                company_row = {"company_name": company,
-                               "negative_earnings": negative_earnings,
-                               "negative_shareholders_equity": negative_shareholders_equity,
-                               "beta_classify": beta_classify,
-                               "acceptable_stock": acceptable_stock}
-                self.df_shares = self.df_shares.append(company_row, ignore_index=True)
+        if self.ratio_cache is not None and self.overlay is None:
+            cached = self.ratio_cache.year_ratios(self.df_main, self.companies, self.years)
+            ratios_ = {k: np.array([cached[company][k] for company in self.companies], dtype=np.float64)
+                       for k in RATIOS}
+        else:
+            ratios_ = {k: v[0] for k, v in universe_ratios(self.df_main, self.companies, [self.years],
+                                                            self.overlay).items()}
+        self.shares = threshold_states(ratios_, self.margin_of_safety, self.beta, self.extension)
+        self.index = {company: i for i, company in enumerate(self.companies)}
+        self.records = {company: ShareStates(record) for company, record in zip(self.companies, self.shares)}
+
+    def get_states(self, companies):
+        """
+        Returns the states of the given companies
+
+        Parameters
+        ----------
+        companies : list
+            Companies to return the states of
+
+        Returns
+        -------
+        numpy.ndarray
+            States with the STATES dtype in the order of the companies, each field is an array over the companies
+        """
+        return self.shares[[self.index[company] for company in companies]]
 
     def get_acceptable_stock(self, company):
         """
-        Returns the discrete state of whether the stock is acceptable or not for the given company
+        Returns whether the stock of the given company is acceptable
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "acceptable_stock"].iloc[0]
+        return self.records[company].acceptable_stock
 
     def get_pe_relative_market(self, company):
         """
         Returns the PE relative to market discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company,
-                                  "current_PE_relative_share_market_to_historical"].iloc[0]
+        return self.records[company].current_PE_relative_share_market_to_historical
 
     def get_pe_relative_sector(self, company):
         """
         Returns the PE relative to sector discrete state for the given company
         """
-
-        return self.df_shares.loc[self.df_shares['company_name'] == company,
-                                  "current_PE_relative_share_sector_to_historical"].iloc[0]
+        return self.records[company].current_PE_relative_share_sector_to_historical
 
     def get_forward_pe(self, company):
         """
         Returns the Forward PE discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "forward_PE_current_to_historical"].iloc[0]
+        return self.records[company].forward_PE_current_to_historical
 
     def get_roe_vs_coe(self, company):
         """
         Returns the ROE vs COE discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "roe_vs_coe"].iloc[0]
+        return self.records[company].roe_vs_coe
 
     def get_relative_debt_equity(self, company):
         """
         Returns the Relative Debt to Equity discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "relative_debt_to_equity"].iloc[0]
+        return self.records[company].relative_debt_to_equity
 
     def get_cagr_vs_inflation(self, company):
         """
         Returns the Compound Annual Growth Rate vs Inflation discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "growth_cagr_vs_inflation"].iloc[0]
+        return self.records[company].growth_cagr_vs_inflation
 
     def get_systematic_risk(self, company):
         """
         Returns the Systematic Risk discrete state for the given company
         """
-        return self.df_shares.loc[self.df_shares['company_name'] == company, "systematic_risk"].iloc[0]
+        return self.records[company].systematic_risk
+
+
+def universe_ratios(df, companies, years, overlay=None):
+    """
+    Computes the ratios of every company for every year at once from yearly aggregates of the share data. Ratios
+    with a zero denominator are NaN rather than infinite.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Pandas data frame containing all share data
+    companies : list
+        Companies to evaluate
+    years : list
+        The years calculations need to be computed for
+    overlay : invest.preprocessing.simulation.Overlay, optional
+        Noise applied to the rows of the companies and years read
+
+    Returns
+    -------
+    dict
+        Ratios named in RATIOS, each a (years x companies) array
+    """
+    years = np.asarray(years)
+    first_year = years.min() - 4
+    calendar_years = np.arange(first_year, years.max())
+    df = df[df['Name'].isin(companies)]
+    df = df.assign(Year=date_years(df['Date']))
+    # Only the years the ratios are computed from are read
+    df = df[(df['Year'] >= first_year) & (df['Year'] < years.max())]
+    if overlay is not None:
+        df = overlay.apply(df)
+    keys = ['Name', 'Year']
+    index = pd.MultiIndex.from_product([companies, calendar_years], names=['Name', 'Year'])
+
+    def yearly(values):
+        # (companies x calendar years)
+        return values.reindex(index).to_numpy(dtype=np.float64).reshape(len(companies), len(calendar_years))
+
+    groups = df.groupby(keys, sort=False)
+    latest = groups.tail(1).set_index(keys)
+    counts = groups.size()
+    # Means are undefined when any value of the year is
+    price_mean = yearly(groups['Price'].mean().where(groups['Price'].count() == counts))
+    eps_mean = yearly(groups['EPS'].mean().where(groups['EPS'].count() == counts))
+    # Market and sector PEs are averaged over three years, skipping undefined values
+    pe_sums = {c: yearly(groups[c].sum()) for c in ['PEMarket', 'PESector']}
+    pe_counts = {c: yearly(groups[c].count()) for c in ['PEMarket', 'PESector']}
+
+    y = years - first_year  # calendar year index of each evaluated year
+    current = y - 1
+
+    def last(column):
+        return yearly(latest[column])[:, current].T
+
+    eps = yearly(latest['EPS'])[:, y[:, np.newaxis] + np.arange(-4, 0)].transpose(1, 0, 2)
+    growth_rate = array_ratios.historic_earnings_growth_rate(eps)
+    cagr = array_ratios.historic_earnings_cagr(eps[..., -1], eps[..., 0], 3)
+    historic_pe = array_ratios.divide(price_mean[:, current].T, eps_mean[:, current].T)
+    forward_earnings = array_ratios.forward_earnings(eps[..., -1], growth_rate)
+    window = y[:, np.newaxis] + np.arange(-3, 0)
+    pe_reference = {c: array_ratios.divide(pe_sums[c][:, window].sum(axis=-1),
+                                           pe_counts[c][:, window].sum(axis=-1)).T for c in pe_sums}
+    share_beta = last('ShareBeta')
+    share_pe = last('PE')
+
+    ratios_ = {"forward_earnings": forward_earnings,
+               "shareholders_equity": last('ShareholdersEquity'),
+               "share_beta": share_beta,
+               "pe_current_share_market": array_ratios.current_pe(share_pe, last('PEMarket')),
+               "pe_relative_market": array_ratios.divide(historic_pe, pe_reference['PEMarket']),
+               "pe_current_share_sector": array_ratios.current_pe(share_pe, last('PESector')),
+               "pe_relative_sector": array_ratios.divide(historic_pe, pe_reference['PESector']),
+               "forward_price_to_earnings": array_ratios.forward_price_to_earnings(last('Price'), forward_earnings),
+               "historic_price_to_earnings_share": historic_pe,
+               "roe": last('ROE'),
+               "cost_of_equity": array_ratios.cost_of_equity(last('MarketRateOfReturn'), last('RiskFreeRateOfReturn'),
+                                                             share_beta),
+               "historic_earnings_cagr": cagr,
+               "inflation": last('InflationRate'),
+               "relative_debt_equity": array_ratios.relative_debt_to_equity(last('Debt/Equity'),
+                                                                            last('Debt/EquityIndustry'))}
+    return {k: np.ma.filled(np.ma.asarray(v, dtype=np.float64), np.nan) for k, v in ratios_.items()}
+
+
+def threshold_states(ratios_, margin_of_safety, beta, extension):
+    """
+    Thresholds the ratios of companies into the discrete states used as evidence by the Bayesian networks. States
+    that are undefined, or not needed as the stock is not acceptable, are MISSING.
+
+    Parameters
+    ----------
+    ratios_ : dict
+        Ratios of universe_ratios for a single year, each an array over companies
+    margin_of_safety : float
+        Args parameter for safety threshold
+    beta : float
+        Args parameter for beta threshold
+    extension : bool
+        Classify systematic risk for the extended experiment
+
+    Returns
+    -------
+    numpy.ndarray
+        States of each company with the STATES dtype
+    """
+    shares = np.zeros(len(ratios_["share_beta"]), dtype=STATES)
+    shares["negative_earnings"] = array_threshold.negative_earnings(ratios_["forward_earnings"])
+    shares["negative_shareholders_equity"] = array_threshold.negative_shareholders_equity(
+        ratios_["shareholders_equity"])
+    shares["beta_classify"] = array_threshold.beta_classify(ratios_["share_beta"], beta)
+    shares["acceptable_stock"] = array_threshold.acceptable_stock(shares["negative_earnings"],
+                                                                  shares["negative_shareholders_equity"],
+                                                                  shares["beta_classify"])
+    states = {
+        "current_PE_relative_share_market_to_historical": array_threshold.pe_relative_share(
+            margin_of_safety, ratios_["pe_current_share_market"], ratios_["pe_relative_market"]),
+        "current_PE_relative_share_sector_to_historical": array_threshold.pe_relative_share(
+            margin_of_safety, ratios_["pe_current_share_sector"], ratios_["pe_relative_sector"]),
+        "forward_PE_current_to_historical": array_threshold.forward_pe(
+            margin_of_safety, ratios_["forward_price_to_earnings"], ratios_["historic_price_to_earnings_share"]),
+        "roe_vs_coe": array_threshold.roe_coe(margin_of_safety, ratios_["roe"], ratios_["cost_of_equity"]),
+        "growth_cagr_vs_inflation": array_threshold.cagr_inflation(margin_of_safety, ratios_["historic_earnings_cagr"],
+                                                                   ratios_["inflation"]),
+        "relative_debt_to_equity": array_threshold.relative_debt_to_equity(margin_of_safety,
+                                                                           ratios_["relative_debt_equity"]),
+    }
+    if extension:
+        states["systematic_risk"] = array_threshold.systematic_risk_classification(ratios_["share_beta"])
+    else:
+        states["systematic_risk"] = np.ma.masked_all(len(shares), dtype=STATE_DTYPE)
+    for field, codes in states.items():
+        shares[field] = np.where(shares["acceptable_stock"], np.ma.filled(codes, MISSING), MISSING)
+    return shares
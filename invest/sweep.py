@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+import invest.calculator.array_threshold as array_threshold
+import invest.evaluation.portfolio as portfolio
+import invest.evaluation.validation as validation
+from invest.decision import state_decision
+from invest.prediction.main import future_share_price_performance
+from invest.preprocessing.simulation import perturb
+from invest.cache import ratio_cache
+from invest.states import MISSING, STATE_DTYPE, Investable
+from invest.store import universe_ratios
+from invest.tracing import stage, traced
+from invest.universe import universe
+
+METRICS = ["compoundReturn", "averageAnnualReturn", "treynor", "sharpe"]
+
+
+def threshold_grid(ratios_, margins, betas, extension):
+    """
+    Thresholds the ratios of every company for every margin of safety and beta threshold
+
+    Parameters
+    ----------
+    ratios_ : list
+        Ratios named in invest.store.RATIOS of each company, as returned by RatioCache.year_ratios
+    margins : numpy.ndarray
+        Margins of safety (M)
+    betas : numpy.ndarray
+        Beta thresholds (B)
+    extension : bool
+        Classify systematic risk for the extended experiment
+
+    Returns
+    -------
+    (numpy.ndarray, list)
+        Acceptable stock flags (B x C) and the (M x C) state codes of each network input, MISSING where undefined,
+        in the order taken by state_decision
+    """
+
+    def ratio(name):
+        return np.array([r[name] for r in ratios_], dtype=np.float64)
+
+    share_beta = ratio("share_beta")
+    acceptable = array_threshold.acceptable_stock(array_threshold.negative_earnings(ratio("forward_earnings")),
+                                                  array_threshold.negative_shareholders_equity(
+                                                      ratio("shareholders_equity")),
+                                                  array_threshold.beta_classify(share_beta, betas[:, np.newaxis]))
+    m = margins[:, np.newaxis]
+    states = [
+        array_threshold.pe_relative_share(m, ratio("pe_current_share_market"), ratio("pe_relative_market")),
+        array_threshold.pe_relative_share(m, ratio("pe_current_share_sector"), ratio("pe_relative_sector")),
+        array_threshold.forward_pe(m, ratio("forward_price_to_earnings"), ratio("historic_price_to_earnings_share")),
+        array_threshold.roe_coe(m, ratio("roe"), ratio("cost_of_equity")),
+        array_threshold.relative_debt_to_equity(m, ratio("relative_debt_equity")),
+        array_threshold.cagr_inflation(m, ratio("historic_earnings_cagr"), ratio("inflation")),
+    ]
+    if extension:
+        systematic_risk = array_threshold.systematic_risk_classification(share_beta)
+    else:
+        systematic_risk = np.ma.masked_all(len(ratios_), dtype=STATE_DTYPE)
+    states.append(np.broadcast_to(np.ma.filled(systematic_risk, MISSING), (len(margins), len(ratios_))))
+    states = [np.ma.filled(s, MISSING) for s in states]
+    return acceptable, states
+
+
+@traced('sweep')
+def sweep(df_, params, margins, betas, holding_periods, index_codes=("JGIND", "JCSEV")):
+    """
+    Backtests INVEST over a grid of margins of safety, beta thresholds and holding periods. The ratios of each
+    company are computed once per year, or read from the ratio cache, and thresholded for the whole grid at once,
+    each distinct set of network evidence is evaluated once and the portfolios of the whole grid are evaluated as
+    a batch for each holding period.
+
+    Parameters
+    ----------
+    df_ : pandas.DataFrame
+        Fundamental and price data
+    params : argparse.Namespace
+        Command line arguments, margin_of_safety, beta and holding_period are taken from the grid
+    margins : list
+        Margins of safety (M)
+    betas : list
+        Beta thresholds (B)
+    holding_periods : list
+        Holding periods as month offsets into each year (H)
+    index_codes : tuple, optional
+        Johannesburg Stock Exchange sector index codes
+
+    Returns
+    -------
+    dict
+        Grid axes and, per index, the shares selected for each (margin, beta, year) and the IP metrics cube
+        (M x B x H) and benchmark metrics (H) for each metric, with annual returns along an extra year axis
+    """
+    # Noise is applied to the rows the ratios are computed from rather than to a copy of the share data
+    overlay = perturb(df_) if params.noise else None
+    margins = np.asarray(margins, dtype=np.float64)
+    betas = np.asarray(betas, dtype=np.float64)
+    years = list(range(params.start, params.end))
+    columns = universe.companies(index_codes)
+
+    if params.noise:
+        with stage("ratios"):
+            noisy_ratios = universe_ratios(df_, columns, years, overlay)
+
+    decisions = {}
+    selected = {}
+    for y, year in enumerate(years):
+        if params.noise:
+            ratios_ = [{k: v[y, c] for k, v in noisy_ratios.items()} for c in range(len(columns))]
+        else:
+            ratios_ = list(ratio_cache.year_ratios(df_, columns, year).values())
+        # Systematic risk is not classified, as in the Store of decide_year, whether or not extension is set
+        acceptable, states = threshold_grid(ratios_, margins, betas, False)
+        if params.gnn:
+            df_future_performance = future_share_price_performance(year, horizon=params.horizon)
+        else:
+            df_future_performance = pd.DataFrame()
+        selected[year] = np.zeros((len(margins), len(betas), len(columns)), dtype=bool)
+        for c, company in enumerate(columns):
+            if not acceptable[:, c].any():
+                continue
+            if not df_future_performance.empty:
+                future_performance = df_future_performance[company][0]
+            else:
+                future_performance = None
+            for m in range(len(margins)):
+                key = tuple(int(s[m, c]) for s in states) + (future_performance,)
+                if key not in decisions:
+                    decisions[key] = state_decision(*key, extension=params.extension, ablation=params.ablation,
+                                                    network=params.network) == Investable.YES
+                selected[year][m, acceptable[:, c], c] = decisions[key]
+
+    with stage("data_access"):
+        panels = [portfolio.price_panel(df_, columns, years, holding_period) for holding_period in holding_periods]
+    risk_free_rates = portfolio.risk_free_rates(df_, years)
+    # (M x B x Y x C) holdings of every grid point
+    weights = np.stack([selected[year] for year in years], axis=2).astype(np.float64)
+
+    result = {"margins": margins.tolist(), "betas": betas.tolist(), "holdingPeriods": list(holding_periods),
+              "years": years}
+    for index_code in index_codes:
+        index_columns = [columns.index(c) for c in universe.members(index_code)]
+        members = universe.membership(index_code, years, universe.members(index_code))
+        index_weights = weights[..., index_columns] * members
+        shape = (len(margins), len(betas), len(holding_periods))
+        ip = {metric: np.zeros(shape) for metric in METRICS}
+        ip["annualReturns"] = np.zeros(shape + (len(years),))
+        shares = np.empty((len(margins), len(betas), len(years)), dtype=object)
+        for m in range(len(margins)):
+            for b in range(len(betas)):
+                for y, year in enumerate(years):
+                    shares[m, b, y] = [columns[c] for i, c in enumerate(index_columns) if index_weights[m, b, y, i]]
+        for h in range(len(holding_periods)):
+            metrics = portfolio.portfolio_metrics(index_weights,
+                                                  *[panel[:, index_columns] for panel in panels[h]], risk_free_rates)
+            for metric, values in metrics.items():
+                ip[metric][:, :, h] = values
+
+        benchmark = {metric: np.zeros(len(holding_periods)) for metric in METRICS}
+        benchmark["annualReturns"] = np.zeros((len(holding_periods), len(years)))
+        for h, holding_period in enumerate(holding_periods):
+            benchmark["annualReturns"][h], benchmark["compoundReturn"][h], benchmark["averageAnnualReturn"][h], \
+                benchmark["treynor"][h], benchmark["sharpe"][h] = \
+                validation.process_benchmark_metrics(df_, params.start, params.end, index_code, holding_period, False)
+        result[index_code.lower()] = {"shares": shares, "ip": ip, "benchmark": benchmark}
+    return result
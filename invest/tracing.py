@@ -0,0 +1,169 @@
+import contextvars
+import functools
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_recorder = contextvars.ContextVar('recorder', default=None)
+
+
+class StageRecorder:
+    """
+    Collects the number of calls, total duration and peak memory of named pipeline stages
+    """
+
+    def __init__(self, memory=False):
+        """
+        Parameters
+        ----------
+        memory : bool, optional
+            Track the peak memory allocated within each stage, requires tracemalloc to be tracing
+        """
+        self.memory = memory
+        self.stages = {}
+        self.caches = {}
+        self._stack = []
+
+    def enter(self):
+        """
+        Marks the start of a stage and returns its start time
+        """
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        return time.perf_counter()
+
+    def exit(self, name, start):
+        """
+        Records the duration and peak memory of a stage started at the given time
+        """
+        seconds = time.perf_counter() - start
+        peak_bytes = 0
+        if self.memory and tracemalloc.is_tracing() and self._stack:
+            start_bytes, peak = self._stack.pop()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            peak_bytes = peak - start_bytes
+        self.record(name, seconds, peak_bytes)
+
+    def record(self, name, seconds, peak_bytes=0):
+        """
+        Adds a single call of a stage
+        """
+        stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['peak_bytes'] = max(stats['peak_bytes'], peak_bytes)
+
+    def cache_access(self, cache, hit):
+        """
+        Counts a hit or miss of a named cache
+        """
+        self.caches[(cache, hit)] = self.caches.get((cache, hit), 0) + 1
+
+
+def activate(recorder):
+    """
+    Activates a stage recorder for the current context and returns a token to deactivate it
+
+    Parameters
+    ----------
+    recorder : StageRecorder
+        Recorder to activate
+
+    Returns
+    -------
+    contextvars.Token
+    """
+    return _recorder.set(recorder)
+
+
+def deactivate(token):
+    """
+    Restores the recorder that was active before the matching call to activate
+    """
+    _recorder.reset(token)
+
+
+def cache_access(cache, hit):
+    """
+    Counts a hit or miss of a named cache in the active recorder, if any
+
+    Parameters
+    ----------
+    cache : str
+        Cache name
+    hit : bool
+        Whether the lookup was served from the cache
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.cache_access(cache, hit)
+
+
+@contextmanager
+def recording(recorder=None):
+    """
+    Activates a stage recorder for the current context
+
+    Parameters
+    ----------
+    recorder : StageRecorder, optional
+        Recorder to activate, a new recorder is created if None
+
+    Returns
+    -------
+    StageRecorder
+    """
+    recorder = recorder if recorder is not None else StageRecorder()
+    token = activate(recorder)
+    try:
+        yield recorder
+    finally:
+        deactivate(token)
+
+
+@contextmanager
+def stage(name):
+    """
+    Records the enclosed block as a named stage of the active recorder, if any
+
+    Parameters
+    ----------
+    name : str
+        Stage name
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    start = recorder.enter()
+    try:
+        yield
+    finally:
+        recorder.exit(name, start)
+
+
+def traced(name):
+    """
+    Decorator recording each call of a function as a named stage of the active recorder, if any
+
+    Parameters
+    ----------
+    name : str
+        Stage name
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from invest.preprocessing.dataloader import DATA_DIRECTORY
+
+
+class Universe:
+    """
+    Registry of share index memberships. A membership file holds either the constituents of an index, as
+    {"names": [...]}, or its constituents in each year from which they apply, as {"years": {"2015": [...]}},
+    optionally with "names" as the constituents before the first listed year. Files are read on first use.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}
+        self.memberships = {}
+
+    def register(self, index_code, members):
+        """
+        Registers the constituents of an index
+
+        Parameters
+        ----------
+        index_code : str
+            Share index code
+        members : Union[list, dict]
+            Constituents, or the constituents from each year
+        """
+        with self.lock:
+            self.sources[index_code] = None
+            self.memberships[index_code] = self._membership(members)
+
+    def register_file(self, index_code, path):
+        """
+        Registers the membership file of an index, which is read on first use
+
+        Parameters
+        ----------
+        index_code : str
+            Share index code
+        path : str
+            JSON membership file
+        """
+        with self.lock:
+            self.sources[index_code] = path
+            self.memberships.pop(index_code, None)
+
+    def register_directory(self, directory):
+        """
+        Registers every JSON membership file in a directory, named by the upper case index code. Other JSON
+        files, such as the metadata of price matrices, are skipped.
+
+        Parameters
+        ----------
+        directory : str
+            Directory of membership files
+        """
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if filename.endswith('.json') and self._is_membership_file(path):
+                self.register_file(os.path.splitext(filename)[0].upper(), path)
+
+    @staticmethod
+    def _is_membership_file(path):
+        try:
+            with open(path, 'r') as f:
+                members = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return isinstance(members, dict) and ("names" in members or "years" in members)
+
+    @staticmethod
+    def _membership(members):
+        # Static constituents are stored as those applying from year None
+        if isinstance(members, dict):
+            years = {int(year): list(names) for year, names in members.get("years", {}).items()}
+            return {None: list(members.get("names", [])), **dict(sorted(years.items()))}
+        return {None: list(members)}
+
+    def _load(self, index_code):
+        with self.lock:
+            if index_code not in self.memberships:
+                if index_code not in self.sources:
+                    raise KeyError("Unknown index {}".format(index_code))
+                with open(self.sources[index_code], 'r') as f:
+                    self.memberships[index_code] = self._membership(json.load(f))
+            return self.memberships[index_code]
+
+    def index_codes(self):
+        """
+        Returns the registered index codes
+        """
+        return list(self.sources)
+
+    def members(self, index_code, year=None):
+        """
+        Returns the constituents of an index in a year
+
+        Parameters
+        ----------
+        index_code : str
+            Share index code
+        year : int, optional
+            Year of the membership, every company that is a constituent in any year if None
+
+        Returns
+        -------
+        list
+        """
+        membership = self._load(index_code)
+        if year is None:
+            return list(dict.fromkeys(company for names in membership.values() for company in names))
+        applicable = [y for y in membership if y is not None and y <= year]
+        return membership[max(applicable)] if applicable else membership[None]
+
+    def companies(self, index_codes=None, year=None):
+        """
+        Returns the constituents of any of the given indices, in the order of the indices
+
+        Parameters
+        ----------
+        index_codes : list, optional
+            Share index codes, every registered index if None
+        year : int, optional
+            Year of the membership, every company that is a constituent in any year if None
+
+        Returns
+        -------
+        list
+        """
+        if index_codes is None:
+            index_codes = self.index_codes()
+        return list(dict.fromkeys(company for index_code in index_codes for company in
+                                  self.members(index_code, year)))
+
+    def membership(self, index_code, years, companies):
+        """
+        Returns whether each company is a constituent of an index in each year
+
+        Parameters
+        ----------
+        index_code : str
+            Share index code
+        years : list
+            Years (Y)
+        companies : list
+            Companies (C)
+
+        Returns
+        -------
+        numpy.ndarray
+            Membership (Y x C)
+        """
+        return np.array([np.isin(companies, self.members(index_code, year)) for year in years], dtype=bool) \
+            .reshape(len(years), len(companies))
+
+
+universe = Universe()
+# Membership files of the data directory, data/jcsev.json and data/jgind.json by default
+universe.register_directory(DATA_DIRECTORY)
+# Further membership files, separated by os.pathsep, or directories of membership files
+for path in filter(None, os.environ.get("INVEST_INDICES", "").split(os.pathsep)):
+    if os.path.isdir(path):
+        universe.register_directory(path)
+    else:
+        universe.register_file(os.path.splitext(os.path.basename(path))[0].upper(), path)
@@ -0,0 +1,49 @@
+import argparse
+import contextlib
+import io
+import os
+
+import pytest
+
+# The tests compute every year afresh rather than reading or writing the caches under output/
+os.environ["INVEST_RATIO_CACHE"] = ""
+os.environ["INVEST_BACKTEST_CACHE"] = ""
+
+from invest.decision import investment_portfolio  # noqa: E402
+from invest.preprocessing.dataloader import load_data  # noqa: E402
+from invest.universe import universe  # noqa: E402
+
+
+def make_params(**kwargs):
+    """
+    Returns command line arguments of a backtest of a small slice of the data
+    """
+    params = dict(start=2015, end=2019, margin_of_safety=0.1, beta=1.0, extension=False, noise=False,
+                  ablation=False, network='v', gnn=False, holding_period=-1, horizon=10)
+    params.update(kwargs)
+    return argparse.Namespace(**params)
+
+
+def single_run(df, params, index_code, benchmark=True):
+    """
+    Returns the portfolio of a single backtest, the reference for the vectorised engines
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return investment_portfolio(df, params, index_code, benchmark=benchmark)
+
+
+@pytest.fixture(scope="session")
+def df():
+    return load_data()
+
+
+@pytest.fixture
+def custom_index(monkeypatch):
+    """
+    Registers an index whose constituents change in 2017, without a benchmark file, for the duration of a test
+    """
+    monkeypatch.setattr(universe, "sources", dict(universe.sources))
+    monkeypatch.setattr(universe, "memberships", dict(universe.memberships))
+    universe.register("MIXED", {"names": ["BARLOWORLD", "NAMPAK", "SHOPRITE", "SPUR"],
+                                "years": {"2017": ["BARLOWORLD", "REUNERT", "SHOPRITE", "TRUWORTHS INTL"]}})
+    return "MIXED"
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import invest.evaluation.backtest as backtest
+from invest.universe import universe
+from tests.conftest import make_params, single_run
+
+YEARS = [2015, 2016, 2017]
+
+
+def selections(df, index_code):
+    params = make_params(start=YEARS[0], end=YEARS[-1] + 1)
+    portfolio = single_run(df, params, index_code)
+    companies = universe.members(index_code)
+    return backtest.selection_matrix(portfolio["ip"]["shares"], companies, YEARS), companies, portfolio
+
+
+def reference_backtest(selected, dates, prices, rebalance, weighting):
+    # Holds units of each share and cash date by date, rebalancing to the target values
+    nav = np.ones(len(dates))
+    turnover = []
+    units = np.zeros(prices.shape[1])
+    cash = 1.0
+    for d in range(len(dates)):
+        values = units * np.nan_to_num(prices[d])
+        nav[d] = cash + values.sum()
+        if d in rebalance:
+            held = selected[list(rebalance).index(d)] & ~np.isnan(prices[d])
+            targets = np.zeros_like(values)
+            if held.any():
+                targets[held] = prices[d, held] if weighting == "shares" else 1.0
+                targets = targets / targets.sum() * nav[d]
+            target_cash = nav[d] - targets.sum()
+            turnover.append((np.abs(targets - values).sum() + abs(target_cash - cash)) / 2 / nav[d])
+            units = np.where(held, targets / np.where(held, prices[d], 1), 0)
+            cash = target_cash
+    return nav, np.array(turnover)
+
+
+@pytest.mark.parametrize("index_code", ["JGIND", "JCSEV"])
+def test_annual_growth_matches_single_run(df, index_code):
+    selected, companies, portfolio = selections(df, index_code)
+    result = backtest.backtest_selections(df, selected, companies, YEARS)
+    nav = result["nav"]
+    years = result["dates"].astype('datetime64[Y]').astype(int) + 1970
+    starts = [np.flatnonzero(years == year)[0] for year in YEARS]
+    ends = [np.flatnonzero(years == year)[-1] for year in YEARS]
+    np.testing.assert_allclose(nav[ends] / nav[starts] - 1, portfolio["ip"]["annualReturns"])
+
+
+@pytest.mark.parametrize("schedule", ["annual", "quarterly", "monthly", ["2015-03-15", "2016-07-01"]])
+@pytest.mark.parametrize("weighting", ["shares", "equal"])
+def test_nav_and_turnover_match_reference(df, schedule, weighting):
+    selected, companies, _ = selections(df, "JGIND")
+    result = backtest.backtest_selections(df, selected, companies, YEARS, schedule, weighting)
+    dates, prices = backtest.price_matrix(df, companies, YEARS[0], YEARS[-1] + 1)
+    rebalance = backtest.rebalance_dates(dates, schedule)
+    year_index = dates[rebalance].astype('datetime64[Y]').astype(int) + 1970 - YEARS[0]
+    nav, turnover = reference_backtest(selected[year_index], dates, prices, rebalance, weighting)
+    np.testing.assert_allclose(result["nav"], nav)
+    np.testing.assert_allclose(result["turnover"], turnover, atol=1e-12)
+    np.testing.assert_allclose(result["maxDrawdown"], (nav / np.maximum.accumulate(nav) - 1).min())
+
+
+def test_batch_matches_single_selections(df):
+    rng = np.random.default_rng(0)
+    companies = universe.members("JCSEV")
+    selected = rng.random((5, len(YEARS), len(companies))) > 0.5
+    batch = backtest.backtest_selections(df, selected, companies, YEARS, "quarterly")
+    for i in range(len(selected)):
+        single = backtest.backtest_selections(df, selected[i], companies, YEARS, "quarterly")
+        for key in ["nav", "turnover", "annualReturns", "compoundReturn", "meanTurnover"]:
+            np.testing.assert_allclose(batch[key][i], single[key])
+
+
+def test_period_returns_chain_to_nav(df):
+    for index_code in ["JGIND", "JCSEV"]:
+        selected, companies, _ = selections(df, index_code)
+        for schedule in ["annual", "quarterly"]:
+            result = backtest.backtest_selections(df, selected, companies, YEARS, schedule)
+            np.testing.assert_allclose(np.prod(1 + result["annualReturns"]), result["nav"][-1])
+            np.testing.assert_allclose((1 + result["compoundReturn"]) ** len(YEARS), result["nav"][-1])
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from invest.sensitivity import Perturbation, sensitivity
+from tests.conftest import make_params, single_run
+
+METRICS = ["compoundReturn", "averageAnnualReturn", "treynor", "sharpe"]
+
+
+def assert_matches_single_runs(df, params, index_codes):
+    result = sensitivity(df, params, [Perturbation()], index_codes)
+    for index_code in index_codes:
+        expected = single_run(df, params, index_code, benchmark=False)["ip"]
+        cube = result[index_code.lower()]
+        for y, year in enumerate(result["years"]):
+            assert sorted(cube["shares"][0, y]) == sorted(expected["shares"][str(year)])
+        np.testing.assert_allclose(cube["annualReturns"][0], expected["annualReturns"])
+        for metric in METRICS:
+            np.testing.assert_allclose(cube[metric][0], expected[metric])
+
+
+@pytest.mark.parametrize("options", [{}, {"extension": True}, {"ablation": True, "network": 'q'},
+                                     {"margin_of_safety": 0.2, "beta": 0.8, "holding_period": 6}])
+def test_unperturbed_matches_single_runs(df, options):
+    assert_matches_single_runs(df, make_params(**options), ["JGIND", "JCSEV"])
+
+
+def test_membership_masks_match_single_runs(df, custom_index):
+    assert_matches_single_runs(df, make_params(), [custom_index])
@@ -0,0 +1,43 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from invest.decision import investment_decision, state_decision, state_decisions
+from invest.states import MISSING
+from invest.store import Store
+from invest.universe import universe
+
+INDEX_CODES = ["JGIND", "JCSEV"]
+YEARS = [2015, 2016, 2017, 2018]
+# Fields of the STATES record in the order taken by state_decision
+FIELDS = ["current_PE_relative_share_market_to_historical", "current_PE_relative_share_sector_to_historical",
+          "forward_PE_current_to_historical", "roe_vs_coe", "relative_debt_to_equity", "growth_cagr_vs_inflation",
+          "systematic_risk"]
+OPTIONS = [(False, False, 'v'), (True, False, 'v'), (False, True, 'v'), (False, True, 'q')]
+
+
+@pytest.mark.parametrize("extension, ablation, network", OPTIONS)
+def test_state_decisions_match_networks_on_shares(df, extension, ablation, network):
+    for year in YEARS:
+        # Systematic risk is classified so that the extension receives evidence
+        store = Store(df, universe.companies(INDEX_CODES, year), 0.1, 1.0, year, True)
+        companies = [company for company in store.companies if store.get_acceptable_stock(company)]
+        states = store.get_states(companies)
+        expected = [investment_decision(store, company, None, extension, ablation, network) for company in companies]
+        actual = state_decisions(*[states[field] for field in FIELDS], extension=extension, ablation=ablation,
+                                 network=network)
+        assert list(actual) == expected
+
+
+@pytest.mark.parametrize("extension, ablation, network", OPTIONS)
+def test_state_decisions_match_networks_on_evidence(extension, ablation, network):
+    rng = np.random.default_rng(0)
+    # Every value evidence, with a sample of the quality evidence, including missing states
+    value = np.array(list(itertools.product(range(MISSING, 3), repeat=3)))
+    quality = rng.integers(MISSING, 3, size=(len(value), 4))
+    evidence = np.concatenate([value, quality], axis=1).astype(np.int8)
+    expected = [state_decision(*row, extension=extension, ablation=ablation, network=network)
+                for row in evidence.tolist()]
+    actual = state_decisions(*evidence.T, extension=extension, ablation=ablation, network=network)
+    assert list(actual) == expected
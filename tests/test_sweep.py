@@ -0,0 +1,33 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from invest.sweep import sweep
+from tests.conftest import make_params, single_run
+
+MARGINS = [0.1, 0.3]
+BETAS = [1.0, 1.5]
+HOLDING_PERIODS = [-1, 5]
+
+
+@pytest.mark.parametrize("extension", [False, True])
+def test_sweep_matches_single_runs(df, extension):
+    params = make_params(extension=extension)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = sweep(df, params, MARGINS, BETAS, HOLDING_PERIODS)
+    for m, margin in enumerate(MARGINS):
+        for b, beta in enumerate(BETAS):
+            for h, holding_period in enumerate(HOLDING_PERIODS):
+                run = make_params(extension=extension, margin_of_safety=margin, beta=beta,
+                                  holding_period=holding_period)
+                for index_code in ["JGIND", "JCSEV"]:
+                    expected = single_run(df, run, index_code)
+                    cube = result[index_code.lower()]
+                    for y, year in enumerate(result["years"]):
+                        assert cube["shares"][m, b, y] == list(expected["ip"]["shares"][str(year)])
+                    np.testing.assert_allclose(cube["ip"]["annualReturns"][m, b, h], expected["ip"]["annualReturns"])
+                    for metric in ["compoundReturn", "averageAnnualReturn", "treynor", "sharpe"]:
+                        np.testing.assert_allclose(cube["ip"][metric][m, b, h], expected["ip"][metric])
+                        np.testing.assert_allclose(cube["benchmark"][metric][h], expected["benchmark"][metric])
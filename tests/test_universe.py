@@ -0,0 +1,35 @@
+import json
+
+import numpy as np
+
+from invest.universe import Universe, universe
+from tests.conftest import make_params, single_run
+
+
+def test_register_directory_skips_other_json(tmp_path):
+    (tmp_path / "jgind.json").write_text(json.dumps({"names": ["AFRIMAT", "BARLOWORLD"]}))
+    (tmp_path / "mix.json").write_text(json.dumps({"years": {"2016": ["SHOPRITE"]}}))
+    (tmp_path / "JSE_clean.json").write_text(json.dumps({"columns": ["AFRIMAT"], "index": ["2015-01-01"]}))
+    (tmp_path / "broken.json").write_text("{")
+    registry = Universe()
+    registry.register_directory(str(tmp_path))
+    assert registry.index_codes() == ["JGIND", "MIX"]
+    assert registry.members("MIX", 2015) == []
+    assert registry.members("MIX", 2017) == ["SHOPRITE"]
+
+
+def test_membership_mask():
+    registry = Universe()
+    registry.register("MIX", {"names": ["A", "B"], "years": {"2016": ["B", "C"], "2018": ["A"]}})
+    companies = registry.companies(["MIX"])
+    assert companies == ["A", "B", "C"]
+    np.testing.assert_array_equal(registry.membership("MIX", [2015, 2016, 2017, 2018], companies),
+                                  [[True, True, False], [False, True, True], [False, True, True],
+                                   [True, False, False]])
+
+
+def test_single_runs_select_members(df, custom_index):
+    params = make_params()
+    portfolio = single_run(df, params, custom_index, benchmark=False)
+    for year in range(params.start, params.end):
+        assert set(portfolio["ip"]["shares"][str(year)]) <= set(universe.members(custom_index, year))